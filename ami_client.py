@@ -0,0 +1,290 @@
+"""
+Asterisk Manager Interface (AMI) client for call monitoring.
+
+Keeps one persistent TCP connection to the AMI port and follows the
+Newchannel / Newstate / DialBegin / Hangup events, so the list of live
+channels is always available in memory without running the Asterisk CLI
+on the PBX. A lost connection (e.g. a PBX restart) is opened again by
+reconnect(), with exponential backoff between failed attempts. A connection
+that a NAT or a firewall dropped without closing it is noticed by the Ping
+sent after ping_interval seconds without any message: no answer to it in
+another ping_interval means the connection is lost.
+"""
+
+import socket
+import threading
+import time
+
+from channel_parser import format_duration, parse_duration
+
+# Channels that were hung up stay visible for a few seconds,
+# so even very short calls appear at least once in the window.
+HANGUP_LINGER = 5.0
+
+PING_INTERVAL = 30.0
+
+
+def pick_number(*candidates):
+    for value in candidates:
+        if value and value.isdigit():
+            return value
+    return None
+
+
+class AmiError(Exception):
+    pass
+
+
+class AmiClient:
+    def __init__(self, host, port, username, secret, timeout=10, linger=HANGUP_LINGER, event_filter=None,
+                 min_backoff=1.0, max_backoff=60.0, ping_interval=PING_INTERVAL):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.secret = secret
+        self.timeout = timeout
+        self.linger = linger
+        self.event_filter = event_filter  # regex for the AMI Filter action, see channel_filter.py
+        self.filter_error = None  # why the PBX refused the Filter action; the events are then not filtered there
+        self.ping_interval = ping_interval
+        self.sock = None
+        self.reader = None
+        self.connected = False
+        self.error = None
+        self.channels = {}  # uniqueid -> channel dict
+        self.on_event = None  # called from the reader thread after every channel event
+        self.on_queue_event = None  # if set, gets the Queue*/Agent* events, see queue_monitor.py
+        self.lock = threading.Lock()
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.reconnects = 0
+        self._action_id = 0
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._filter_actions = set()
+        self._ping_sent = False
+        self._buffer = b""
+        self._message = {}  # the part of a message read before a timeout
+
+    def connect(self):
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._buffer = b""
+        self._message = {}
+        banner = self._readline().decode("utf-8", "replace").strip()
+        if not banner.startswith("Asterisk Call Manager"):
+            self.close()
+            raise AmiError(f"Unexpected AMI banner: {banner!r}")
+
+        self.send_action("Login", Username=self.username, Secret=self.secret, Events=self.events)
+        response = self._read_message()
+        if response.get("Response") != "Success":
+            self.close()
+            raise AmiError(response.get("Message", "Authentication failed"))
+
+        try:
+            self.subscribe()
+            # The channels that are already up are in memory before connect() returns
+            while not self._initial_message(self._read_message()):
+                pass
+        except (AmiError, OSError):
+            self.close()
+            raise
+        self.sock.settimeout(self.ping_interval)
+        self._ping_sent = False
+        self.connected = True
+        self.error = None
+        self._backoff = 0.0
+        self.reader = threading.Thread(target=self._read_loop, daemon=True)
+        self.reader.start()
+
+    def close(self):
+        self.connected = False
+        if self.sock:
+            try:
+                self.send_action("Logoff")
+            except OSError:
+                pass
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+            self.sock = None
+
+    def reconnect(self):
+        """Connect again after the connection was lost; raises if it fails or it is too early to retry."""
+        self._before_reconnect()
+        try:
+            self.connect()
+        except Exception as e:
+            self._reconnect_failed(e)
+            raise
+        self.reconnects += 1
+
+    def _before_reconnect(self):
+        now = time.monotonic()
+        if now < self._retry_at:
+            raise AmiError(f"{self.error} (retry in {self._retry_at - now:.1f} s)")
+        self.close()
+        with self.lock:
+            self.channels.clear()  # CoreShowChannels lists the live ones again
+
+    def _reconnect_failed(self, error):
+        self.close()
+        self.error = str(error)
+        self._backoff = min(self.max_backoff, max(self.min_backoff, self._backoff * 2))
+        self._retry_at = time.monotonic() + self._backoff
+
+    def send_action(self, action, **fields):
+        self._action_id += 1
+        lines = [f"Action: {action}", f"ActionID: {self._action_id}"]
+        lines += [f"{key}: {value}" for key, value in fields.items()]
+        self.sock.sendall(("\r\n".join(lines) + "\r\n\r\n").encode("utf-8"))
+
+    @property
+    def events(self):
+        # The queue and agent events are in the "agent" class
+        return "call,agent" if self.on_queue_event else "call"
+
+    def subscribe(self):
+        self.filter_error = None
+        self._filter_actions = set()
+        if self.event_filter:
+            # Asterisk drops the other channels' events before they are sent
+            self.send_action("Filter", Operation="Add", Filter=self.event_filter)
+            self._filter_actions.add(str(self._action_id))
+            if self.on_queue_event:
+                self.send_action("Filter", Operation="Add", Filter="Event: (Queue|Agent)")
+                self._filter_actions.add(str(self._action_id))
+        # Load the channels that were already up before we connected
+        self.send_action("CoreShowChannels")
+        if self.on_queue_event:
+            self.send_action("QueueStatus")
+
+    def _initial_message(self, message):
+        """Handle a message read while connecting; True at the end of the CoreShowChannels list."""
+        if message.get("Event") == "CoreShowChannelsComplete":
+            return True
+        if message.get("Response") == "Error" and message.get("ActionID") in self._filter_actions:
+            # Usually a user without the "system" or "originate" write permission
+            self.filter_error = message.get("Message") or "Filter rejected"
+        if "Event" in message:
+            self.handle_event(message)
+        return False
+
+    def snapshot(self):
+        """Return the live channels as a list of dicts, oldest call first."""
+        now = time.monotonic()
+        calls = []
+        with self.lock:
+            for uniqueid, chan in list(self.channels.items()):
+                ended = chan["ended"]
+                if ended is not None and now - ended > self.linger:
+                    del self.channels[uniqueid]
+                    continue
+                calls.append({
+                    "channel": chan["channel"],
+                    "uniqueid": uniqueid,
+                    "linkedid": chan["linkedid"],
+                    "number": chan["number"] or "unknown",
+                    "context": chan["context"],
+                    "status": chan["status"],
+                    "duration": format_duration((ended or now) - chan["started"]),
+                    "elapsed": (ended or now) - chan["started"],
+                })
+        return calls
+
+    def _readline(self):
+        # A buffer of our own: a file from makefile() cannot be read any more after a timeout
+        while True:
+            end = self._buffer.find(b"\n") + 1
+            if end:
+                line, self._buffer = self._buffer[:end], self._buffer[end:]
+                return line
+            data = self.sock.recv(65536)
+            if not data:
+                return b""
+            self._buffer += data
+
+    def _read_message(self):
+        message = self._message
+        while True:
+            raw = self._readline()
+            if not raw:
+                raise AmiError("Connection closed by the server")
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            if not line:
+                if message:
+                    self._message = {}
+                    return message
+                continue
+            key, _, value = line.partition(":")
+            message[key.strip()] = value.strip()
+
+    def _read_loop(self):
+        try:
+            while self.connected:
+                try:
+                    message = self._read_message()
+                except socket.timeout:
+                    self.ping()
+                    continue
+                self._ping_sent = False
+                if "Event" in message:
+                    self.handle_event(message)
+                    if self.on_event:
+                        self.on_event()
+        except (AmiError, OSError, ValueError) as e:
+            if self.connected:
+                self.error = str(e)
+        self.connected = False
+
+    def ping(self):
+        """Called after ping_interval seconds without a message."""
+        if self._ping_sent:
+            raise AmiError(f"No answer to Ping in {self.ping_interval:g} s")
+        self._ping_sent = True
+        self.send_action("Ping")
+
+    def handle_event(self, event):
+        name = event["Event"]
+        if self.on_queue_event and name.startswith(("Queue", "Agent")):
+            self.on_queue_event(event)
+            return
+        uniqueid = event.get("Uniqueid")
+        if not uniqueid:
+            return
+        now = time.monotonic()
+
+        with self.lock:
+            if name in ("Newchannel", "CoreShowChannel"):
+                started = now
+                if name == "CoreShowChannel" and event.get("Duration"):
+                    started = now - parse_duration(event["Duration"])
+                self.channels[uniqueid] = {
+                    "channel": event.get("Channel", ""),
+                    "context": event.get("Context"),
+                    "linkedid": event.get("Linkedid") or uniqueid,
+                    "number": pick_number(event.get("CallerIDNum"), event.get("Exten")),
+                    "status": event.get("ChannelStateDesc", "Unknown"),
+                    "started": started,
+                    "ended": None,
+                }
+                return
+
+            chan = self.channels.get(uniqueid)
+            if chan is None:
+                return
+
+            if name == "Newstate":
+                chan["status"] = event.get("ChannelStateDesc", chan["status"])
+                if not chan["number"]:
+                    chan["number"] = pick_number(event.get("CallerIDNum"), event.get("ConnectedLineNum"))
+            elif name == "DialBegin":
+                chan["status"] = "Dialing"
+                dest = self.channels.get(event.get("DestUniqueid"))
+                if dest is not None and not dest["number"]:
+                    dest["number"] = chan["number"]
+            elif name == "Hangup":
+                chan["status"] = "Hangup"
+                chan["ended"] = now
@@ -0,0 +1,21 @@
+"""
+Where the settings and the local data files (history, CDR index, diagnostics) live.
+
+Windows: %APPDATA%\\MyApp, as before; macOS: ~/Library/Application Support/MyApp;
+Linux and the rest: $XDG_CONFIG_HOME/MyApp or ~/.config/MyApp. Nothing is
+created on import, the window makes the directory when it starts.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+APP_NAME = "MyApp"
+
+
+def config_dir(app=APP_NAME):
+    if sys.platform == "win32" and os.getenv("APPDATA"):
+        return Path(os.getenv("APPDATA")) / app
+    if sys.platform == "darwin":
+        return Path.home() / "Library" / "Application Support" / app
+    return Path(os.getenv("XDG_CONFIG_HOME") or Path.home() / ".config") / app
@@ -0,0 +1,431 @@
+"""
+Asyncio monitoring core.
+
+The same CallMonitor logic (call store, history, notifications, on_* hooks),
+driven by coroutines instead of threads: every server is a poll task and,
+in AMI mode, an event-reading task on one event loop, so a process follows
+many servers with a single thread. Everything is cancelled by stop(). AMI is
+spoken over asyncio streams; SSH needs the optional asyncssh package
+(pip install asyncssh).
+
+History writes and notifications are only queued from the loop; they keep
+their own writer threads, so the loop never waits for SQLite, SMTP or HTTP.
+MonitorLoop runs the loop in a background thread for code that is not async
+itself; the Tk window gets the results through UiDispatcher as before.
+"""
+
+import asyncio
+import os
+import threading
+import time
+import traceback
+
+from ami_client import AmiClient, AmiError
+from monitor import COMMAND_FAILED, NO_CONNECTION, CallMonitor, CdrUnavailable
+from poll_scheduler import ERROR, PollScheduler
+from queue_monitor import QUEUE_COMMAND
+
+
+class AsyncAmiClient(AmiClient):
+    """AmiClient on asyncio streams; the events are read by a task instead of a thread."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stream = None
+        self.writer = None
+
+    async def connect(self):
+        self.stream, self.writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port),
+                                                          self.timeout)
+        self._message = {}
+        banner = (await asyncio.wait_for(self.stream.readline(), self.timeout)).decode("utf-8", "replace").strip()
+        if not banner.startswith("Asterisk Call Manager"):
+            self.close()
+            raise AmiError(f"Unexpected AMI banner: {banner!r}")
+
+        self.send_action("Login", Username=self.username, Secret=self.secret, Events=self.events)
+        response = await asyncio.wait_for(self._read_message(), self.timeout)
+        if response.get("Response") != "Success":
+            self.close()
+            raise AmiError(response.get("Message", "Authentication failed"))
+
+        try:
+            self.subscribe()
+            while not self._initial_message(await asyncio.wait_for(self._read_message(), self.timeout)):
+                pass
+        except (AmiError, OSError, asyncio.TimeoutError):
+            self.close()
+            raise
+        self._ping_sent = False
+        self.connected = True
+        self.error = None
+        self._backoff = 0.0
+        self.reader = asyncio.get_running_loop().create_task(self._read_loop())
+
+    async def reconnect(self):
+        self._before_reconnect()
+        try:
+            await self.connect()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._reconnect_failed(e)
+            raise
+        self.reconnects += 1
+
+    def close(self):
+        self.connected = False
+        if self.reader:
+            self.reader.cancel()
+            self.reader = None
+        if self.writer:
+            try:
+                self.send_action("Logoff")
+            except (OSError, RuntimeError):
+                pass
+            self.writer.close()
+            self.writer = None
+
+    def send_action(self, action, **fields):
+        self._action_id += 1
+        lines = [f"Action: {action}", f"ActionID: {self._action_id}"]
+        lines += [f"{key}: {value}" for key, value in fields.items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("utf-8"))
+
+    async def _read_message(self):
+        message = self._message
+        while True:
+            raw = await self.stream.readline()
+            if not raw:
+                raise AmiError("Connection closed by the server")
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            if not line:
+                if message:
+                    self._message = {}
+                    return message
+                continue
+            key, _, value = line.partition(":")
+            message[key.strip()] = value.strip()
+
+    async def _read_loop(self):
+        try:
+            while self.connected:
+                try:
+                    message = await asyncio.wait_for(self._read_message(), self.ping_interval)
+                except asyncio.TimeoutError:
+                    self.ping()
+                    continue
+                self._ping_sent = False
+                if "Event" in message:
+                    self.handle_event(message)
+                    if self.on_event:
+                        self.on_event()
+        except (AmiError, OSError, ValueError) as e:
+            if self.connected:
+                self.error = str(e)
+        self.connected = False
+
+
+class AsyncSshConnection:
+    """SSH connection over asyncssh with the run() interface of SshConnection."""
+
+    def __init__(self, host, port, username, password, keepalive=15, timeout=10, metrics=None,
+                 key_file=None, use_agent=False):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.key_file = key_file and os.path.expanduser(key_file)
+        self.use_agent = use_agent
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.metrics = metrics
+        self.connection = None
+        self.connected_at = None
+        self.reconnects = 0
+        self.error = None
+
+    async def connect(self):
+        try:
+            import asyncssh
+        except ImportError:
+            raise RuntimeError("SSH on the asyncio core needs asyncssh (pip install asyncssh)") from None
+        options = {}
+        if self.key_file:
+            options.update(client_keys=[self.key_file], passphrase=self.password or None)
+        elif not self.use_agent:
+            options.update(client_keys=None, agent_path=None)
+        self.connection = await asyncio.wait_for(
+            asyncssh.connect(self.host, port=self.port, username=self.username, password=self.password or None,
+                             known_hosts=None, keepalive_interval=self.keepalive, **options),
+            self.timeout)
+        self.connected_at = time.time()
+        self.error = None
+
+    def is_alive(self):
+        return self.connection is not None
+
+    async def run(self, command, timeout=None):
+        """Run a command and return its stdout as text; reconnects once if the connection is gone."""
+        import asyncssh
+        for attempt in (1, 2):
+            if self.connection is None:
+                await self.connect()
+                self.reconnects += 1
+                if self.metrics:
+                    self.metrics.count("ssh.reconnects")
+            connection = self.connection
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(connection.run(command, check=False), timeout or self.timeout)
+            except (asyncssh.Error, OSError, asyncio.TimeoutError) as e:
+                self.error = str(e)
+                self._drop(connection)
+                if attempt == 2:
+                    raise
+                continue
+            if self.metrics:
+                self.metrics.observe("ssh.exec", time.perf_counter() - started)
+            return result.stdout or ""
+
+    async def close(self):
+        connection, self.connection = self.connection, None
+        if connection is not None:
+            connection.close()
+            await connection.wait_closed()
+
+    def _drop(self, connection):
+        if self.connection is connection:
+            connection.close()
+            self.connection = None
+
+
+class AsyncPollScheduler(PollScheduler):
+    """PollScheduler for a coroutine poll function, running as a task.
+
+    pause(), resume(), poll_now() and stop() may be called from any thread.
+    """
+
+    def __init__(self, poll, **options):
+        super().__init__(poll, **options)
+        self._wake = asyncio.Event()
+        self._resumed = asyncio.Event()
+        self._resumed.set()
+        self.loop = None
+        self.task = None
+
+    def start(self, loop=None):
+        self.loop = loop or asyncio.get_running_loop()
+        self._call(self._start_task)
+        return self
+
+    def stop(self):
+        self._call(self._stop)
+
+    def pause(self):
+        self._call(super().pause)
+
+    def resume(self):
+        self._call(super().resume)
+
+    def poll_now(self):
+        self._call(super().poll_now)
+
+    def _call(self, func):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            func()
+        else:
+            self.loop.call_soon_threadsafe(func)
+
+    def _start_task(self):
+        self.task = self.loop.create_task(self._run())
+
+    def _stop(self):
+        PollScheduler.stop(self)
+        if self.task:
+            self.task.cancel()
+
+    async def _run(self):
+        while True:
+            await self._resumed.wait()
+            if self._stopped:
+                return
+            self._wake.clear()
+            try:
+                activity = await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                traceback.print_exc()
+                activity = ERROR
+            self.last_delay = self.next_delay(activity)
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.last_delay)
+            except asyncio.TimeoutError:
+                pass
+            if self._stopped:
+                return
+
+
+class AsyncCallMonitor(CallMonitor):
+    """CallMonitor whose connect(), poll() and stop() are coroutines run on an event loop."""
+
+    loop = None
+
+    async def connect(self):
+        self.loop = asyncio.get_running_loop()
+        try:
+            if self.ami_port:
+                self.ami = AsyncAmiClient(self.host, self.ami_port, self.ami_username, self.ami_secret,
+                                          event_filter=self.channel_filter and self.channel_filter.ami_filter())
+                self.ami.on_queue_event = self.queue_event if self.queues else None
+                await self.ami.connect()
+                self.connected_at = time.time()
+            else:
+                self.client = AsyncSshConnection(self.host, self.port, self.username, self.password,
+                                                 keepalive=self.keepalive, metrics=self.metrics,
+                                                 key_file=self.key_file, use_agent=self.use_agent)
+                await self.client.connect()
+                self.connected_at = self.client.connected_at
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if self.ami:
+                self.ami.close()
+            self.ami = None
+            self.client = None
+            self.metrics.count("errors.connect")
+            self.feed_status(False, e)
+            self.on_connect_failed(e)
+            return False
+        self.feed_status(True)
+        self.on_connected()
+        if self.ami:
+            self.check_ami_filter()
+        return True
+
+    def start_polling(self, **options):
+        """Start the poll task; may be called from another thread once connect() has run."""
+        self.scheduler = AsyncPollScheduler(self.poll, **options).start(self.loop)
+        if self.ami:
+            self.ami.on_event = self.scheduler.poll_now  # AMI events trigger a poll right away
+        return self.scheduler
+
+    async def stop(self):
+        if self.scheduler:
+            self.scheduler.stop()
+        if self.ami:
+            self.ami.close()
+        if self.client:
+            await self.client.close()
+
+    def drop_ami(self):
+        # May be called from another thread, the connection belongs to the loop
+        self.loop.call_soon_threadsafe(self.ami.close)
+        if self.scheduler:
+            self.scheduler.poll_now()
+
+    async def poll(self):
+        polled_at = time.perf_counter()
+        self.metrics.count("polls")
+        try:
+            if self.ami:
+                if not self.ami.connected and not await self.reconnect_ami():
+                    return ERROR
+                return self.poll_ami(polled_at)  # the channels are already in memory
+            return await self.poll_ssh(polled_at)
+        finally:
+            self.metrics.observe("poll", time.perf_counter() - polled_at)
+
+    async def reconnect_ami(self):
+        try:
+            await self.ami.reconnect()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return self.ami_lost(e)
+        return self.ami_reconnected()
+
+    async def poll_ssh(self, polled_at):
+        if not self.client:
+            self.poll_error(NO_CONNECTION, None)
+            return ERROR
+
+        try:
+            output = await self.client.run(self.command)
+            if self.client.connected_at != self.connected_at:
+                self.connected_at = self.client.connected_at
+                self.on_connected()  # the connection was re-established
+            rows = self.rows_from_concise(output)
+            if self.queues_due():
+                self.read_queues(await self.client.run(QUEUE_COMMAND))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if not self.client.is_alive():
+                self.on_disconnected(e)
+            self.poll_error(COMMAND_FAILED, e)
+            return ERROR
+
+        self.report(rows, polled_at)
+        return self.activity(rows)
+
+    def read_cdr(self, answered, limit=200):
+        # CDR is read over SFTP, which only the threaded core has
+        raise CdrUnavailable()
+
+
+async def run(monitor, retry=30.0, **options):
+    """Connect (trying again every retry seconds) and poll until cancelled."""
+    while not await monitor.connect():
+        await asyncio.sleep(retry)
+    scheduler = monitor.start_polling(**options)
+    try:
+        await scheduler.task
+    finally:
+        await monitor.stop()
+
+
+class MonitorLoop:
+    """An event loop in a background thread, for callers that are not async."""
+
+    def __init__(self, name="monitor-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def submit(self, coroutine):
+        """Schedule a coroutine on the loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def stop(self, timeout=5.0):
+        """Cancel every task and stop the loop."""
+        if not self.loop.is_running():
+            return
+        try:
+            self.submit(self._cancel_all()).result(timeout)
+        except Exception:
+            traceback.print_exc()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    @staticmethod
+    async def _cancel_all():
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,86 @@
+"""
+Benchmark for the SQLite call history.
+
+Usage:  python -m benchmarks.bench_history [--days 90] [--calls-per-day 2000] [--json out.json]
+
+Fills a temporary history with synthetic calls through the batched writer,
+then times the queries behind the Missed / Answered views and the
+per-number lookup.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from call_store import ANSWERED, MISSED
+from history import CallHistory
+
+
+def make_rows(days, calls_per_day, numbers=5000, seed=0):
+    rng = random.Random(seed)
+    first_day = time.time() - days * 86400
+    rows = []
+    for index in range(days * calls_per_day):
+        at = first_day + index * 86400 / calls_per_day
+        answered = rng.random() < 0.7
+        ring = rng.uniform(1, 30)
+        talk = rng.uniform(10, 600) if answered else 0.0
+        rows.append((time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(at)), f"pbx{rng.randint(1, 3)}",
+                     f"{at:.6f}", f"SIP/trunk-{index:08x}", f"79{rng.randrange(numbers):09d}",
+                     round(ring, 1), round(talk, 1), round(ring + talk, 1), ANSWERED if answered else MISSED))
+    return rows
+
+
+def measure(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--calls-per-day", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    rows = make_rows(args.days, args.calls_per_day)
+    with tempfile.TemporaryDirectory() as folder:
+        history = CallHistory(os.path.join(folder, "history.sqlite"))
+        start = time.perf_counter()
+        history.add_rows(rows)
+        history.flush()
+        write = time.perf_counter() - start
+        print(f"write   {len(rows)} calls in {write:.2f} s ({len(rows) / write:,.0f} calls/s)")
+
+        today = rows[-1][0][:10]
+        number = rows[-1][4]
+        queries = {
+            "missed (200 newest)": lambda: history.calls(False),
+            "answered (200 newest)": lambda: history.calls(True),
+            "missed today, count": lambda: history.count(False, today),
+            "answered today, one server": lambda: history.calls(True, today, server="pbx1"),
+            "one number": lambda: history.for_number(number),
+        }
+        results = [{"query": "write", "calls": len(rows), "seconds": write}]
+        for name, query in queries.items():
+            elapsed = measure(query, args.repeat)
+            results.append({"query": name, "calls": len(rows), "seconds": elapsed})
+            print(f"{name:<28} {elapsed * 1000:>8.2f} ms")
+        history.close()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
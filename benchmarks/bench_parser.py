@@ -0,0 +1,78 @@
+"""
+Parse benchmark for `core show channels` output.
+
+Usage:  python -m benchmarks.bench_parser [--sizes 10000 50000 100000] [--json out.json]
+
+Prints the per-line parse cost of the concise parser, the verbose regex parser
+and the old split/isdigit loop that used to live in get_active_calls.
+"""
+
+import argparse
+import json
+import time
+
+from channel_parser import parse_concise, parse_verbose
+from tools.synthetic_channels import concise_dump, make_channels, verbose_dump
+
+
+def parse_legacy(text):
+    # The loop get_active_calls used before channel_parser, kept for comparison
+    calls = []
+    for line in text.splitlines()[1:-1]:
+        part = line.split()
+        if len(part) > 7:
+            number = None
+            for word in part:
+                if word.isdigit() and len(word) >= 7:
+                    number = word
+                    break
+            status = "Unknown"
+            if "Ringing" in line:
+                status = "Ringing"
+            elif "Up" in line:
+                status = "Up"
+            elif "Dialing" in line:
+                status = "Dialing"
+            elif "Setup" in line:
+                status = "Setup"
+            calls.append({"number": number or "unknown", "status": status, "duration": part[-1]})
+    return calls
+
+
+def measure(parse, text, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'parser':<10} {'channels':>9} {'total ms':>10} {'ns/line':>9}")
+    for size in args.sizes:
+        channels = make_channels(size)
+        dumps = {"concise": (parse_concise, concise_dump(channels)),
+                 "verbose": (parse_verbose, verbose_dump(channels)),
+                 "legacy": (parse_legacy, verbose_dump(channels))}
+        for name, (parse, text) in dumps.items():
+            elapsed = measure(parse, text, args.repeat)
+            per_line = elapsed / size * 1e9
+            results.append({"parser": name, "channels": size, "seconds": elapsed, "ns_per_line": per_line})
+            print(f"{name:<10} {size:>9} {elapsed * 1000:>10.1f} {per_line:>9.0f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+End-to-end benchmark: poll -> parse -> render against a local fake PBX.
+
+Usage:  python -m benchmarks.bench_pipeline [--calls 500] [--churn 20] [--duration 10]
+        python -m benchmarks.bench_pipeline --replay session.jsonl --speed 10
+        python -m benchmarks.bench_pipeline --backend ami --calls 200
+        python -m benchmarks.bench_pipeline --json now.json --baseline before.json
+
+The monitor polls a stub SSH server (or a stub AMI server) back to back. The
+load is synthetic (N calls, R of them replaced per second) or a recording
+made with tools.recording. "Render" is the part of the window's refresh that
+does not need Tk: merging the servers into one table and diffing it against
+the previous one. With --baseline the run fails (exit code 1) when polls per
+second drop or the poll p95 grows by more than --tolerance.
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+
+from metrics import Metrics
+from monitor import CallMonitor
+from snapshots import diff_snapshots, merge_sources
+from tools.fake_ami import FakeAmiServer
+from tools.fake_ssh import FakeSshServer
+from tools.load_generator import CallLoad
+from tools.recording import Replay, load_recording
+
+
+class BenchMonitor(CallMonitor):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.table = {}
+        self.rendered = 0
+
+    def on_calls(self, rows, polled_at):
+        started = time.perf_counter()
+        live = {key: self.calls.get(key).started for key in rows if self.calls.get(key).ended is None}
+        table = merge_sources({self.name: rows}, {self.name: live})
+        added, changed, removed = diff_snapshots(self.table, table)
+        self.table = table
+        self.rendered += len(added) + len(changed) + len(removed)
+        self.metrics.observe("render", time.perf_counter() - started)
+        self.metrics.observe("pipeline", time.perf_counter() - polled_at)
+
+    def on_connect_failed(self, error):
+        print(f"connect failed: {error}", file=sys.stderr)
+
+    def on_poll_error(self, kind, error):
+        print(f"poll error ({kind}): {error}", file=sys.stderr)
+
+
+def start_server(args, stopped):
+    if args.backend == "ami":
+        if args.replay:
+            sys.exit("--replay needs the ssh backend")
+        server = FakeAmiServer().start()
+        load = CallLoad(args.calls, args.churn, seed=args.seed)
+        threading.Thread(target=load.drive, args=(server, stopped), daemon=True).start()
+        return server
+    if args.replay:
+        responder = Replay(load_recording(args.replay), speed=args.speed).responder()
+    else:
+        responder = CallLoad(args.calls, args.churn, seed=args.seed).responder()
+    return FakeSshServer(responder, username="bench", password="bench").start()
+
+
+def run(args):
+    stopped = threading.Event()
+    server = start_server(args, stopped)
+    metrics = Metrics(window=100000)
+    monitor = BenchMonitor("127.0.0.1", server.port, "bench", "bench",
+                           ami_port=server.port if args.backend == "ami" else None, metrics=metrics)
+    if not monitor.connect():
+        server.stop()
+        sys.exit(2)
+    if args.backend == "ami":
+        time.sleep(0.5)  # let the initial calls arrive over the event stream
+
+    for _ in range(args.warmup):
+        monitor.poll()
+    metrics = monitor.metrics = Metrics(window=100000)
+    if monitor.client:
+        monitor.client.metrics = metrics
+
+    started = time.perf_counter()
+    while time.perf_counter() - started < args.duration:
+        monitor.poll()
+    elapsed = time.perf_counter() - started
+
+    stopped.set()
+    monitor.stop()
+    server.stop()
+
+    snapshot = metrics.snapshot()
+    counters = snapshot["counters"]
+    return {
+        "backend": args.backend,
+        "source": args.replay or f"synthetic {args.calls} calls, churn {args.churn}/s",
+        "seconds": elapsed,
+        "polls": counters.get("polls", 0),
+        "polls_per_s": counters.get("polls", 0) / elapsed,
+        "channels_per_s": counters.get("channels", 0) / elapsed,
+        "rows_rendered": monitor.rendered,
+        "calls_ended": counters.get("calls.ended", 0),
+        "errors": sum(value for name, value in counters.items() if name.startswith("errors.")),
+        "stages_ms": snapshot["stages_ms"],
+    }
+
+
+def print_result(result):
+    print(f"{result['source']} over {result['backend']}, {result['seconds']:.1f} s")
+    print(f"polls      {result['polls']:>8}  ({result['polls_per_s']:,.1f}/s)")
+    print(f"channels   {result['channels_per_s']:>14,.0f}/s")
+    print(f"rendered   {result['rows_rendered']:>8} rows changed, {result['calls_ended']} calls ended, "
+          f"{result['errors']} errors")
+    print(f"{'stage':<12} {'p50':>8} {'p95':>8} {'p99':>8}  ms")
+    for name, stage in result["stages_ms"].items():
+        print(f"{name:<12} {stage['p50']:>8.2f} {stage['p95']:>8.2f} {stage['p99']:>8.2f}")
+
+
+def regressions(result, baseline, tolerance):
+    """Compare with an earlier result; returns a list of what got worse by more than tolerance."""
+    found = []
+    if result["polls_per_s"] < baseline["polls_per_s"] * (1 - tolerance):
+        found.append(f"polls/s {baseline['polls_per_s']:.1f} -> {result['polls_per_s']:.1f}")
+    old = baseline["stages_ms"].get("poll", {}).get("p95")
+    new = result["stages_ms"].get("poll", {}).get("p95")
+    if old and new and new > old * (1 + tolerance):
+        found.append(f"poll p95 {old:.2f} ms -> {new:.2f} ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=("ssh", "ami"), default="ssh")
+    parser.add_argument("--calls", type=int, default=500, help="concurrent calls of the synthetic load")
+    parser.add_argument("--churn", type=float, default=20.0, help="calls replaced per second")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay", help="use a recording from tools.recording instead of the synthetic load")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed factor")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of back-to-back polling")
+    parser.add_argument("--warmup", type=int, default=5, help="polls before measuring")
+    parser.add_argument("--json", help="also write the result to this file")
+    parser.add_argument("--baseline", help="result of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    result = run(args)
+    print_result(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        found = regressions(result, baseline, args.tolerance)
+        for line in found:
+            print(f"REGRESSION: {line}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+        print(f"no regression against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark for the queue monitoring.
+
+Usage:  python -m benchmarks.bench_queues [--queues 50] [--agents 200] [--events 100000] [--json out.json]
+
+Builds the `queue show` output of a call centre, times parsing it and
+applying it to a QueueBoard (what every SSH poll does), then feeds random
+agent and caller events (what AMI does) and prints the cost per event and
+how many queues a view would have to redraw after each batch of 100.
+"""
+
+import argparse
+import json
+import random
+import time
+
+from queue_monitor import QueueBoard, parse_queue_show
+
+STATES = ("Not in use", "In use", "Ringing", "Unavailable")
+
+
+def make_queue_show(queues, agents, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    for queue in range(queues):
+        waiting = rng.randrange(5)
+        lines.append(f"queue{queue:03d}       has {waiting} calls (max unlimited) in 'rrmemory' strategy "
+                     f"(12s holdtime, 95s talktime), W:0, C:{rng.randrange(500)}, A:{rng.randrange(50)}, "
+                     f"SL:{rng.uniform(60, 100):.1f}% within 20s")
+        lines.append("   Members: ")
+        for agent in range(agents):
+            paused = " (paused)" if rng.random() < 0.1 else ""
+            lines.append(f"      Agent {agent} (PJSIP/{queue:03d}{agent:03d} from hint:{agent}@ext-local) "
+                         f"(ringinuse disabled) (dynamic) ({rng.choice(STATES)}){paused} "
+                         f"has taken {rng.randrange(100)} calls (last was 60 secs ago)")
+        lines.append("   Callers: ")
+        for position in range(waiting):
+            lines.append(f"      {position + 1}. PJSIP/trunk-{queue:03d}{position:05d} (wait: 0:{rng.randrange(60):02d}, prio: 0)")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def make_events(count, queues, agents, seed=0):
+    rng = random.Random(seed)
+    events = []
+    for index in range(count):
+        queue = f"queue{rng.randrange(queues):03d}"
+        if rng.random() < 0.8:
+            interface = f"PJSIP/{queue[5:]}{rng.randrange(agents):03d}"
+            events.append({"Event": "QueueMemberStatus", "Queue": queue, "Interface": interface,
+                           "Status": rng.choice("1126"), "Paused": "0", "CallsTaken": str(rng.randrange(100))})
+        else:
+            events.append({"Event": "QueueCallerJoin", "Queue": queue, "Uniqueid": str(index)})
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queues", type=int, default=50)
+    parser.add_argument("--agents", type=int, default=200)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    output = make_queue_show(args.queues, args.agents)
+    board = QueueBoard()
+    start = time.perf_counter()
+    parsed = parse_queue_show(output)
+    parse = time.perf_counter() - start
+    start = time.perf_counter()
+    board.update_from_show("pbx", parsed)
+    first = time.perf_counter() - start
+    board.pop_changed()
+    parsed = parse_queue_show(output)
+    start = time.perf_counter()
+    board.update_from_show("pbx", parsed)
+    again = time.perf_counter() - start
+    unchanged = len(board.pop_changed())
+
+    events = make_events(args.events, args.queues, args.agents)
+    redrawn = []
+    start = time.perf_counter()
+    for index, event in enumerate(events, 1):
+        board.handle_event("pbx", event)
+        if index % 100 == 0:
+            redrawn.append(len(board.pop_changed()))
+    elapsed = time.perf_counter() - start
+
+    result = {"queues": args.queues, "agents": args.agents, "lines": output.count("\n") + 1,
+              "parse_ms": parse * 1000, "apply_first_ms": first * 1000, "apply_unchanged_ms": again * 1000,
+              "changed_when_unchanged": unchanged, "us_per_event": elapsed / len(events) * 1e6,
+              "queues_redrawn_per_100_events": sum(redrawn) / len(redrawn)}
+    print(f"queue show: {result['lines']} lines, parse {result['parse_ms']:.1f} ms, "
+          f"apply {result['apply_first_ms']:.1f} ms (unchanged: {result['apply_unchanged_ms']:.1f} ms, "
+          f"{unchanged} queues changed)")
+    print(f"events: {result['us_per_event']:.2f} us/event, "
+          f"{result['queues_redrawn_per_100_events']:.1f} of {args.queues} queues to redraw per 100 events")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
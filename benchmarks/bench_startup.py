@@ -0,0 +1,130 @@
+"""
+Startup benchmark: how long until the window is up.
+
+Usage:  python -m benchmarks.bench_startup [--module main_en] [--runs 5]
+        python -m benchmarks.bench_startup --json now.json --baseline before.json
+
+Every run is a fresh interpreter with an empty settings folder. "import" is
+the time to import the module, "window" the time from the start of the
+import until the first frame of the window is drawn (only measured when
+there is a display). The heavy modules that should only be loaded on the
+first connect (paramiko, asyncio, smtplib, urllib.request) are reported if
+the import pulls them in. With --baseline the run fails (exit code 1) when
+a median grows by more than --tolerance or a heavy module is loaded.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HEAVY_MODULES = ("paramiko", "asyncio", "smtplib", "urllib.request")
+
+IMPORT_CODE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+print(json.dumps({{"import": time.perf_counter() - started,
+                  "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+WINDOW_CODE = """
+import json, time
+started = time.perf_counter()
+import tkinter
+
+def mainloop(self, n=0):
+    # The first frame is drawn: report and close instead of running the loop
+    self.update()
+    print(json.dumps({{"window": time.perf_counter() - started}}), flush=True)
+    self.destroy()
+
+tkinter.Misc.mainloop = mainloop
+import {module}
+{module}.start_gui()
+"""
+
+
+def run_child(code, settings_dir):
+    env = dict(os.environ, APPDATA=settings_dir, XDG_CONFIG_HOME=settings_dir)
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, timeout=60)
+    for line in result.stdout.splitlines():
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "no result")
+
+
+def has_display():
+    try:
+        import tkinter
+        tkinter.Tk().destroy()
+        return True
+    except Exception:
+        return False
+
+
+def run(args):
+    imports, windows, heavy = [], [], set()
+    window = has_display() and not args.no_window
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as settings_dir:
+            result = run_child(IMPORT_CODE.format(module=args.module, heavy=HEAVY_MODULES), settings_dir)
+            imports.append(result["import"])
+            heavy.update(result["heavy"])
+            if window:
+                windows.append(run_child(WINDOW_CODE.format(module=args.module), settings_dir)["window"])
+    return {"module": args.module, "runs": args.runs,
+            "import_ms": statistics.median(imports) * 1000,
+            "window_ms": statistics.median(windows) * 1000 if windows else None,
+            "heavy_modules": sorted(heavy)}
+
+
+def regressions(result, baseline, tolerance):
+    """Compare with an earlier result; returns a list of what got worse by more than tolerance."""
+    found = []
+    for key in ("import_ms", "window_ms"):
+        old, new = baseline.get(key), result.get(key)
+        if old and new and new > old * (1 + tolerance):
+            found.append(f"{key} {old:.1f} -> {new:.1f}")
+    if result["heavy_modules"]:
+        found.append("loaded on import: " + ", ".join(result["heavy_modules"]))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="main_en", help="main_en or main_ru")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--no-window", action="store_true", help="only time the import")
+    parser.add_argument("--json", help="also write the result to this file")
+    parser.add_argument("--baseline", help="result of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed slowdown, 0.3 = 30%%")
+    args = parser.parse_args()
+
+    result = run(args)
+    window = f"{result['window_ms']:.1f} ms" if result["window_ms"] is not None else "- (no display)"
+    print(f"{result['module']}: import {result['import_ms']:.1f} ms   window {window}   "
+          f"median of {result['runs']}")
+    if result["heavy_modules"]:
+        print("loaded on import: " + ", ".join(result["heavy_modules"]))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        found = regressions(result, baseline, args.tolerance)
+        for line in found:
+            print(f"REGRESSION: {line}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+        print(f"no regression against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark for the live statistics.
+
+Usage:  python -m benchmarks.bench_stats [--sizes 10000 100000 1000000] [--numbers 5000] [--json out.json]
+
+Feeds finished calls into LiveStats, one every 0.5 s of simulated time, and
+prints the cost per call. It should not grow with the number of calls that
+came before; drawing the dashboard is timed separately.
+"""
+
+import argparse
+import json
+import random
+import time
+
+from call_store import CallStore
+from live_stats import LiveStats
+
+
+def make_records(count, numbers, seed=0):
+    rng = random.Random(seed)
+    store = CallStore(max_finished=count)
+    for index in range(count):
+        at = index * 0.5
+        key = f"SIP/trunk-{index:08x}"
+        store.update(key, number=f"79{rng.randrange(numbers):09d}", status="Ringing", now=at)
+        if rng.random() < 0.7:
+            store.update(key, status="Up", now=at + rng.uniform(1, 30))
+        store.finish(key, at + rng.uniform(31, 600))
+    records = store.pop_ended()
+    records.sort(key=lambda record: record.ended)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--numbers", type=int, default=5000)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        records = make_records(size, args.numbers)
+        clock = [0.0]
+        stats = LiveStats(clock=lambda: clock[0])
+        start = time.perf_counter()
+        for record in records:
+            clock[0] = record.ended
+            stats.call_started(1, record.started)
+            stats.call_ended(record, record.ended)
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        stats.report()
+        report = time.perf_counter() - start
+        results.append({"calls": size, "us_per_call": elapsed / size * 1e6, "report_ms": report * 1000})
+        print(f"{size:>9} calls  {elapsed / size * 1e6:>6.2f} us/call  dashboard {report * 1000:>6.2f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Small always-on-top window in the corner of the screen for the incoming calls.
+
+There is only ever one popup: a new batch of calls replaces the text of the
+one that is already shown and restarts its timer. A click closes it.
+"""
+
+import tkinter as tk
+
+TIMEOUT_MS = 8000
+
+
+class CallPopup:
+    def __init__(self, root, timeout_ms=TIMEOUT_MS, bg="#FFF3D6"):
+        self.root = root
+        self.timeout_ms = timeout_ms
+        self.bg = bg
+        self.window = None
+        self.job = None
+
+    def show(self, title, lines):
+        if self.window is None:
+            self.window = tk.Toplevel(self.root, bg=self.bg, bd=1, relief=tk.SOLID)
+            self.window.overrideredirect(True)
+            self.window.attributes("-topmost", True)
+            self.title = tk.Label(self.window, font=("Helvetica", 11, "bold"), fg="#8C4A27", bg=self.bg,
+                                  anchor="w")
+            self.title.pack(fill=tk.X, padx=10, pady=(8, 2))
+            self.text = tk.Label(self.window, font=("Courier New", 10), fg="#003366", bg=self.bg,
+                                 justify=tk.LEFT, anchor="w")
+            self.text.pack(fill=tk.X, padx=10, pady=(0, 8))
+            for widget in (self.window, self.title, self.text):
+                widget.bind("<Button-1>", lambda event: self.close())
+        self.title.config(text=title)
+        self.text.config(text="\n".join(lines))
+        self.window.update_idletasks()
+        width, height = self.window.winfo_reqwidth(), self.window.winfo_reqheight()
+        x = self.window.winfo_screenwidth() - width - 20
+        y = self.window.winfo_screenheight() - height - 60
+        self.window.geometry(f"+{x}+{y}")
+        if self.job:
+            self.root.after_cancel(self.job)
+        self.job = self.root.after(self.timeout_ms, self.close)
+
+    def close(self):
+        if self.job:
+            self.root.after_cancel(self.job)
+            self.job = None
+        if self.window is not None:
+            self.window.destroy()
+            self.window = None
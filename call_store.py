@@ -0,0 +1,309 @@
+"""
+Bounded in-memory store of the calls seen by the monitor.
+
+Every call is kept once, keyed by its channel name (SSH polling) or uniqueid
+(AMI), and updated in place on each refresh. Finished calls are evicted when
+they get older than max_age seconds or when there are more than max_finished
+of them.
+
+Each record also follows the call through Setup -> Ringing -> Up -> Hangup
+with time.monotonic() timestamps, so ring time, talk time and duration are
+counted locally instead of being read from the PBX on every poll, and a
+finished call is classified as answered or missed by whether it was ever Up.
+
+A call is made of legs: the channel that started it and the channels it
+dialed (a ring-all to five phones is six channels). Every leg is kept and
+shown, but only the first one is a call in pop_ringing(), pop_ended() and
+active_count(); a leg that is answered makes its call answered. The legs
+are linked by the caller (the AMI Linkedid, or the bridge of a dialed
+channel over SSH); a dialed leg whose call is not known is never reported.
+
+A call missing from one poll is only finished when the next poll misses it
+too, so a dropped line of output or a resync does not end it, and a call
+is put in pop_ended() once even if it shows up again after that.
+"""
+
+import time
+from collections import OrderedDict
+
+from channel_parser import format_duration
+
+SETUP = "Setup"
+RINGING = "Ringing"
+UP = "Up"
+HANGUP = "Hangup"
+
+# Asterisk channel states (ChannelStateDesc / `core show channels`) -> call phase;
+# everything else (Down, Rsrvd, OffHook, Dialing, ...) is still Setup
+PHASES = {"Ring": RINGING, "Ringing": RINGING, "Pre-ring": RINGING, "Up": UP, "Hangup": HANGUP}
+PHASE_ORDER = {SETUP: 0, RINGING: 1, UP: 2, HANGUP: 3}
+
+ANSWERED = "answered"
+MISSED = "missed"
+
+
+def phase_of(status):
+    return PHASES.get(status, SETUP)
+
+
+class CallRecord:
+    __slots__ = ("key", "channel", "number", "status", "phase", "transitions",
+                 "started", "ring_at", "answered_at", "first_seen", "last_seen", "ended",
+                 "missing_since", "reported", "leg_of")
+
+    def __init__(self, key, channel, now, started=None):
+        self.key = key
+        self.channel = channel
+        self.number = "unknown"
+        self.status = "Unknown"
+        self.phase = SETUP
+        self.started = now if started is None else started
+        self.transitions = [(SETUP, self.started)]  # (phase, monotonic time)
+        self.ring_at = None
+        self.answered_at = None
+        self.first_seen = now
+        self.last_seen = now
+        self.ended = None
+        self.missing_since = None  # time of the first poll that did not see it
+        self.reported = False      # already returned by pop_ended()
+        self.leg_of = None         # None for a call of its own, else the key of its first leg ("" if unknown)
+
+    def enter(self, phase, now):
+        """Move to a later phase; a call never goes back (e.g. from Up to Ringing)."""
+        if PHASE_ORDER[phase] <= PHASE_ORDER[self.phase]:
+            return False
+        if phase == RINGING:
+            self.ring_at = now
+        if phase == UP:
+            self.answered_at = now
+        self.phase = phase
+        self.transitions.append((phase, now))
+        return True
+
+    def reopen(self):
+        # A channel that was missing from one poll showed up again
+        if self.phase == HANGUP:
+            self.transitions.pop()
+            self.phase = self.transitions[-1][0]
+        self.ended = None
+
+    def ring_time(self, now=None):
+        if self.ring_at is None:
+            return 0.0
+        end = self.answered_at or self.ended or (time.monotonic() if now is None else now)
+        return max(0.0, end - self.ring_at)
+
+    def talk_time(self, now=None):
+        if self.answered_at is None:
+            return 0.0
+        end = self.ended or (time.monotonic() if now is None else now)
+        return max(0.0, end - self.answered_at)
+
+    def total_time(self, now=None):
+        end = self.ended or (time.monotonic() if now is None else now)
+        return max(0.0, end - self.started)
+
+    @property
+    def duration(self):
+        return format_duration(self.total_time())
+
+    @property
+    def outcome(self):
+        """ANSWERED or MISSED once the call has ended, None while it is going on."""
+        if self.ended is None:
+            return None
+        return ANSWERED if self.answered_at is not None else MISSED
+
+    def as_dict(self, now=None):
+        return {"number": self.number, "status": self.status, "phase": self.phase,
+                "duration": format_duration(self.total_time(now)),
+                "ring_time": round(self.ring_time(now), 1), "talk_time": round(self.talk_time(now), 1),
+                "outcome": self.outcome}
+
+    def __repr__(self):
+        return f"CallRecord({self.key!r}, {self.number!r}, {self.phase!r}, {self.duration!r})"
+
+
+class CallStore:
+    def __init__(self, max_age=3600, max_finished=1000):
+        self.max_age = max_age
+        self.max_finished = max_finished
+        self.calls = {}                # key -> CallRecord
+        self.finished = OrderedDict()  # key -> CallRecord, oldest hangup first
+        self.by_number = {}            # number -> set of keys
+        self.by_status = {}            # status -> set of keys
+        self.ended = []                # calls finished since the last pop_ended()
+        self.ringing = []              # calls that started ringing since the last pop_ringing()
+        self.created = 0               # calls first seen since the last pop_created()
+        self.missing = 0               # live calls that the last poll did not see
+        self.legs = set()              # keys of the live legs that are part of another call
+
+    def __len__(self):
+        return len(self.calls)
+
+    def __contains__(self, key):
+        return key in self.calls
+
+    def get(self, key):
+        return self.calls.get(key)
+
+    def update(self, key, number=None, status=None, elapsed=None, channel=None, now=None,
+               dialed=False, leg_of=None):
+        """Create or update the call with this key and return its record.
+
+        elapsed is how long the PBX says the channel exists, in seconds; it dates
+        the start of a call that was already going on when it was first seen.
+        dialed tells a channel that was dialed by another one, and leg_of the key
+        of the channel that started its call, if known.
+        """
+        now = time.monotonic() if now is None else now
+        record = self.calls.get(key)
+        at = now
+        if record is None:
+            started = now - elapsed if elapsed else now
+            record = CallRecord(key, channel or key, now, started)
+            at = started  # the call may have been ringing or talking for a while already
+            record.leg_of = self._call_of(key, dialed, leg_of)
+            self.calls[key] = record
+            if record.leg_of is None:
+                self.created += 1
+            else:
+                self.legs.add(key)
+            self._index(self.by_number, record.number, key)
+            self._index(self.by_status, record.status, key)
+        else:
+            if record.ended is not None and status != "Hangup":
+                record.reopen()
+                self.finished.pop(key, None)
+                if record.leg_of is not None:
+                    self.legs.add(key)
+                if record in self.ended:
+                    self.ended.remove(record)  # not reported yet: report it once, when it really ends
+            if record.leg_of == "":
+                # A dialed leg is linked to its call once bridged (or becomes one, if that call is not shown)
+                record.leg_of = self._call_of(key, dialed, leg_of)
+                if record.leg_of is None:
+                    self.legs.discard(key)
+                    self.created += 1
+
+        if number and number != record.number:
+            self._unindex(self.by_number, record.number, key)
+            record.number = number
+            self._index(self.by_number, number, key)
+        if status and status != record.status:
+            self._unindex(self.by_status, record.status, key)
+            record.status = status
+            self._index(self.by_status, status, key)
+        if status:
+            phase = phase_of(status)
+            if phase == HANGUP:
+                self.finish(key, now)
+            elif record.enter(phase, at) and record.leg_of is None and phase == RINGING:
+                self.ringing.append(record)
+        record.last_seen = now
+        record.missing_since = None
+        if record.leg_of:
+            self._update_call(self.calls.get(record.leg_of), record, at)
+        return record
+
+    def _call_of(self, key, dialed, leg_of):
+        """The leg_of of a new record: None if it is a call of its own."""
+        if leg_of is not None and leg_of != key:
+            first = self.calls.get(leg_of)
+            if first is None:
+                return None  # the channel that dialed it is not shown (filtered out): this one is the call
+            return leg_of if first.leg_of is None else first.leg_of
+        return "" if dialed else None
+
+    def _update_call(self, call, leg, at):
+        # An answered leg answers its call; a leg may also know the number the call does not
+        if call is None or call.ended is not None:
+            return
+        if leg.answered_at is not None and call.answered_at is None:
+            call.enter(UP, max(at, call.started))
+        if call.number == "unknown" and leg.number != "unknown":
+            self._unindex(self.by_number, call.number, call.key)
+            call.number = leg.number
+            self._index(self.by_number, call.number, call.key)
+
+    def finish(self, key, now=None):
+        record = self.calls.get(key)
+        if record is None or record.ended is not None:
+            return
+        record.ended = time.monotonic() if now is None else now
+        record.enter(HANGUP, record.ended)
+        self.finished[key] = record
+        self.legs.discard(key)
+        if not record.reported and record.leg_of is None:
+            self.ended.append(record)
+
+    def finish_missing(self, seen_keys, now=None):
+        """Finish the active calls that are not in seen_keys, nor were in the previous poll."""
+        now = time.monotonic() if now is None else now
+        self.missing = 0
+        for key, record in list(self.calls.items()):
+            if record.ended is None and key not in seen_keys:
+                if record.missing_since is None:
+                    record.missing_since = now  # give it one more poll
+                    self.missing += 1
+                else:
+                    # It hung up somewhere between the last poll that saw it and the first one that did not
+                    self.finish(key, (record.last_seen + record.missing_since) / 2)
+        self.evict(now)
+
+    def pop_ended(self):
+        """Return the calls that finished since the previous call, oldest first; each call only once."""
+        ended, self.ended = self.ended, []
+        for record in ended:
+            record.reported = True
+        return ended
+
+    def pop_ringing(self):
+        """Return the calls that started ringing since the previous call, oldest first."""
+        ringing, self.ringing = self.ringing, []
+        return ringing
+
+    def pop_created(self):
+        """Return how many calls were first seen since the previous call."""
+        created, self.created = self.created, 0
+        return created
+
+    def active_count(self):
+        """The live calls, not counting the legs of other calls."""
+        return len(self.calls) - len(self.finished) - len(self.legs)
+
+    def evict(self, now=None):
+        now = time.monotonic() if now is None else now
+        while self.finished:
+            key, record = next(iter(self.finished.items()))
+            if len(self.finished) <= self.max_finished and now - record.ended <= self.max_age:
+                break
+            self._remove(key)
+
+    def active(self):
+        return [record for record in self.calls.values() if record.ended is None]
+
+    def find_by_number(self, number):
+        return [self.calls[key] for key in self.by_number.get(number, ())]
+
+    def with_status(self, status):
+        return [self.calls[key] for key in self.by_status.get(status, ())]
+
+    def _remove(self, key):
+        record = self.calls.pop(key)
+        self.finished.pop(key, None)
+        self.legs.discard(key)
+        self._unindex(self.by_number, record.number, key)
+        self._unindex(self.by_status, record.status, key)
+
+    @staticmethod
+    def _index(index, value, key):
+        index.setdefault(value, set()).add(key)
+
+    @staticmethod
+    def _unindex(index, value, key):
+        keys = index.get(value)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del index[value]
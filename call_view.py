@@ -0,0 +1,126 @@
+"""
+Table of active calls that is updated by differences.
+
+Instead of clearing the text box and inserting every line again on each poll,
+the new snapshot is compared with the previous one and only the rows that were
+added, changed or removed are touched. Snapshots that arrive faster than one
+frame are merged, so the table is repainted at most once per frame. When
+several servers are monitored, their snapshots are shown merged in one table.
+Durations of the calls that are still going on are advanced once a second on
+the Tk side, between polls.
+"""
+
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+
+from snapshots import diff_snapshots, merge_sources
+
+FRAME_MS = 16
+TICK_MS = 1000
+
+
+class CallTreeView:
+    COLUMNS = ("server", "channel", "number", "duration", "status")
+
+    def __init__(self, parent, headings, bg="#FFF9F0", frame_ms=FRAME_MS, tick_ms=TICK_MS,
+                 metrics=None):
+        self.frame = tk.Frame(parent, bg=bg)
+        self.caption = tk.Label(self.frame, text="", anchor="w", bg=bg,
+                                font=("Courier New", 10, "bold"), fg="#8C4A27")
+        self.caption.pack(fill=tk.X)
+
+        self.tree = ttk.Treeview(self.frame, columns=self.COLUMNS, show="headings", height=12)
+        for column, heading, width in zip(self.COLUMNS, headings, (120, 200, 150, 90, 90)):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width, anchor="w")
+        self.tree.tag_configure("call", foreground="#003366")
+        self.tree.tag_configure("Ringing", foreground="#FF6600")
+        self.show_server_column(False)
+
+        scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.frame_ms = frame_ms
+        self.rows = {}       # iid -> values currently shown in the tree
+        self.sources = {}    # server -> latest {key: values} from that server
+        self.started = {}    # server -> {key: time.monotonic() when the call started}
+        self.message = ("", "timestamp")
+        self.lock = threading.Lock()
+        self.scheduled = False
+        self.tick_ms = tick_ms
+        self.metrics = metrics  # optional metrics.Metrics, gets the "ui.render" stage
+        self.frame.after(tick_ms, self.tick)
+
+    def show(self, **pack_options):
+        self.frame.pack(**pack_options)
+
+    def hide(self):
+        self.frame.pack_forget()
+
+    def on_open(self, callback):
+        """Call callback(row values) when a row is double-clicked."""
+        def opened(event):
+            iid = self.tree.identify_row(event.y)
+            if iid in self.rows:
+                callback(self.rows[iid])
+        self.tree.bind("<Double-1>", opened)
+
+    def show_server_column(self, visible):
+        self.tree["displaycolumns"] = self.COLUMNS if visible else self.COLUMNS[1:]
+
+    def submit(self, rows, caption="", kind="timestamp", source="", started=None):
+        """Queue a new snapshot {key: (channel, number, duration, status)} from one server.
+
+        Every server keeps its own snapshot; the table shows all of them merged.
+        For the keys in started, the duration is counted from that monotonic time.
+        """
+        with self.lock:
+            self.sources[source] = rows
+            self.started[source] = started or {}
+            self.message = (caption, kind)
+            if self.scheduled:
+                return
+            self.scheduled = True
+        self.frame.after(self.frame_ms, self.flush)
+
+    def set_message(self, text, kind="info", source=""):
+        with self.lock:
+            rows = self.sources.get(source, {})
+            started = self.started.get(source)
+        self.submit(rows, text, kind, source, started)
+
+    def tick(self):
+        # No PBX request here: only the durations are recounted from the start times
+        with self.lock:
+            due = any(self.started.values()) and not self.scheduled
+            self.scheduled = self.scheduled or due
+        if due:
+            self.flush()
+        self.frame.after(self.tick_ms, self.tick)
+
+    def merged_rows(self):
+        return merge_sources(self.sources, self.started)
+
+    def flush(self):
+        started = time.perf_counter()
+        with self.lock:
+            rows = self.merged_rows()
+            caption, kind = self.message
+            self.scheduled = False
+
+        self.caption.config(text=caption, fg={"error": "red", "warning": "#FF6600",
+                                              "info": "#555555"}.get(kind, "#8C4A27"))
+        added, changed, removed = diff_snapshots(self.rows, rows)
+        if removed:
+            self.tree.delete(*removed)
+        for key, values in changed.items():
+            self.tree.item(key, values=values, tags=("call", values[-1]))
+        for key, values in added.items():
+            self.tree.insert("", tk.END, iid=key, values=values, tags=("call", values[-1]))
+        self.rows = rows
+        if self.metrics:
+            self.metrics.observe("ui.render", time.perf_counter() - started)
@@ -0,0 +1,168 @@
+"""
+Incremental reading of Asterisk CDR records (cdr-csv Master.csv).
+
+Master.csv is read over the SSH connection with SFTP, starting from the byte
+offset reached last time, so only the new records are transferred and parsed.
+Records go into a local SQLite index keyed by disposition and start time,
+which answers the Missed / Answered views without touching the PBX. The
+first bytes of the file are kept with the offset: a rotated Master.csv is
+read from its start even when it has already grown past the old offset.
+"""
+
+import csv
+import sqlite3
+import threading
+
+DEFAULT_CDR_PATH = "/var/log/asterisk/cdr-csv/Master.csv"
+CHUNK_SIZE = 1024 * 1024
+HEAD_SIZE = 512  # first bytes of the file, to recognise it after a rotation
+
+# Default cdr-csv columns: accountcode, src, dst, dcontext, clid, channel, dstchannel,
+# lastapp, lastdata, start, answer, end, duration, billsec, disposition, amaflags,
+# [uniqueid, userfield]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cdr (
+    start TEXT NOT NULL,
+    src TEXT,
+    dst TEXT,
+    clid TEXT,
+    channel TEXT,
+    duration INTEGER,
+    billsec INTEGER,
+    disposition TEXT,
+    answered INTEGER NOT NULL,
+    uniqueid TEXT,
+    dcontext TEXT
+);
+CREATE INDEX IF NOT EXISTS cdr_by_answered_start ON cdr (answered, start);
+CREATE INDEX IF NOT EXISTS cdr_by_disposition_start ON cdr (disposition, start);
+CREATE TABLE IF NOT EXISTS cdr_state (
+    path TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    head BLOB NOT NULL DEFAULT x''
+);
+"""
+
+
+def parse_cdr_lines(lines):
+    """Turn Master.csv lines into tuples for the cdr table, skipping broken lines."""
+    records = []
+    for row in csv.reader(lines):
+        if len(row) < 15:
+            continue
+        disposition = row[14]
+        records.append((row[9], row[1], row[2], row[4], row[5], _int(row[12]), _int(row[13]),
+                        disposition, 1 if disposition == "ANSWERED" else 0,
+                        row[16] if len(row) > 16 else "", row[3]))
+    return records
+
+
+def _int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return 0
+
+
+class CdrIndex:
+    def __init__(self, filename):
+        self.db = sqlite3.connect(str(filename), check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        # Indexes made by older versions get the new columns
+        if "head" not in [column[1] for column in self.db.execute("PRAGMA table_info(cdr_state)")]:
+            self.db.execute("ALTER TABLE cdr_state ADD COLUMN head BLOB NOT NULL DEFAULT x''")
+        if "dcontext" not in [column[1] for column in self.db.execute("PRAGMA table_info(cdr)")]:
+            self.db.execute("ALTER TABLE cdr ADD COLUMN dcontext TEXT")
+        self.lock = threading.Lock()
+
+    def close(self):
+        self.db.close()
+
+    def get_offset(self, path):
+        """(offset, size, first bytes) of the file as of the last sync."""
+        with self.lock:
+            row = self.db.execute("SELECT offset, size, head FROM cdr_state WHERE path = ?", (path,)).fetchone()
+        return row if row else (0, 0, b"")
+
+    def add(self, path, records, offset, size, head=b""):
+        """Store a batch of records and the new file offset in one transaction."""
+        with self.lock, self.db:
+            self.db.executemany("INSERT INTO cdr VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", records)
+            self.db.execute("INSERT OR REPLACE INTO cdr_state (path, offset, size, head) VALUES (?, ?, ?, ?)",
+                            (path, offset, size, head))
+
+    def reset(self, path):
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM cdr_state WHERE path = ?", (path,))
+
+    def calls(self, answered, day=None, limit=200):
+        """Newest calls first; day is 'YYYY-MM-DD' or None for all days."""
+        query = "SELECT start, src, dst, clid, billsec, disposition FROM cdr WHERE answered = ?"
+        params = [1 if answered else 0]
+        if day:
+            query += " AND start >= ? AND start < ?"
+            params += [day, day + "~"]
+        query += " ORDER BY start DESC LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            return self.db.execute(query, params).fetchall()
+
+    def count(self, answered, day=None):
+        query = "SELECT COUNT(*) FROM cdr WHERE answered = ?"
+        params = [1 if answered else 0]
+        if day:
+            query += " AND start >= ? AND start < ?"
+            params += [day, day + "~"]
+        with self.lock:
+            return self.db.execute(query, params).fetchone()[0]
+
+
+class CdrTail:
+    """Reads the new part of Master.csv through an open ssh_connection.SshConnection."""
+
+    def __init__(self, client, index, path=DEFAULT_CDR_PATH, chunk_size=CHUNK_SIZE, keep=None):
+        self.client = client
+        self.index = index
+        self.path = path
+        self.chunk_size = chunk_size
+        self.keep = keep  # optional check for a record, e.g. ChannelFilter.matches_cdr
+
+    def sync(self):
+        """Read everything appended since the last sync. Returns the number of new records."""
+        sftp = self.client.open_sftp()
+        try:
+            size = sftp.stat(self.path).st_size
+            offset, known_size, known_head = self.index.get_offset(self.path)
+            added = 0
+            with sftp.open(self.path, "rb") as f:
+                head = f.read(min(size, HEAD_SIZE))
+                if size < known_size or head[:len(known_head)] != known_head:
+                    # The file was rotated or truncated, read the new one from the start
+                    self.index.reset(self.path)
+                    offset = 0
+                if size == offset:
+                    return 0
+                f.seek(offset)
+                f.prefetch(size)
+                rest = b""
+                while offset + len(rest) < size:
+                    chunk = f.read(min(self.chunk_size, size - offset - len(rest)))
+                    if not chunk:
+                        break
+                    data = rest + chunk
+                    end = data.rfind(b"\n") + 1
+                    # Only complete lines are stored, the tail waits for the next chunk or sync
+                    rest = data[end:]
+                    if not end:
+                        continue
+                    records = parse_cdr_lines(data[:end].decode("utf-8", "replace").splitlines())
+                    if self.keep:
+                        records = [record for record in records if self.keep(record)]
+                    offset += end
+                    self.index.add(self.path, records, offset, size, head)
+                    added += len(records)
+            return added
+        finally:
+            sftp.close()
@@ -0,0 +1,148 @@
+"""
+Which channels the monitor cares about.
+
+The "filter" section of config.json:
+
+    "filter": {"trunks": ["SIP/trunk", "PJSIP/provider"],   # channel name prefixes
+               "contexts": ["from-trunk"],                  # dialplan contexts
+               "exclude_extensions": ["100-199", "555"],    # internal phones
+               "min_number_length": 7}
+
+Trunks are pushed to the PBX, so other channels do not cross the link at
+all: over SSH the concise command is piped through grep -E on the server,
+over AMI an event filter is added to the session. Everything is also
+checked locally by matches() before a channel reaches the call store, so
+the history, the notifications and the statistics only see these calls.
+
+Contexts are only checked when a channel first appears: a call often moves
+on to another context (from-trunk -> ext-queues -> ext-local), and must not
+vanish from the monitor when it does. So they are never sent to the PBX;
+the monitor checks the context of a new channel and then follows the
+channel by its uniqueid. The CDR views check the destination context.
+"""
+
+import re
+
+from channel_parser import CONCISE_COMMAND
+
+# Trunk and context names go into a shell command and a regex; keep them plain
+NAME = re.compile(r"^[\w/.@:+-]+$")
+ERE_SPECIAL = re.compile(r"([.\[\]()*+?{}|^$\\])")
+
+
+def _ere_escape(text):
+    return ERE_SPECIAL.sub(r"\\\1", text)
+
+
+def _names(values, what):
+    if isinstance(values, str):
+        values = [values]
+    values = [value.strip() for value in values or () if value.strip()]
+    for value in values:
+        if not NAME.match(value):
+            raise ValueError(f"Invalid {what}: {value!r}")
+    return tuple(values)
+
+
+def _extensions(values):
+    """Parse ["100-199", "555"] into (set of single extensions, list of (low, high) ranges)."""
+    if isinstance(values, str):
+        values = values.split(",")
+    single, ranges = set(), []
+    for value in values or ():
+        value = str(value).strip()
+        if not value:
+            continue
+        low, dash, high = value.partition("-")
+        if dash and low.isdigit() and high.isdigit():
+            ranges.append((int(low), int(high)))
+        else:
+            single.add(value)
+    return single, ranges
+
+
+def peer_of(channel):
+    """'SIP/101-0000002a' -> '101', 'PJSIP/provider-00000001' -> 'provider'."""
+    name = channel.partition("/")[2]
+    return name.rpartition("-")[0] or name
+
+
+class ChannelFilter:
+    def __init__(self, trunks=(), contexts=(), exclude_extensions=(), min_number_length=None):
+        self.trunks = _names(trunks, "trunk")
+        self.contexts = _names(contexts, "context")
+        self.excluded, self.excluded_ranges = _extensions(exclude_extensions)
+        self.min_number_length = min_number_length
+
+    @classmethod
+    def from_config(cls, settings):
+        """Build the filter from the "filter" section of config.json; None if it filters nothing."""
+        if not settings:
+            return None
+        channel_filter = cls(settings.get("trunks"), settings.get("contexts"),
+                             settings.get("exclude_extensions"), settings.get("min_number_length"))
+        return channel_filter if channel_filter.active else None
+
+    @property
+    def active(self):
+        return bool(self.trunks or self.contexts or self.excluded or self.excluded_ranges
+                    or self.min_number_length)
+
+    def is_excluded(self, extension):
+        if not extension:
+            return False
+        if extension in self.excluded:
+            return True
+        if self.excluded_ranges and extension.isdigit():
+            value = int(extension)
+            return any(low <= value <= high for low, high in self.excluded_ranges)
+        return False
+
+    def matches(self, channel, context=None, number=None):
+        """Whether a channel should be monitored.
+
+        context is the one the channel was first seen in; None skips the check
+        (unknown, or a channel that was already accepted).
+        """
+        if self.trunks and not channel.startswith(self.trunks):
+            return False
+        if self.contexts and context is not None and context not in self.contexts:
+            return False
+        if self.is_excluded(peer_of(channel)) or self.is_excluded(number):
+            return False
+        if self.min_number_length and not (number and number.isdigit() and len(number) >= self.min_number_length):
+            return False
+        return True
+
+    def matches_cdr(self, record):
+        """The same check for a record of cdr.parse_cdr_lines() (start, src, dst, clid, channel, ..., dcontext)."""
+        src, channel = record[1], record[4]
+        if self.trunks and not channel.startswith(self.trunks):
+            return False
+        if self.contexts and record[10] not in self.contexts:
+            return False
+        if self.is_excluded(peer_of(channel)) or self.is_excluded(src) or self.is_excluded(record[2]):
+            return False
+        if self.min_number_length and not (src.isdigit() and len(src) >= self.min_number_length):
+            return False
+        return True
+
+    def grep_pattern(self):
+        """ERE that selects the lines of the trunks in `core show channels concise`, or None."""
+        if not self.trunks:
+            return None
+        return "^(" + "|".join(_ere_escape(trunk) for trunk in self.trunks) + ")"
+
+    def command(self, command=CONCISE_COMMAND):
+        """The concise command, narrowed on the PBX side when trunks are set."""
+        pattern = self.grep_pattern()
+        if pattern is None:
+            return command
+        # grep exits with 1 when nothing matches; that is not an error here
+        return f"{command} | grep -E '{pattern}' || true"
+
+    def ami_filter(self):
+        """Regex for an AMI `Filter` action (matched against the whole event), or None."""
+        if not self.trunks:
+            return None
+        return "Channel: (" + "|".join(_ere_escape(trunk) for trunk in self.trunks) + ")"
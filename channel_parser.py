@@ -0,0 +1,117 @@
+"""
+Parser for the output of `core show channels`.
+
+The monitor asks Asterisk for the concise format, where every channel is one
+line of '!'-separated fields, so each line is split once and turned into a
+Channel record. parse_verbose() handles the human readable table with one
+precompiled regex, for older recordings of `core show channels verbose`.
+"""
+
+import re
+
+CONCISE_COMMAND = "asterisk -rx 'core show channels concise'"
+VERBOSE_COMMAND = "asterisk -rx 'core show channels verbose'"
+
+# Application of the channels dialed by Dial(), Queue() and the like
+DIALED_APP = "AppDial"
+
+# Same heuristic as before: a phone number has at least 7 digits
+MIN_NUMBER_LENGTH = 7
+
+# channel!context!exten!priority!state!application!data!callerid!accountcode!
+# peeraccount!amaflags!duration!bridgeid!uniqueid
+CONCISE_FIELDS = 14
+
+VERBOSE_LINE = re.compile(
+    r"^(?P<channel>\S+) +(?P<context>\S+) +(?P<exten>\S+) +\d+ +(?P<state>\S+) +"
+    r"(?P<application>\S+) +(?:.*? )?(?P<callerid>\S*) +(?P<duration>\d+:\d\d:\d\d)(?: |$)"
+)
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def parse_duration(text):
+    seconds = 0
+    for part in text.split(":"):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def pick_number(callerid, exten, min_length=MIN_NUMBER_LENGTH):
+    if callerid.isdigit() and len(callerid) >= min_length:
+        return callerid
+    if exten.isdigit() and len(exten) >= min_length:
+        return exten
+    return None
+
+
+class Channel:
+    __slots__ = ("channel", "context", "exten", "state", "application",
+                 "callerid", "number", "duration", "bridge", "uniqueid")
+
+    def __init__(self, channel, context, exten, state, application, callerid,
+                 number, duration, bridge="", uniqueid=""):
+        self.channel = channel
+        self.context = context
+        self.exten = exten
+        self.state = state
+        self.application = application
+        self.callerid = callerid
+        self.number = number
+        self.duration = duration  # seconds
+        self.bridge = bridge
+        self.uniqueid = uniqueid
+
+    @property
+    def key(self):
+        return self.uniqueid or self.channel
+
+    def __repr__(self):
+        return f"Channel({self.channel!r}, {self.state!r}, {self.number!r}, {self.duration})"
+
+
+def parse_concise(text, min_number_length=MIN_NUMBER_LENGTH):
+    """Parse `core show channels concise` output into a list of Channel records."""
+    channels = []
+    append = channels.append
+    for line in text.splitlines():
+        fields = line.split("!")
+        count = len(fields)
+        if count < CONCISE_FIELDS:
+            continue  # not a channel line (error message, empty line)
+        if count > CONCISE_FIELDS:
+            # the application data contained '!', put it back together
+            extra = count - CONCISE_FIELDS
+            fields[6:7 + extra] = ["!".join(fields[6:7 + extra])]
+        callerid = fields[7]
+        exten = fields[2]
+        try:
+            duration = int(fields[11])
+        except ValueError:
+            duration = 0
+        append(Channel(fields[0], fields[1], exten, fields[4], fields[5], callerid,
+                       pick_number(callerid, exten, min_number_length), duration,
+                       fields[12], fields[13]))
+    return channels
+
+
+def parse_verbose(text, min_number_length=MIN_NUMBER_LENGTH):
+    """Parse the table printed by `core show channels verbose`."""
+    channels = []
+    append = channels.append
+    match = VERBOSE_LINE.match
+    for line in text.splitlines():
+        m = match(line)
+        if m is None:
+            continue  # header, footer ("N active channels") or garbage
+        # The Caller ID is the last column before the duration
+        callerid = m.group("callerid")
+        exten = m.group("exten")
+        append(Channel(m.group("channel"), m.group("context"), exten, m.group("state"),
+                       m.group("application"), callerid,
+                       pick_number(callerid, exten, min_number_length),
+                       parse_duration(m.group("duration"))))
+    return channels
@@ -0,0 +1,358 @@
+"""
+Settings of the window and of headless.py: config.json, its profiles and secrets.
+
+ConfigStore.load() checks config.json against SCHEMA: a broken file raises
+ConfigError listing every problem, instead of being read as empty settings
+(and overwritten by the next save). save() writes a temporary file readable
+by the user only and renames it over the old one, so a crash never leaves
+half a file. changed() only compares the modification time, so the window
+can look for edits every couple of seconds and apply them without a restart.
+
+Several sets of servers are kept as profiles; the keys of the chosen profile
+override the top-level ones, and a config without profiles is one profile:
+
+    "profile": "office",
+    "profiles": {"office": {"host": "10.0.0.1, 10.0.0.2", "username": "admin", "key_file": "~/.ssh/id_ed25519"},
+                 "lab": {"host": "192.168.1.5", "port": 2222, "username": "root", "use_agent": true}}
+
+Passwords, AMI secrets and the feed token, the e-mail and SMS passwords of the notifications
+and the HTTP headers of the webhook and of the contacts lookup (NESTED_SECRETS)
+are saved encrypted ("enc:..."): with DPAPI on
+Windows (only the same Windows user can decrypt them), elsewhere with Fernet
+from cryptography (installed with paramiko) and a key in secret.key next to
+config.json, readable by the user only. They are decrypted by reveal() when
+needed, not on load, so the window starts without loading the cipher.
+"""
+
+import base64
+import json
+import os
+from pathlib import Path
+
+from channel_filter import ChannelFilter
+
+SECRET_PREFIX = "enc:"
+SECRET_KEYS = ("password", "ami_secret", "feed_token")
+# Secrets inside sections, as (section, part, key); every value of a dict (HTTP headers) is a secret
+NESTED_SECRETS = (("notifications", "email", "password"), ("notifications", "sms", "password"),
+                  ("notifications", "webhook", "headers"), ("contacts", "http", "headers"))
+DEFAULT_SSH_PORT = 22
+
+NUMBER = (int, float)
+
+# Keys that a profile may set, with their types
+PROFILE_SCHEMA = {
+    "host": str,
+    "port": int,
+    "username": str,
+    "password": str,
+    "key_file": str,
+    "use_agent": bool,
+    "ami_port": int,
+    "ami_username": str,
+    "ami_secret": str,
+    "cdr_path": str,
+    "filter": dict,
+    "feed_url": str,
+    "feed_token": str,
+}
+
+# The "filter" section (channel_filter.py); the lists are checked item by item
+FILTER_SCHEMA = {
+    "trunks": (list, str),
+    "contexts": (list, str),
+    "exclude_extensions": (list, str),
+    "min_number_length": int,
+}
+
+# Sink options shared by the notification channels (notifications.Notifier.add_sink)
+SINK_SCHEMA = {
+    "batch_window": NUMBER,
+    "min_interval": NUMBER,
+}
+
+# Sections inside the settings, by their path; a wrong key would otherwise only fail where the section is used
+SECTION_SCHEMAS = {
+    "contacts": {
+        "csv": str,
+        "csv_name_column": str,
+        "csv_number_column": str,
+        "vcard": str,
+        "sqlite": (dict, str),
+        "http": (dict, str),
+        "cache_size": int,
+        "ttl": NUMBER,
+        "negative_ttl": NUMBER,
+    },
+    "contacts.sqlite": {"path": str, "query": str},
+    "contacts.http": {"url": str, "field": str, "timeout": NUMBER, "headers": dict},
+    "notifications": {"desktop": (bool, dict), "email": dict, "webhook": dict, "sms": dict},
+    "notifications.desktop": SINK_SCHEMA,
+    "notifications.email": dict(SINK_SCHEMA, smtp_server=str, smtp_port=int, sender=str, password=str,
+                                to=(str, list), tls=(str, type(None)), subject=str),
+    "notifications.webhook": dict(SINK_SCHEMA, url=str, headers=dict),
+    "notifications.sms": dict(SINK_SCHEMA, host=str, username=str, password=str, to=(str, list), line=int),
+}
+
+SCHEMA = dict(PROFILE_SCHEMA, **{
+    "profile": str,
+    "profiles": dict,
+    "language": str,
+    "auto_connect": bool,
+    "async_core": bool,
+    "feed_listen": (str, int),
+    "poll_interval": NUMBER,
+    "poll_fast_interval": NUMBER,
+    "poll_idle_interval": NUMBER,
+    "poll_jitter": NUMBER,
+    "poll_max_backoff": NUMBER,
+    "max_call_age": NUMBER,
+    "max_finished_calls": int,
+    "ssh_keepalive": NUMBER,
+    "history_file": str,
+    "contacts": dict,
+    "notifications": dict,
+    "queues": (dict, bool),
+})
+
+PORT_KEYS = ("port", "ami_port")
+POSITIVE_KEYS = ("poll_interval", "poll_fast_interval", "poll_idle_interval", "poll_max_backoff",
+                 "max_call_age", "max_finished_calls", "cache_size", "ttl")
+
+
+class ConfigError(Exception):
+    pass
+
+
+def _check(data, schema, where=""):
+    errors = []
+    for key, value in data.items():
+        expected = schema.get(key)
+        if expected is None:
+            errors.append(f"{where}{key}: unknown setting")
+        elif not isinstance(value, expected) or isinstance(value, bool) and bool not in _types(expected):
+            names = " or ".join(t.__name__ for t in _types(expected))
+            errors.append(f"{where}{key}: expected {names}, got {type(value).__name__}")
+        elif key in PORT_KEYS and not 0 < value < 65536:
+            errors.append(f"{where}{key}: {value} is not a port number")
+        elif key in POSITIVE_KEYS and value <= 0:
+            errors.append(f"{where}{key}: must be greater than 0")
+        elif key == "poll_jitter" and not 0 <= value < 1:
+            errors.append(f"{where}{key}: must be 0 or more and less than 1")
+        elif key == "filter":
+            errors += _check_filter(value, f"{where}filter.")
+        elif isinstance(value, dict) and f"{where}{key}" in SECTION_SCHEMAS:
+            errors += _check(value, SECTION_SCHEMAS[f"{where}{key}"], f"{where}{key}.")
+    return errors
+
+
+def _types(expected):
+    return expected if isinstance(expected, tuple) else (expected,)
+
+
+def _check_filter(settings, where):
+    errors = _check(settings, FILTER_SCHEMA, where)
+    for key in ("trunks", "contexts", "exclude_extensions"):
+        values = settings.get(key)
+        if isinstance(values, list) and not all(isinstance(value, str) for value in values):
+            errors.append(f"{where}{key}: expected a list of strings")
+    length = settings.get("min_number_length")
+    if isinstance(length, int) and length < 0:
+        errors.append(f"{where}min_number_length: must be 0 or more")
+    if not any(error.startswith((f"{where}trunks", f"{where}contexts")) for error in errors):
+        try:
+            # Trunk and context names go into the grep command run on the PBX
+            ChannelFilter(settings.get("trunks"), settings.get("contexts"))
+        except ValueError as e:
+            errors.append(f"{where[:-1]}: {e}")
+    return errors
+
+
+def validate(data):
+    """Raise ConfigError listing every problem of a settings dict."""
+    if not isinstance(data, dict):
+        raise ConfigError("the settings must be a JSON object")
+    errors = _check(data, SCHEMA)
+    profiles = data.get("profiles")
+    if isinstance(profiles, dict):
+        for name, settings in profiles.items():
+            if isinstance(settings, dict):
+                errors += _check(settings, PROFILE_SCHEMA, f"profiles.{name}.")
+            else:
+                errors.append(f"profiles.{name}: expected dict, got {type(settings).__name__}")
+        if data.get("profile") and data["profile"] not in profiles:
+            errors.append(f"profile: no profile named {data['profile']!r}")
+    if errors:
+        raise ConfigError("; ".join(errors))
+
+
+def profile_names(config):
+    return list(config.get("profiles") or {})
+
+
+def profile(config, name=None):
+    """The settings of a profile (by default the chosen one) on top of the top-level settings."""
+    name = name or config.get("profile")
+    settings = {key: value for key, value in config.items() if key not in ("profiles", "profile")}
+    settings.update((config.get("profiles") or {}).get(name, {}))
+    return settings
+
+
+def poll_options(config):
+    """Keyword arguments of PollScheduler from the settings."""
+    return dict(interval=config.get("poll_interval", 3.0),
+                fast_interval=config.get("poll_fast_interval", 1.0),
+                idle_interval=config.get("poll_idle_interval", 10.0),
+                jitter=config.get("poll_jitter", 0.1),
+                max_backoff=config.get("poll_max_backoff", 60.0))
+
+
+class FernetCipher:
+    """Fernet with a random key kept in a file readable by the user only."""
+
+    def __init__(self, key_file):
+        from cryptography.fernet import Fernet
+        key_file = Path(key_file)
+        try:
+            key = key_file.read_bytes().strip()
+        except FileNotFoundError:
+            key = Fernet.generate_key()
+            fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(key)
+        self.fernet = Fernet(key)
+
+    def encrypt(self, data):
+        return self.fernet.encrypt(data)
+
+    def decrypt(self, data):
+        return self.fernet.decrypt(data)
+
+
+class DpapiCipher:
+    """Windows DPAPI: the data can only be decrypted by the same Windows user."""
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+
+        class Blob(ctypes.Structure):
+            _fields_ = [("cbData", wintypes.DWORD), ("pbData", ctypes.POINTER(ctypes.c_char))]
+
+        self.ctypes = ctypes
+        self.Blob = Blob
+
+    def _call(self, function, data):
+        ctypes = self.ctypes
+        buffer = ctypes.create_string_buffer(data, len(data))
+        blob_in = self.Blob(len(data), ctypes.cast(buffer, ctypes.POINTER(ctypes.c_char)))
+        blob_out = self.Blob()
+        # CRYPTPROTECT_UI_FORBIDDEN: fail instead of showing a prompt
+        if not function(ctypes.byref(blob_in), None, None, None, None, 0x1, ctypes.byref(blob_out)):
+            raise ConfigError(f"DPAPI failed: {ctypes.WinError()}")
+        try:
+            return ctypes.string_at(blob_out.pbData, blob_out.cbData)
+        finally:
+            ctypes.windll.kernel32.LocalFree(blob_out.pbData)
+
+    def encrypt(self, data):
+        return self._call(self.ctypes.windll.crypt32.CryptProtectData, data)
+
+    def decrypt(self, data):
+        return self._call(self.ctypes.windll.crypt32.CryptUnprotectData, data)
+
+
+class ConfigStore:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.mtime = None
+        self._cipher = None
+
+    @property
+    def cipher(self):
+        if self._cipher is None:
+            self._cipher = DpapiCipher() if os.name == "nt" else FernetCipher(self.path.parent / "secret.key")
+        return self._cipher
+
+    def load(self):
+        """The settings, {} if there is no file yet; raises ConfigError if the file is broken."""
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            self.mtime = None
+            return {}
+        self.mtime = mtime  # a broken file is reported once, not on every check
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except ValueError as e:
+            raise ConfigError(f"not valid JSON: {e}") from None
+        validate(data)
+        return data
+
+    def changed(self):
+        try:
+            return self.path.stat().st_mtime != self.mtime
+        except FileNotFoundError:
+            return self.mtime is not None
+
+    def save(self, data):
+        """Check and write the settings; secrets that are still plain text are encrypted first."""
+        data = self.encrypt_secrets(data)
+        validate(data)
+        temp = self.path.with_name(self.path.name + ".tmp")
+        fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(temp, self.path)
+        self.mtime = self.path.stat().st_mtime
+        return data
+
+    def keep_broken(self):
+        """Move a file that could not be loaded aside, so that saving does not overwrite it."""
+        broken = self.path.with_name(self.path.name + ".broken")
+        os.replace(self.path, broken)
+        self.mtime = None
+        return broken
+
+    def encrypt_secrets(self, data):
+        data = dict(data)
+        for key in SECRET_KEYS:
+            if data.get(key) and not data[key].startswith(SECRET_PREFIX):
+                data[key] = self.encrypt(data[key])
+        for section, part, key in NESTED_SECRETS:
+            settings = data.get(section)
+            settings = settings.get(part) if isinstance(settings, dict) else None
+            if not isinstance(settings, dict) or not settings.get(key):
+                continue
+            value = settings[key]
+            if isinstance(value, dict):
+                value = {name: self._encrypt_plain(header) for name, header in value.items()}
+            else:
+                value = self._encrypt_plain(value)
+            data[section] = dict(data[section], **{part: dict(settings, **{key: value})})
+        if data.get("profiles"):
+            data["profiles"] = {name: self.encrypt_secrets(settings) if isinstance(settings, dict) else settings
+                                for name, settings in data["profiles"].items()}
+        return data
+
+    def _encrypt_plain(self, value):
+        if isinstance(value, str) and value and not value.startswith(SECRET_PREFIX):
+            return self.encrypt(value)
+        return value
+
+    def encrypt(self, text):
+        token = self.cipher.encrypt(text.encode("utf-8"))
+        return SECRET_PREFIX + base64.b64encode(token).decode("ascii")
+
+    def reveal(self, value):
+        """The plain text of an "enc:..." secret; other values are returned as they are."""
+        if not isinstance(value, str) or not value.startswith(SECRET_PREFIX):
+            return value
+        try:
+            return self.cipher.decrypt(base64.b64decode(value[len(SECRET_PREFIX):])).decode("utf-8")
+        except ConfigError:
+            raise
+        except Exception as e:
+            raise ConfigError(f"cannot decrypt a secret of {self.path} ({type(e).__name__}); "
+                              "enter the password again") from None
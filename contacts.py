@@ -0,0 +1,291 @@
+"""
+Contact names for the phone numbers.
+
+A phonebook source maps a number to a name: a CSV file, a vCard file, an
+SQLite database or an HTTP service. ContactResolver asks them in order and
+keeps the answers in an LRU cache with a TTL; numbers without a name are
+cached too (for a shorter negative_ttl), so a repeat caller costs a dict
+lookup and no I/O on every poll. name() never waits: on a cache miss it
+queues the number for the lookup thread and returns None, and on_resolved
+is called once the name is known.
+
+Numbers are compared by their last 10 digits, so 89161234567, +7 916
+123-45-67 and 79161234567 are the same contact.
+
+The "contacts" section of config.json:
+
+    "contacts": {"csv": "phonebook.csv", "vcard": "contacts.vcf",
+                 "sqlite": {"path": "crm.sqlite", "query": "SELECT name FROM clients WHERE phone = ?"},
+                 "http": {"url": "https://crm.example.com/lookup?number={number}"},
+                 "cache_size": 10000, "ttl": 86400, "negative_ttl": 600}
+"""
+
+import csv
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+KEY_DIGITS = 10
+MAX_QUEUE = 1000  # numbers waiting for a lookup; more are looked up on a later poll
+
+
+def number_key(number):
+    """The last KEY_DIGITS digits of a number, or '' if it has no digits."""
+    digits = "".join(char for char in number or "" if char.isdigit())
+    return digits[-KEY_DIGITS:]
+
+
+class FilePhonebook:
+    """A phonebook file read into memory; read again when the file changes."""
+
+    def __init__(self, path):
+        self.path = path
+        self.names = {}
+        self.mtime = None
+
+    def lookup(self, key):
+        mtime = os.stat(self.path).st_mtime
+        if mtime != self.mtime:
+            self.names = {number_key(number): name for number, name in self.read() if number_key(number)}
+            self.mtime = mtime
+        return self.names.get(key)
+
+    def read(self):
+        """Yield (number, name) pairs."""
+        raise NotImplementedError
+
+
+class CsvPhonebook(FilePhonebook):
+    """CSV with a header row; several numbers in one cell are separated by ';'."""
+
+    def __init__(self, path, name_column="name", number_column="number"):
+        super().__init__(path)
+        self.name_column = name_column
+        self.number_column = number_column
+
+    def read(self):
+        with open(self.path, "r", encoding="utf-8-sig", newline="") as f:
+            for row in csv.DictReader(f):
+                name = (row.get(self.name_column) or "").strip()
+                if name:
+                    for number in (row.get(self.number_column) or "").split(";"):
+                        yield number, name
+
+
+class VcardPhonebook(FilePhonebook):
+    """A .vcf file with one or more vCards; the FN and every TEL of a card."""
+
+    def read(self):
+        with open(self.path, "r", encoding="utf-8-sig") as f:
+            lines = []
+            for line in f:
+                line = line.rstrip("\r\n")
+                if line[:1] in (" ", "\t") and lines:
+                    lines[-1] += line[1:]  # folded line
+                else:
+                    lines.append(line)
+
+        name, numbers = None, []
+        for line in lines:
+            field, _, value = line.partition(":")
+            field = field.split(";")[0].rpartition(".")[2].upper()  # "item1.TEL;TYPE=CELL" -> "TEL"
+            if field == "BEGIN":
+                name, numbers = None, []
+            elif field == "FN":
+                name = value.replace("\\,", ",").replace("\\;", ";").strip()
+            elif field == "TEL":
+                numbers.append(value)
+            elif field == "END" and name:
+                for number in numbers:
+                    yield number, name
+
+
+class SqlitePhonebook:
+    """Runs query with the number key (last 10 digits) as its only parameter."""
+
+    def __init__(self, path, query="SELECT name FROM contacts WHERE number = ?"):
+        self.path = path
+        self.query = query
+        self.db = None
+
+    def lookup(self, key):
+        if self.db is None:
+            # Only the lookup thread uses the connection
+            self.db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        row = self.db.execute(self.query, (key,)).fetchone()
+        return row[0] if row and row[0] else None
+
+
+class HttpLookup:
+    """GET url with {number} replaced; the answer is JSON with a name field, or plain text."""
+
+    def __init__(self, url, field="name", timeout=3, headers=None):
+        self.url = url
+        self.field = field
+        self.timeout = timeout
+        self.headers = headers or {}
+
+    def lookup(self, key):
+        import urllib.parse
+        import urllib.request
+        request = urllib.request.Request(self.url.format(number=urllib.parse.quote(key)), headers=self.headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if response.status == 204:
+                return None
+            body = response.read().decode("utf-8", "replace").strip()
+        if not body:
+            return None
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return body
+        if isinstance(data, dict):
+            return data.get(self.field) or None
+        return str(data) if data else None
+
+
+class LruCache:
+    """LRU cache whose entries expire; None values (no name) use negative_ttl."""
+
+    def __init__(self, size=10000, ttl=86400, negative_ttl=600, clock=time.monotonic):
+        self.size = size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> (expires, value), least recently used first
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """(True, value) for a fresh entry, (False, None) otherwise."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] <= self.clock():
+                del self.entries[key]
+                return False, None
+            self.entries.move_to_end(key)
+            return True, entry[1]
+
+    def put(self, key, value):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        with self.lock:
+            self.entries[key] = (self.clock() + ttl, value)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class ContactResolver:
+    def __init__(self, sources, cache=None, on_resolved=None, metrics=None):
+        self.sources = list(sources)
+        self.cache = cache if cache is not None else LruCache()
+        self.on_resolved = on_resolved  # called with the number from the lookup thread when a name is found
+        self.metrics = metrics  # optional metrics.Metrics, gets the "contacts.lookup" stage
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.queue = queue.Queue(MAX_QUEUE)
+        self._thread = threading.Thread(target=self._run, name="contacts", daemon=True)
+        self._thread.start()
+
+    def name(self, number):
+        """The cached name of a number, or None; unknown numbers are queued for a lookup."""
+        key = number_key(number)
+        if not key:
+            return None
+        found, name = self.cache.get(key)
+        if found:
+            return name
+        with self.lock:
+            if key in self.pending:
+                return None
+            self.pending.add(key)
+        try:
+            self.queue.put_nowait((key, number))
+        except queue.Full:
+            with self.lock:
+                self.pending.discard(key)
+        return None
+
+    def label(self, number):
+        """'79161234567 (Ivan Petrov)' once the name is known, the bare number before that."""
+        name = self.name(number)
+        return f"{number} ({name})" if name else number
+
+    def resolve(self, number):
+        """Look a number up right away, bypassing the cache; for scripts and checks."""
+        return self._lookup(number_key(number))
+
+    def close(self):
+        self.queue.put(None)
+        self._thread.join()
+
+    def _lookup(self, key):
+        started = time.perf_counter()
+        name = None
+        for source in self.sources:
+            try:
+                name = source.lookup(key)
+            except Exception:
+                traceback.print_exc()
+                if self.metrics:
+                    self.metrics.count("errors.contacts")
+                continue
+            if name:
+                break
+        if self.metrics:
+            self.metrics.observe("contacts.lookup", time.perf_counter() - started)
+        return name
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            key, number = item
+            name = self._lookup(key)
+            self.cache.put(key, name)
+            with self.lock:
+                self.pending.discard(key)
+            if name and self.on_resolved:
+                self.on_resolved(number)
+
+
+def resolver_from_config(settings, on_resolved=None, metrics=None, reveal=None):
+    """Build a ContactResolver from the "contacts" section of config.json; None without sources.
+
+    reveal decrypts the HTTP headers saved encrypted (ConfigStore.reveal).
+    """
+    if not settings:
+        return None
+    sources = []
+    if settings.get("csv"):
+        sources.append(CsvPhonebook(settings["csv"], settings.get("csv_name_column", "name"),
+                                    settings.get("csv_number_column", "number")))
+    if settings.get("vcard"):
+        sources.append(VcardPhonebook(settings["vcard"]))
+    sqlite_settings = settings.get("sqlite")
+    if sqlite_settings:
+        if isinstance(sqlite_settings, str):
+            sqlite_settings = {"path": sqlite_settings}
+        sources.append(SqlitePhonebook(**sqlite_settings))
+    http_settings = settings.get("http")
+    if http_settings:
+        if isinstance(http_settings, str):
+            http_settings = {"url": http_settings}
+        if http_settings.get("headers") and reveal:
+            http_settings = dict(http_settings, headers={name: reveal(value)
+                                                         for name, value in http_settings["headers"].items()})
+        sources.append(HttpLookup(**http_settings))
+    if not sources:
+        return None
+    cache = LruCache(settings.get("cache_size", 10000), settings.get("ttl", 86400), settings.get("negative_ttl", 600))
+    return ContactResolver(sources, cache, on_resolved=on_resolved, metrics=metrics)
@@ -0,0 +1,880 @@
+"""
+Author: Liubov Kovaleva @liuBA29
+Version: 1.0.0 (in development)
+Date: 17.04.2025
+License: MIT
+Description: Program for call monitoring through Asterisk.
+
+The window itself, shared by main_en.py and main_ru.py; they only choose
+the language of the strings (messages.py).
+
+MIT License
+
+Copyright (c) 2025 Liubov Kovaleva [@liuBA29]
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the “Software”), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR
+PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE
+FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import tkinter as tk
+from tkinter import scrolledtext, messagebox
+import time
+
+from app_paths import config_dir
+from call_popup import CallPopup
+from call_store import ANSWERED
+from call_view import CallTreeView
+from cdr import DEFAULT_CDR_PATH
+from channel_filter import ChannelFilter
+from channel_parser import format_duration
+from config_store import DEFAULT_SSH_PORT, ConfigError, ConfigStore, poll_options, profile, profile_names
+from contacts import resolver_from_config
+from history import CallHistory
+from live_stats import LiveStats
+from messages import messages
+from metrics import Metrics
+from monitor import AMI_LOST, FILTER_REJECTED, NO_CONNECTION, CallMonitor, CdrUnavailable
+from notifications import notifier_from_config
+from poll_scheduler import ERROR, IDLE
+from queue_monitor import QueueBoard
+from queue_view import QueueTreeView
+from servers import file_key, parse_hosts, server_name
+from ui_dispatcher import UiDispatcher, Worker
+
+# Path to the configuration file (AppData\Roaming\MyApp\config.json, ~/.config/MyApp/config.json on Linux)
+CONFIG_FILE = config_dir() / "config.json"
+DIAGNOSTICS_FILE = CONFIG_FILE.parent / "diagnostics.json"
+# Views that show live data and keep the PBX polled
+LIVE_VIEWS = ("current", "diagnostics", "statistics", "queues")
+# How often config.json is checked for changes made outside the window
+CONFIG_CHECK_MS = 2000
+# The view shown in the window; read by the poll threads, so it exists before the first connection
+current_view = None
+
+class CallingNumber(CallMonitor):
+    """Call monitor that shows its results in the Tk window."""
+
+    def __init__(self, host, port, username, password, output_box, status_label, call_view, ui, msg, **options):
+        super().__init__(host, port, username, password, **options)
+        self.output_box = output_box
+        self.status_label = status_label
+        self.call_view = call_view
+        self.ui = ui  # widgets are only updated through the Tk thread queue
+        self.msg = msg  # messages.Messages of the chosen language
+        self.shown = None  # (rows, numbers, started) of the last poll, to add contact names without polling
+
+    def set_status(self, text, color):
+        if self.name:
+            text = f"{self.name} — {text}"
+        self.ui.post(self.status_label.config, text=text, fg=color)
+
+    def on_connected(self):
+        at = time.localtime(self.connected_at)
+        self.set_status(self.msg.status_connected.format(time=time.strftime('%H:%M', at), date=time.strftime('%d.%m.%Y', at)),
+                        "green")
+
+    def on_connect_failed(self, error):
+        self.set_status(self.msg.status_failed, "red")
+        self.ui.post(self.output_box.insert, tk.END, self.msg.connection_error.format(error=error) + "\n", "error")
+
+    def on_disconnected(self, error):
+        self.set_status(self.msg.status_failed, "red")
+
+    def on_poll_error(self, kind, error):
+        if kind == NO_CONNECTION:
+            self.ui.post(self.call_view.set_message, self.msg.no_connection, "warning", self.name)
+        elif kind == AMI_LOST:
+            self.ui.post(self.call_view.set_message, self.msg.ami_lost.format(error=error), "error", self.name)
+        elif kind == FILTER_REJECTED:
+            self.ui.post(self.output_box.insert, tk.END, self.msg.ami_filter_rejected.format(error=error) + "\n", "warning")
+        else:
+            self.ui.post(self.call_view.set_message, self.msg.command_failed.format(error=error), "error", self.name)
+
+    def poll(self):
+        global current_view
+        if current_view not in LIVE_VIEWS:
+            return IDLE  # Do not display information if the current view is not "current" (or another live view)
+        return super().poll()
+
+    def on_calls(self, rows, polled_at):
+        # The start times let the window advance durations every second without polling the PBX
+        started = {key: self.calls.get(key).started for key in rows if self.calls.get(key).ended is None}
+        self.shown = (rows, {key: self.calls.get(key).number for key in rows}, started)
+        self.ui.post_update(polled_at, self.show_calls, rows, started)
+
+    def show_names(self):
+        # A contact name was found: the last rows are shown again with the names (Tk thread)
+        if current_view != "current" or not self.shown:
+            return
+        rows, numbers, started = self.shown
+        self.show_calls({key: (row[0], self.caller(numbers[key]), *row[2:]) for key, row in rows.items()}, started)
+
+    def show_calls(self, rows, started, source=None):
+        # Only the rows that changed are redrawn in the table
+        source = self.name if source is None else source
+        if rows:
+            latency = self.ui.last_latency * 1000
+            self.call_view.submit(rows, self.msg.updated.format(time=time.strftime('%d-%m-%Y %H:%M:%S'), latency=latency),
+                                  "timestamp", source, started)
+        else:
+            self.call_view.submit(rows, self.msg.no_calls, "info", source)
+
+    def show_cdr(self, answered):
+        try:
+            try:
+                rows, today = self.read_cdr(answered)
+            except CdrUnavailable:
+                if not self.history:
+                    raise
+                # There is no CDR in AMI mode, show the calls the monitor has seen itself
+                rows, today = self.read_history(answered)
+                rows = cdr_rows(rows)
+        except CdrUnavailable:
+            self.ui.post(self.show_cdr_rows, answered, None, 0, self.msg.cdr_in_ami, "warning")
+            return
+        except Exception as e:
+            self.ui.post(self.show_cdr_rows, answered, None, 0, self.msg.cdr_error.format(error=e))
+            return
+        self.ui.post(self.show_cdr_rows, answered, rows, today)
+
+    def show_cdr_rows(self, answered, rows, today, error=None, kind="error"):
+        global current_view
+        if current_view != ("answered" if answered else "missed"):
+            return  # The user may have switched to another view while CDR was loading
+
+        if self.output_box.tag_ranges("loading"):
+            self.output_box.delete("loading.first", "loading.last")
+        if error:
+            if self.name:
+                error = f"{self.name}: {error}"
+            self.output_box.insert(tk.END, error + "\n", kind)
+            return
+
+        header = (self.msg.answered_header if answered else self.msg.missed_header).format(today=today)
+        if self.name:
+            header = f"{self.name} — {header}"
+        self.output_box.insert(tk.END, header + "\n\n", "timestamp")
+        if not rows:
+            self.output_box.insert(tk.END, self.msg.no_cdr_calls + "\n", "info")
+        for start, src, dst, clid, billsec, disposition in rows:
+            if answered:
+                line = f"📗 {start}  {src or 'unknown'} → {dst} — {format_duration(billsec)}\n"
+            else:
+                line = f"📕 {start}  {src or 'unknown'} → {dst}  ({disposition})\n"
+            self.output_box.insert(tk.END, line, "call")
+        self.output_box.insert(tk.END, "\n" + "-" * 70 + "\n", "separator")
+
+
+def cdr_rows(history_rows):
+    """CallHistory rows in the form of the CDR rows, for show_cdr_rows()."""
+    return [(start, number, channel, server, talk_time, "ANSWERED" if outcome == ANSWERED else "NO ANSWER")
+            for start, server, number, channel, ring_time, talk_time, duration, outcome in history_rows]
+
+
+class FeedCallingNumber(CallingNumber):
+    """Thin client: the calls come from a live feed (headless.py --serve) instead of the PBX.
+
+    The feed is followed by a live_feed.FeedReader; every change it receives
+    triggers a poll, which only reads the local copy. Popups, statistics and
+    the history of the window work as with a direct connection.
+    """
+
+    def __init__(self, url, output_box, status_label, call_view, ui, msg, token=None, **options):
+        super().__init__(url, None, "", "", output_box, status_label, call_view, ui, msg, **options)
+        self.token = token  # "feed_token", if the feed is served on a network address
+        self.reader = None
+        self.servers = set()
+        self.server_errors = {}  # server -> error, for the servers the feed cannot reach
+
+    def is_connected(self):
+        return self.reader is not None and self.reader.connected
+
+    def connect(self):
+        from live_feed import FeedReader
+        self.reader = FeedReader(self.host, on_change=self.feed_changed, token=self.token)
+        if not self.reader.start(wait=10):
+            error = self.reader.error or "no answer from the feed"
+            self.reader.stop()
+            self.reader = None
+            self.metrics.count("errors.connect")
+            self.on_connect_failed(error)
+            return False
+        self.connected_at = self.reader.connected_at
+        self.on_connected()
+        return True
+
+    def feed_changed(self):
+        if self.scheduler:
+            self.scheduler.poll_now()
+
+    def stop(self):
+        super().stop()
+        if self.reader:
+            self.reader.stop()
+
+    def poll(self):
+        if current_view not in LIVE_VIEWS:
+            return IDLE
+        polled_at = time.perf_counter()
+        self.metrics.count("polls")
+        if not self.reader.connected:
+            self.on_disconnected(self.reader.error)
+            self.poll_error(NO_CONNECTION, self.reader.error)
+            return ERROR
+        if self.reader.connected_at != self.connected_at:
+            self.connected_at = self.reader.connected_at
+            self.on_connected()  # the feed was reconnected
+        with self.reader.lock:
+            self.server_errors = {server: status.get("error") or ""
+                                  for server, status in self.reader.status.items() if not status.get("connected")}
+        rows = self.rows_from_feed(self.reader.rows())
+        self.report(rows, polled_at)
+        return self.activity(rows)
+
+    def rows_from_feed(self, sources):
+        """Update the calls from FeedReader.rows(); returns {server/key: row}."""
+        now = time.monotonic()
+        wall_now = time.time()
+        rows = {}
+        for server, server_rows in sources.items():
+            for key, (channel, number, status, started, *leg) in server_rows.items():
+                key = f"{server}/{key}"  # the keys of two servers may be the same
+                elapsed = max(0.0, wall_now - started) if started else None
+                # A leg of another call is shown but not counted (the call itself is another row)
+                call = self.calls.update(key, number=number, status=status, elapsed=elapsed, channel=channel, now=now,
+                                         dialed=bool(leg and leg[0]))
+                rows[key] = (channel, self.caller(call.number), format_duration(call.total_time(now)), status)
+        self.calls.finish_missing(rows, now)
+        self.servers = set(sources)
+        return rows
+
+    def show_calls(self, rows, started, source=None):
+        # Every server of the feed is a source of its own in the table
+        by_server = {server: ({}, {}) for server in self.servers}
+        for key, row in rows.items():
+            server_rows, server_started = by_server.setdefault(key.partition("/")[0], ({}, {}))
+            server_rows[key] = row
+            if key in started:
+                server_started[key] = started[key]
+        for server, (server_rows, server_started) in by_server.items():
+            super().show_calls(server_rows, server_started, server)
+            if server in self.server_errors:
+                self.call_view.set_message(self.msg.connection_error.format(error=self.server_errors[server]),
+                                           "error", server)
+
+    def read_cdr(self, answered, limit=200):
+        # The finished calls kept by the serving process
+        rows, today = self.reader.calls(answered, limit)
+        return cdr_rows(rows), today
+
+
+def async_calling_number():
+    """CallingNumber on the asyncio core ("async_core": true in config.json).
+
+    async_monitor (and asyncio with it) is only imported when that core is used.
+    """
+    from async_monitor import AsyncCallMonitor
+
+    class AsyncCallingNumber(AsyncCallMonitor, CallingNumber):
+        async def poll(self):
+            # Same as CallingNumber.poll(), the hidden views do not poll the PBX
+            if current_view not in LIVE_VIEWS:
+                return IDLE
+            return await super().poll()
+
+    return AsyncCallingNumber
+
+
+def load_config(store):
+    """Return (settings, problem); a broken config.json is moved aside and reported, not overwritten."""
+    try:
+        return store.load(), None
+    except ConfigError as e:
+        try:
+            path = store.keep_broken()
+        except OSError:
+            path = store.path
+        return {}, (e, path)
+
+def save_config(store, data, msg):
+    """Save the settings; returns them as saved (secrets encrypted), or None if that failed."""
+    try:
+        return store.save(data)
+    except Exception as e:
+        messagebox.showerror(msg.error, msg.save_failed.format(error=e))
+        return None
+
+def start_gui(locale=None):
+    """Run the window; locale is "en" or "ru", by default the "language" of config.json or of the system."""
+    # The settings folder is created here and not on import
+    CONFIG_FILE.parent.mkdir(parents=True, exist_ok=True)
+    store = ConfigStore(CONFIG_FILE)
+    config, config_problem = load_config(store)
+    # The strings are picked once; nothing is looked up per poll but an attribute
+    msg = messages(locale or config.get("language"))
+
+    root = tk.Tk()
+    root.title(msg.title)
+    root.geometry("750x620")
+    root.configure(bg="#FAF3E0")
+
+    # Title
+    title_label = tk.Label(
+        root, text=msg.heading,
+        font=("Helvetica", 18, "bold"),
+        bg="#FAF3E0", fg="#8C4A27", pady=15
+    )
+    title_label.pack()
+
+    # Connection status
+    status_label = tk.Label(
+        root, text=msg.status_idle,
+        font=("Helvetica", 12),
+        bg="#FAF3E0", fg="gray"
+    )
+    status_label.pack()
+
+    # Status lines of the other servers when several are monitored
+    extra_status_frame = tk.Frame(root, bg="#FAF3E0")
+    extra_status_frame.pack()
+
+    # UI update queue and the thread that does all SSH/AMI I/O
+    # Timers of the poll stages and counters, shared by all servers
+    metrics = Metrics()
+    ui = UiDispatcher(root, metrics=metrics)
+    # Live statistics of all servers for the dashboard, updated on every call event
+    stats = LiveStats()
+    # Call-centre queues and agents ("queues" in config.json), or None
+    queues = QueueBoard.from_config(config.get("queues"), metrics=metrics)
+    ui.start()
+    worker = Worker("asterisk-io")
+    callers = []             # one CallingNumber per server
+    connected_callers = []
+    connecting = set()
+    diagnostics_job = []
+    statistics_job = []
+
+
+
+    def get_current_status():
+        global current_view
+        current_view = "current"
+        if connected_callers:
+            output_box.pack_forget()
+            queue_view.hide()
+            call_view.show(fill=tk.BOTH, expand=True)
+
+            select_view(btn1)
+
+            for caller in connected_callers:
+                if caller.scheduler:  # not yet when the first server has just connected
+                    caller.scheduler.resume()
+                    caller.scheduler.poll_now()
+
+    def select_view(button):
+        # The button of the shown view looks pressed, the others are released to their own colour
+        for btn in action_buttons:
+            if btn is button:
+                btn.config(relief=tk.SUNKEN, bg="#d0d0d0")
+            else:
+                btn.config(relief=tk.RAISED, state=tk.NORMAL, bg=button_bg)
+
+    def show_contact_names():
+        # A contact name was found: the table shows it right away, without asking the PBX again
+        for caller in connected_callers:
+            caller.show_names()
+
+    def show_number_history(number):
+        # Double-clicking a call in the table shows every call from that number
+        global current_view
+        if not number or number == "unknown":
+            return
+        current_view = "number"
+        for caller in connected_callers:
+            if caller.scheduler:
+                caller.scheduler.pause()
+        call_view.hide()
+        queue_view.hide()
+        output_box.pack()
+        output_box.delete(1.0, tk.END)
+        output_box.insert(tk.END, msg.loading_history.format(number=number) + "\n", ("info", "loading"))
+        worker.submit(load_number_history, number)
+        select_view(None)  # no button for this view
+
+    def load_number_history(number):
+        ui.post(show_number_rows, number, history.for_number(number))
+
+    def show_number_rows(number, rows):
+        if current_view != "number":
+            return
+        output_box.delete(1.0, tk.END)
+        output_box.insert(tk.END, msg.history_header.format(number=number, count=len(rows)) + "\n\n", "timestamp")
+        if not rows:
+            output_box.insert(tk.END, msg.no_number_calls + "\n", "info")
+        for start, server, number, channel, ring_time, talk_time, duration, outcome in rows:
+            if outcome == ANSWERED:
+                line = f"📗 {start}  {server}  {channel} — {format_duration(talk_time)}\n"
+            else:
+                line = f"📕 {start}  {server}  {channel}  (⏰ {format_duration(ring_time)})\n"
+            output_box.insert(tk.END, line, "call")
+
+    def show_diagnostics():
+        # Where the time of a refresh goes: stage timers (p50/p95/p99) and counters, once a second
+        global current_view
+        current_view = "diagnostics"
+        call_view.hide()
+        queue_view.hide()
+        output_box.pack()
+        for caller in connected_callers:
+            if caller.scheduler:
+                caller.scheduler.resume()  # keep polling so the numbers stay live
+        select_view(btn4)
+        if diagnostics_job:
+            root.after_cancel(diagnostics_job.pop())
+        refresh_diagnostics()
+
+    def refresh_diagnostics():
+        diagnostics_job.clear()
+        if current_view != "diagnostics":
+            return
+        try:
+            metrics.dump(DIAGNOSTICS_FILE)  # also saved as JSON, to compare with the PBX load
+        except OSError:
+            pass
+        output_box.delete(1.0, tk.END)
+        output_box.insert(tk.END, msg.diagnostics_header.format(time=time.strftime('%d-%m-%Y %H:%M:%S'), path=DIAGNOSTICS_FILE) + "\n\n", "timestamp")
+        output_box.insert(tk.END, "\n".join(metrics.report()) + "\n", "call")
+        diagnostics_job.append(root.after(1000, refresh_diagnostics))
+
+    def show_statistics():
+        # Calls per number, answer rate, ring time, peak concurrency and calls per minute, once a second
+        global current_view
+        current_view = "statistics"
+        call_view.hide()
+        queue_view.hide()
+        output_box.pack()
+        for caller in connected_callers:
+            if caller.scheduler:
+                caller.scheduler.resume()  # keep polling so the numbers stay live
+        select_view(btn5)
+        if statistics_job:
+            root.after_cancel(statistics_job.pop())
+        refresh_statistics()
+
+    def refresh_statistics():
+        statistics_job.clear()
+        if current_view != "statistics":
+            return
+        output_box.delete(1.0, tk.END)
+        output_box.insert(tk.END, msg.statistics_header.format(time=time.strftime('%d-%m-%Y %H:%M:%S')) + "\n\n", "timestamp")
+        output_box.insert(tk.END, "\n".join(stats.report()) + "\n", "call")
+        statistics_job.append(root.after(1000, refresh_statistics))
+
+    def get_answered_calls():
+        global current_view
+        current_view = "answered"
+        for caller in connected_callers:
+            if caller.scheduler:
+                caller.scheduler.pause()  # the current view is hidden, stop polling the PBX
+        call_view.hide()
+        queue_view.hide()
+        output_box.pack()
+        output_box.delete(1.0, tk.END)
+        output_box.insert(tk.END, msg.loading_answered + "\n", ("info", "loading"))
+        for caller in connected_callers:
+            worker.submit(caller.show_cdr, True)
+        select_view(btn3)
+
+
+    def get_missed__calls():
+        global current_view
+        current_view = "missed"
+        for caller in connected_callers:
+            if caller.scheduler:
+                caller.scheduler.pause()  # the current view is hidden, stop polling the PBX
+        call_view.hide()
+        queue_view.hide()
+        output_box.pack()
+        output_box.delete(1.0, tk.END)
+        output_box.insert(tk.END, msg.loading_missed + "\n", ("info", "loading"))
+        for caller in connected_callers:
+            worker.submit(caller.show_cdr, False)
+        select_view(btn2)
+
+    def show_queues():
+        # Waiting callers, longest wait, service level and agent states per queue, once a second
+        global current_view
+        current_view = "queues"
+        call_view.hide()
+        output_box.pack_forget()
+        for caller in connected_callers:
+            if caller.scheduler:
+                caller.scheduler.resume()  # over SSH, `queue show` is run with the polls
+        select_view(btn6)
+        queue_view.show(queues, fill=tk.BOTH, expand=True)
+
+    # Panel with the view buttons (above the call window)
+    extra_button_frame = tk.Frame(root, bg="#FAF3E0")
+    extra_button_frame.pack(pady=5)
+
+    btn1 = tk.Button(extra_button_frame, text=msg.current_status, width=20, font=("Helvetica", 10), command=get_current_status)
+    btn1.pack(side=tk.LEFT, padx=5)
+
+    btn2 = tk.Button(extra_button_frame, text=msg.missed_calls, width=20, font=("Helvetica", 10), command=get_missed__calls)
+    btn2.pack(side=tk.LEFT, padx=5)
+
+    btn3 = tk.Button(extra_button_frame, text=msg.answered_calls, width=20, font=("Helvetica", 10), command=get_answered_calls)
+    btn3.pack(side=tk.LEFT, padx=5)
+
+    btn4 = tk.Button(extra_button_frame, text=msg.diagnostics, width=20, font=("Helvetica", 10), command=show_diagnostics)
+    btn4.pack(side=tk.LEFT, padx=5)
+
+    btn5 = tk.Button(extra_button_frame, text=msg.statistics, width=20, font=("Helvetica", 10), command=show_statistics)
+    btn5.pack(side=tk.LEFT, padx=5)
+
+    btn6 = tk.Button(extra_button_frame, text=msg.queues, width=20, font=("Helvetica", 10), command=show_queues)
+    action_buttons = [btn1, btn2, btn3, btn4, btn5]
+    if queues:
+        # Only with a "queues" section in config.json; six buttons have to be narrower to fit
+        btn6.pack(side=tk.LEFT, padx=5)
+        action_buttons.append(btn6)
+        for btn in action_buttons:
+            btn.config(width=15)
+    button_bg = btn1.cget("bg")  # the default colour of the theme, "SystemButtonFace" only exists on Windows
+    for btn in action_buttons:
+        btn.config(state=tk.DISABLED)
+
+
+    view_frame = tk.Frame(root, bg="#FAF3E0")
+    view_frame.pack(pady=10, padx=15)
+
+    # Output window
+    output_box = scrolledtext.ScrolledText(
+        view_frame, width=90, height=12,
+        font=("Courier New", 11),
+        bg="#FFF9F0", fg="#333333",
+        relief="solid", bd=2
+    )
+    output_box.tag_config("timestamp", foreground="#8C4A27", font=("Courier New", 10, "bold"))
+    output_box.tag_config("separator", foreground="#CCCCCC")
+    output_box.tag_config("info", foreground="#555555", font=("Courier New", 10, "italic"))
+    output_box.tag_config("error", foreground="red", font=("Courier New", 10, "bold"))
+    output_box.tag_config("warning", foreground="#FF6600", font=("Courier New", 10, "bold"))
+    output_box.tag_config("call", foreground="#003366")
+    output_box.pack()
+
+    # Active calls table (the "current" view)
+    call_view = CallTreeView(view_frame, msg.columns, metrics=metrics)
+    # Queues and agents table (the "queues" view)
+    queue_view = QueueTreeView(view_frame, msg, metrics=metrics)
+
+    # Saved connection settings of the chosen profile; the password is decrypted once the window is up
+    settings = profile(config)
+    host_value = settings.get("host", "")
+    username_value = settings.get("username", "")
+    password_value = settings.get("password", "")
+
+    # History of the finished calls of all servers (SQLite), written by a background thread
+    history = CallHistory(config.get("history_file") or CONFIG_FILE.parent / "history.sqlite", metrics=metrics)
+    call_view.on_open(lambda values: show_number_history(values[2].partition(" ")[0]))  # without the contact name
+
+    def reveal(value):
+        try:
+            return store.reveal(value)
+        except ConfigError as e:
+            messagebox.showwarning(msg.error, str(e))
+            return None
+
+    # Popups, e-mail, webhook and SMS about the ringing calls ("notifications" in config.json)
+    popup = CallPopup(root)
+    notifier = notifier_from_config(config.get("notifications"), show=lambda title, lines: ui.post(popup.show, title, lines),
+                                    metrics=metrics, title=msg.incoming_call, reveal=reveal)
+
+    # Contact names for the numbers from a phonebook ("contacts" in config.json), looked up in the background
+    contacts = resolver_from_config(config.get("contacts"), on_resolved=lambda number: ui.post(show_contact_names),
+                                    metrics=metrics, reveal=reveal)
+
+    # With "async_core" all servers are polled from one asyncio event loop (async_monitor.py)
+    monitor_loop = None
+    if config.get("async_core"):
+        from async_monitor import MonitorLoop
+        monitor_loop = MonitorLoop().start()
+
+    # Input fields
+    if profile_names(config):
+        # Several sets of servers ("profiles" in config.json): choosing one fills the fields
+        profile_frame = tk.Frame(root, bg="#FAF3E0")
+        profile_frame.pack(pady=5)
+        tk.Label(profile_frame, text=msg.profile, width=15, anchor="e").pack(side=tk.LEFT)
+        profile_var = tk.StringVar(value=config.get("profile") or profile_names(config)[0])
+        tk.OptionMenu(profile_frame, profile_var, *profile_names(config),
+                      command=lambda name: choose_profile(name)).pack(side=tk.LEFT, padx=5)
+
+    host_frame = tk.Frame(root, bg="#FAF3E0")
+    host_frame.pack(pady=5)
+
+    host_label = tk.Label(host_frame, text="IP Asterisk:", width=15, anchor="e")
+    host_label.pack(side=tk.LEFT)
+
+    host_entry = tk.Entry(host_frame, font=("Helvetica", 12), width=30)
+    host_entry.insert(0, host_value)
+    host_entry.pack(side=tk.LEFT, padx=5)
+
+    #================
+    username_frame = tk.Frame(root, bg="#FAF3E0")
+    username_frame.pack(pady=5)
+
+    username_label = tk.Label(username_frame, text=msg.username, width=15, anchor="e")
+    username_label.pack(side=tk.LEFT)
+
+    username_entry = tk.Entry(username_frame, font=("Helvetica", 12), width=30)
+    username_entry.insert(0, username_value)
+    username_entry.pack(side=tk.LEFT, padx=5)
+
+    #=====
+
+    password_frame = tk.Frame(root, bg="#FAF3E0")
+    password_frame.pack(pady=5)
+
+    password_label = tk.Label(password_frame, text=msg.password, width=15, anchor="e")
+    password_label.pack(side=tk.LEFT)
+
+    password_entry = tk.Entry(password_frame, font=("Helvetica", 12), show="*", width=30)
+    password_entry.pack(side=tk.LEFT, padx=5)
+
+    def fill_fields(settings):
+        host_entry.delete(0, tk.END)
+        host_entry.insert(0, settings.get("host", ""))
+        username_entry.delete(0, tk.END)
+        username_entry.insert(0, settings.get("username", ""))
+        password_entry.delete(0, tk.END)
+        try:
+            password_entry.insert(0, store.reveal(settings.get("password", "")))
+        except ConfigError as e:
+            messagebox.showwarning(msg.error, str(e))
+
+    def choose_profile(name):
+        config["profile"] = name
+        fill_fields(profile(config))
+
+    def check_config():
+        # config.json edited outside the window: apply what can change without dropping the connections
+        if store.changed():
+            try:
+                new_config = store.load()
+                channel_filter = ChannelFilter.from_config(profile(new_config).get("filter"))
+            except (ConfigError, ValueError) as e:
+                messagebox.showwarning(msg.error, msg.config_reload_failed.format(error=e))
+            else:
+                config.clear()
+                config.update(new_config)
+                settings = profile(config)
+                for caller in connected_callers:
+                    if caller.scheduler:
+                        caller.scheduler.configure(**poll_options(config))
+                    caller.set_channel_filter(channel_filter)
+                if not callers:
+                    fill_fields(settings)  # the servers and the user are used by the next Connect
+        root.after(CONFIG_CHECK_MS, check_config)
+
+    # buttons
+    button_frame = tk.Frame(root, bg="#FAF3E0")
+    button_frame.pack(pady=10)
+
+
+
+
+    def run_connection(ask=True):
+        settings = profile(config)
+        # With "feed_url" the window is a client of headless.py --serve and does not poll the PBX itself
+        if settings.get("feed_url"):
+            connect_feed(settings["feed_url"], reveal(settings.get("feed_token")))
+            return
+
+        host = host_entry.get()
+        username = username_entry.get()
+        password = password_entry.get()
+        default_port = settings.get("port", DEFAULT_SSH_PORT)
+        servers = parse_hosts(host, default_port)  # several servers separated by commas, port after ':'
+        # With a key file or an SSH agent the password may stay empty
+        key_auth = settings.get("key_file") or settings.get("use_agent")
+
+        if not all([servers, username, password or key_auth]):
+            messagebox.showwarning(msg.error, msg.fields_required)
+            return
+
+        if ask:  # not when connecting on startup
+            # The fields belong to the chosen profile, if there are profiles
+            target = config["profiles"][config["profile"]] if config.get("profile") in (config.get("profiles") or {}) else config
+            # Ask whether to keep the entered data
+            if messagebox.askyesno(msg.save_title, msg.save_question):
+                target.update(host=host, username=username, password=password)
+            else:
+                target.update(host=host, username=username)
+                target.pop("password", None)  # the password is not saved
+            saved = save_config(store, config, msg)  # AMI settings (ami_port, ami_username, ami_secret) are kept as they are
+            if saved:
+                config.clear()
+                config.update(saved)
+        try:
+            ami_secret = store.reveal(settings.get("ami_secret"))
+            channel_filter = ChannelFilter.from_config(settings.get("filter"))
+        except (ConfigError, ValueError) as e:
+            messagebox.showwarning(msg.error, str(e))
+            return
+
+        for label in extra_status_frame.winfo_children():
+            label.destroy()
+        stop_callers()
+        if queues:
+            queues.clear()
+        # Every server is polled by its own thread, a slow server does not hold up the others
+        if len(servers) > len(worker.threads):
+            worker.add_threads(len(servers) - len(worker.threads), "asterisk-io")
+        call_view.show_server_column(len(servers) > 1)
+
+        caller_class = async_calling_number() if monitor_loop else CallingNumber
+        for number, (server_host, port) in enumerate(servers):
+            if number == 0:
+                label = status_label
+            else:
+                label = tk.Label(extra_status_frame, text=msg.status_idle, font=("Helvetica", 12),
+                                 bg="#FAF3E0", fg="gray")
+                label.pack()
+            caller = caller_class(server_host, port, username, password, output_box, label, call_view, ui, msg,
+                                  ami_port=settings.get("ami_port"), ami_username=settings.get("ami_username"),
+                                  ami_secret=ami_secret,
+                                  max_call_age=config.get("max_call_age", 3600),
+                                  max_finished_calls=config.get("max_finished_calls", 1000),
+                                  cdr_path=settings.get("cdr_path", DEFAULT_CDR_PATH),
+                                  cdr_index_file=CONFIG_FILE.parent / f"cdr_{file_key(server_host, port, default_port)}.sqlite",
+                                  keepalive=config.get("ssh_keepalive", 15),
+                                  name=server_name(server_host, port, default_port) if len(servers) > 1 else "",
+                                  history=history, metrics=metrics, notifier=notifier,
+                                  stats=stats, channel_filter=channel_filter, contacts=contacts,
+                                  key_file=settings.get("key_file"), use_agent=settings.get("use_agent", False),
+                                  queues=queues)
+            callers.append(caller)
+            connecting.add(caller)
+        connect_button.config(state=tk.DISABLED)
+        for caller in callers:
+            if monitor_loop:
+                monitor_loop.submit(connect_async(caller))
+            else:
+                worker.submit(connect_in_background, caller)
+
+    def connect_feed(url, token=None):
+        stop_callers()
+        call_view.show_server_column(True)
+        caller = FeedCallingNumber(url, output_box, status_label, call_view, ui, msg, token=token,
+                                   history=history, metrics=metrics, notifier=notifier,
+                                   stats=stats, contacts=contacts)
+        callers.append(caller)
+        connecting.add(caller)
+        connect_button.config(state=tk.DISABLED)
+        worker.submit(connect_in_background, caller)
+
+    def stop_callers(wait=False):
+        # The replaced monitors close their connections and poll threads instead of only leaving the lists
+        for caller in callers:
+            stop_caller(caller, wait)
+        callers.clear()
+        connected_callers.clear()
+
+    def stop_caller(caller, wait=False):
+        if monitor_loop and not isinstance(caller, FeedCallingNumber):
+            stopped = monitor_loop.submit(caller.stop())
+            if wait:
+                try:
+                    stopped.result(5)
+                except Exception:
+                    pass  # the window is closing anyway
+        elif wait:
+            caller.stop()
+        else:
+            worker.submit(caller.stop)
+
+    def connect_in_background(caller):
+        # The SSH handshake runs in the worker thread, so the window keeps responding
+        caller.connect()
+        ui.post(on_connected, caller)
+
+    async def connect_async(caller):
+        # The handshake runs on the event loop, so the window keeps responding
+        await caller.connect()
+        ui.post(on_connected, caller)
+
+    def on_connected(caller):
+        connecting.discard(caller)
+        if caller not in callers:
+            stop_caller(caller)  # replaced by another Connect while it was connecting
+            return
+        if not caller.is_connected():
+            if not connecting and not connected_callers:
+                connect_button.config(state=tk.NORMAL)  # no server could be reached, allow another attempt
+            return
+
+        connected_callers.append(caller)
+        if len(connected_callers) == 1:
+            # Activate the buttons
+            for btn in action_buttons:
+                btn.config(state=tk.NORMAL)
+
+            # Open "Current Status" automatically; the view is chosen before the first poll reads it
+            btn1.invoke()
+
+        caller.start_polling(**poll_options(config))
+        if current_view not in LIVE_VIEWS:
+            caller.scheduler.pause()  # the server connected while another view is open
+
+    connect_button = tk.Button(
+        button_frame, text=msg.connect,
+        font=("Helvetica", 12, "bold"), command=run_connection,
+        bg="#F5A623", fg="white", relief="raised", bd=2, width=18
+    )
+    connect_button.pack(side=tk.LEFT, padx=20)
+
+    exit_button = tk.Button(
+        button_frame, text=msg.exit,
+        font=("Helvetica", 12, "bold"), command=root.quit,
+        bg="#D9534F", fg="white", relief="raised", bd=2, width=10
+    )
+    exit_button.pack(side=tk.LEFT, padx=20)
+
+    if config_problem:
+        error, path = config_problem
+        root.after_idle(messagebox.showwarning, msg.error, msg.config_invalid.format(error=error, path=path))
+    # Decrypting loads the cipher, which is left until the window is up
+    root.after_idle(fill_fields, settings)
+    # With "auto_connect": true the saved servers are connected in the background once the window is up
+    key_auth = settings.get("key_file") or settings.get("use_agent")
+    if config.get("auto_connect") and (settings.get("feed_url") or host_value and username_value
+                                       and (password_value or key_auth)):
+        root.after_idle(run_connection, False)
+    root.after(CONFIG_CHECK_MS, check_config)
+
+    root.mainloop()
+    stop_callers(wait=True)
+    if monitor_loop:
+        monitor_loop.stop()  # cancel the poll tasks
+    if notifier:
+        notifier.close()  # send the notifications that are still waiting
+    if contacts:
+        contacts.close()
+    history.close()  # write out whatever is still queued
+
+if __name__ == "__main__":
+    start_gui()
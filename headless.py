@@ -0,0 +1,361 @@
+"""
+Headless call monitoring, without the Tk window.
+
+Every poll is written as one JSON object per line to stdout or a file:
+
+    {"type": "snapshot", "server": "10.0.0.1", "time": 1713340000.5, "calls": [...]}
+    {"type": "status", "server": "10.0.0.1", "connected": false, "error": "..."}
+    {"type": "ringing", "server": "10.0.0.1", "time": 1713340040.3, "call": {"number": "79...", ...}}
+    {"type": "ended", "server": "10.0.0.1", "time": 1713340042.1, "call": {..., "outcome": "missed"}}
+    {"type": "error", "server": "10.0.0.1", "kind": "command_failed", "error": "..."}
+    {"type": "metrics", "stages_ms": {"ssh.exec": {"p50": ..., "p95": ..., "p99": ...}}, "counters": {...}}
+    {"type": "stats", "active": 12, "peak": 30, "answer_rate": 0.82, "windows": {"60": {"calls_per_minute": ...}}}
+    {"type": "queues", "queues": [{"server": ..., "queue": "support", "waiting": 2, "longest_wait": 25.0, ...}]}
+
+Settings are taken from a config.json in the same format as the GUI one
+(--config, --profile) and can be overridden on the command line; changes
+of the poll intervals and of the filter in that file are applied while
+running. The password can also come from the ASTERISK_PASSWORD environment
+variable, so it does not show up in the process list, or be left out with
+--key-file or --agent. E-mail, webhook and SMS notifications about ringing
+calls are sent when config.json has a "notifications" section, and the
+call-centre queues are followed (the "queues" record, written with the
+metrics) when it has a "queues" section or with --queues.
+
+    python headless.py --host 10.0.0.1,10.0.0.2 --username admin --output calls.jsonl
+
+With --async all servers are polled by tasks on one asyncio event loop
+(async_monitor.py) instead of a thread per server. With --serve the polls
+are also served to the GUI windows and other clients over HTTP, so many
+operators share this one poller (see live_feed.py).
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+
+from cdr import DEFAULT_CDR_PATH
+from channel_filter import ChannelFilter
+from config_store import DEFAULT_SSH_PORT, ConfigError, ConfigStore, poll_options, profile, profile_names
+from contacts import resolver_from_config
+from history import CallHistory
+from live_stats import LiveStats
+from metrics import Metrics
+from monitor import CallMonitor
+from notifications import notifier_from_config
+from queue_monitor import QueueBoard
+from servers import parse_hosts, server_name
+
+
+class JsonLinesWriter:
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self.lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+class JsonLinesMonitor(CallMonitor):
+    """Call monitor that writes snapshots and status changes as JSON lines."""
+
+    def __init__(self, host, port, username, password, writer, changes_only=False, **options):
+        super().__init__(host, port, username, password, **options)
+        self.writer = writer
+        self.changes_only = changes_only
+        self.last_rows = None
+
+    def emit(self, kind, **fields):
+        self.writer.write(dict(type=kind, server=self.name, time=round(time.time(), 3), **fields))
+
+    def on_connected(self):
+        self.emit("status", connected=True, since=self.connected_at)
+
+    def on_connect_failed(self, error):
+        self.emit("status", connected=False, error=str(error))
+
+    def on_disconnected(self, error):
+        self.emit("status", connected=False, error=str(error))
+
+    def on_poll_error(self, kind, error):
+        self.emit("error", kind=kind, error=str(error) if error else None)
+
+    def on_calls(self, rows, polled_at):
+        # Durations change on every poll, so only the set of calls and their states are compared
+        states = {key: (number, status) for key, (channel, number, duration, status) in rows.items()}
+        if self.changes_only and states == self.last_rows:
+            return
+        self.last_rows = states
+        calls = []
+        for key, (channel, number, duration, status) in rows.items():
+            call = self.describe(self.calls.get(key))
+            call.update(duration=duration)
+            calls.append(call)
+        self.emit("snapshot", calls=calls)
+
+    def on_call_ringing(self, record):
+        self.emit("ringing", call=self.describe(record))
+
+    def on_call_ended(self, record):
+        self.emit("ended", call=self.describe(record))
+
+    def describe(self, record):
+        call = record.as_dict()
+        call.update(key=record.key, channel=record.channel)
+        if self.contacts:
+            call.update(name=self.contacts.name(record.number))
+        return call
+
+
+def async_json_lines_monitor():
+    """JsonLinesMonitor on the asyncio core (--async).
+
+    async_monitor (and asyncio with it) is only imported when that core is used.
+    """
+    from async_monitor import AsyncCallMonitor
+
+    class AsyncJsonLinesMonitor(AsyncCallMonitor, JsonLinesMonitor):
+        pass
+
+    return AsyncJsonLinesMonitor
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Monitor Asterisk calls without the GUI, one JSON line per poll")
+    parser.add_argument("--config", help="config.json with the same keys as the GUI settings")
+    parser.add_argument("--profile", help="profile of config.json to use instead of the chosen one")
+    parser.add_argument("--host", help="server or comma-separated servers, host[:ssh_port]")
+    parser.add_argument("--username")
+    parser.add_argument("--password", help="defaults to $ASTERISK_PASSWORD")
+    parser.add_argument("--key-file", help="SSH private key; --password then unlocks it if it is encrypted")
+    parser.add_argument("--agent", action="store_true", help="authenticate with the keys of the running ssh-agent")
+    parser.add_argument("--ami-port", type=int, help="use AMI on this port instead of SSH polling")
+    parser.add_argument("--output", help="append the JSON lines to this file instead of stdout")
+    parser.add_argument("--changes-only", action="store_true", help="skip snapshots where no call appeared, ended or changed state")
+    parser.add_argument("--history", help="also keep the finished calls in this SQLite file")
+    parser.add_argument("--metrics-interval", type=float, default=0,
+                        help="write a metrics line (stage timings, counters) every N seconds")
+    parser.add_argument("--metrics-file", help="keep the latest metrics snapshot in this JSON file")
+    parser.add_argument("--once", action="store_true", help="poll every server once and exit")
+    parser.add_argument("--retry", type=float, default=30.0, help="seconds between attempts to connect (default 30)")
+    parser.add_argument("--async", dest="async_core", action="store_true",
+                        help="poll all servers from one asyncio event loop (SSH needs asyncssh)")
+    parser.add_argument("--queues", action="store_true",
+                        help="follow the app_queue queues and agents (also on with a \"queues\" section in config.json)")
+    parser.add_argument("--serve", metavar="[HOST:]PORT",
+                        help="serve the live calls on this address, e.g. 127.0.0.1:8765 (default host 127.0.0.1)")
+    parser.add_argument("--feed-token", help="token the feed clients must send, required to serve on an address "
+                                             "other than loopback; defaults to $FEED_TOKEN")
+    return parser.parse_args(argv)
+
+
+def parse_listen(address):
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def run(monitor, config, retry, stopped):
+    # Unlike the GUI, the daemon keeps trying until the server is reachable
+    while not monitor.connect():
+        if stopped.wait(retry):
+            return
+    monitor.start_polling(**poll_options(config))
+
+
+async def poll_once_async(monitors):
+    import asyncio
+    connected = await asyncio.gather(*(monitor.connect() for monitor in monitors))
+    await asyncio.gather(*(monitor.poll() for monitor, ok in zip(monitors, connected) if ok))
+    await asyncio.gather(*(monitor.stop() for monitor in monitors))
+    return connected.count(False)
+
+
+async def run_async(monitors, config, retry, interval, on_interval, on_tick=None):
+    import asyncio
+    import async_monitor
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stopped.set)
+    tasks = [loop.create_task(async_monitor.run(monitor, retry, **poll_options(config)))
+             for monitor in monitors]
+    last_interval = loop.time()
+    while True:
+        try:
+            await asyncio.wait_for(stopped.wait(), 1.0)
+            break
+        except asyncio.TimeoutError:
+            if on_tick:
+                on_tick()
+            if interval and loop.time() - last_interval >= interval:
+                last_interval = loop.time()
+                on_interval()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def write_metrics(metrics, writer, to_output, path, stats=None, queues=None):
+    if to_output:
+        writer.write(dict(type="metrics", **metrics.snapshot()))
+        if stats:
+            writer.write(dict(type="stats", **stats.snapshot()))
+        if queues:
+            writer.write(dict(type="queues", queues=queues.snapshot()))
+    if path:
+        try:
+            metrics.dump(path)
+        except OSError as e:
+            print(f"Could not write {path}: {e}", file=sys.stderr)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    store = ConfigStore(args.config) if args.config else None
+    try:
+        config = store.load() if store else {}
+        if args.profile and args.profile not in profile_names(config):
+            raise ConfigError(f"no profile named {args.profile!r}")
+        settings = profile(config, args.profile)
+        password = args.password or os.getenv("ASTERISK_PASSWORD") or store and store.reveal(settings.get("password"))
+        ami_secret = store and store.reveal(settings.get("ami_secret"))
+        feed_token = args.feed_token or os.getenv("FEED_TOKEN") or store and store.reveal(settings.get("feed_token"))
+        channel_filter = ChannelFilter.from_config(settings.get("filter"))
+    except (ConfigError, ValueError) as e:
+        print(f"{args.config}: {e}", file=sys.stderr)
+        return 2
+    host = args.host or settings.get("host", "")
+    username = args.username or settings.get("username", "")
+    key_file = args.key_file or settings.get("key_file")
+    use_agent = args.agent or settings.get("use_agent", False)
+    default_port = settings.get("port", DEFAULT_SSH_PORT)
+    servers = parse_hosts(host, default_port)
+    if not all([servers, username, password or key_file or use_agent]):
+        print("host, username and password (or --key-file/--agent) are required "
+              "(--host/--username/--password or --config)", file=sys.stderr)
+        return 2
+
+    output = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    writer = JsonLinesWriter(output)
+    history_file = args.history or config.get("history_file")
+    metrics = Metrics()
+    try:
+        notifier = notifier_from_config(config.get("notifications"), metrics=metrics, reveal=store and store.reveal)
+        contacts = resolver_from_config(config.get("contacts"), metrics=metrics, reveal=store and store.reveal)
+    except ConfigError as e:
+        print(f"{args.config}: {e}", file=sys.stderr)
+        return 2
+    history = CallHistory(history_file, metrics=metrics) if history_file else None
+    stats = LiveStats()
+    queues = QueueBoard.from_config(config.get("queues", True if args.queues else None), metrics=metrics)
+    listen = args.serve or config.get("feed_listen")
+    feed = feed_server = None
+    if listen and not args.once:
+        from live_feed import FeedServer, LiveFeed
+        feed = LiveFeed(history=history, metrics=metrics)
+        try:
+            feed_server = FeedServer(feed, *parse_listen(str(listen)), token=feed_token).start()
+        except ValueError as e:
+            print(f"--serve: {e} (--feed-token)", file=sys.stderr)
+            if history:
+                history.close()
+            return 2
+        print(f"Serving the live calls on {feed_server.url}", file=sys.stderr)
+    monitor_class = async_json_lines_monitor() if args.async_core else JsonLinesMonitor
+    monitors = [monitor_class(server_host, port, username, password, writer,
+                                 changes_only=args.changes_only,
+                                 ami_port=args.ami_port or settings.get("ami_port"),
+                                 ami_username=settings.get("ami_username"),
+                                 ami_secret=ami_secret,
+                                 max_call_age=config.get("max_call_age", 3600),
+                                 max_finished_calls=config.get("max_finished_calls", 1000),
+                                 cdr_path=settings.get("cdr_path", DEFAULT_CDR_PATH),
+                                 keepalive=config.get("ssh_keepalive", 15),
+                                 name=server_name(server_host, port, default_port), history=history,
+                                 metrics=metrics, notifier=notifier, stats=stats,
+                                 channel_filter=channel_filter, contacts=contacts, feed=feed,
+                                 key_file=key_file, use_agent=use_agent, queues=queues)
+                for server_host, port in servers]
+
+    def reload_config():
+        # config.json edited while running: new poll intervals and filter, without reconnecting
+        if not store or not store.changed():
+            return
+        try:
+            new_config = store.load()
+            new_filter = ChannelFilter.from_config(profile(new_config, args.profile).get("filter"))
+        except (ConfigError, ValueError) as e:
+            print(f"{args.config} not reloaded: {e}", file=sys.stderr)
+            return
+        for monitor in monitors:
+            if monitor.scheduler:
+                monitor.scheduler.configure(**poll_options(new_config))
+            monitor.set_channel_filter(new_filter)
+
+    interval = args.metrics_interval or (10.0 if args.metrics_file else 0)
+    try:
+        if args.async_core:
+            import asyncio
+            if args.once:
+                failed = asyncio.run(poll_once_async(monitors))
+            else:
+                failed = 0
+                asyncio.run(run_async(monitors, config, args.retry, interval,
+                                      lambda: write_metrics(metrics, writer, args.metrics_interval, args.metrics_file, stats, queues),
+                                      reload_config))
+            if args.once and (args.metrics_interval or args.metrics_file):
+                write_metrics(metrics, writer, args.metrics_interval, args.metrics_file, stats, queues)
+            return 1 if failed else 0
+
+        if args.once:
+            failed = 0
+            for monitor in monitors:
+                if monitor.connect():
+                    monitor.poll()
+                else:
+                    failed += 1
+            if args.metrics_interval or args.metrics_file:
+                write_metrics(metrics, writer, args.metrics_interval, args.metrics_file, stats, queues)
+            return 1 if failed else 0
+
+        stopped = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+        for monitor in monitors:
+            threading.Thread(target=run, args=(monitor, config, args.retry, stopped),
+                             name=f"connect-{monitor.name}", daemon=True).start()
+        last_interval = time.monotonic()
+        try:
+            while not stopped.wait(1.0):
+                reload_config()
+                if interval and time.monotonic() - last_interval >= interval:
+                    last_interval = time.monotonic()
+                    write_metrics(metrics, writer, args.metrics_interval, args.metrics_file, stats, queues)
+        except KeyboardInterrupt:
+            pass
+        stopped.set()
+        return 0
+    finally:
+        if not args.async_core:  # the async monitors are stopped by their tasks
+            for monitor in monitors:
+                monitor.stop()
+        if feed_server:
+            feed_server.stop()
+        if notifier:
+            notifier.close()
+        if contacts:
+            contacts.close()
+        if history:
+            history.close()
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
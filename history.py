@@ -0,0 +1,156 @@
+"""
+Local history of the calls seen by the monitor.
+
+Finished calls are kept in SQLite (WAL mode, so reading does not wait for
+writing). The pollers only put calls into a queue; a background thread
+writes them in batches, one transaction per batch. Indexes on number, start
+time and outcome keep the Missed / Answered views and the per-number
+lookups fast over months of calls.
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+import traceback
+
+from call_store import ANSWERED, MISSED
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    start TEXT NOT NULL,
+    server TEXT NOT NULL,
+    key TEXT,
+    channel TEXT,
+    number TEXT,
+    ring_time REAL,
+    talk_time REAL,
+    duration REAL,
+    outcome TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calls_by_start ON calls (start);
+CREATE INDEX IF NOT EXISTS calls_by_number_start ON calls (number, start);
+CREATE INDEX IF NOT EXISTS calls_by_outcome_start ON calls (outcome, start);
+"""
+
+COLUMNS = "start, server, number, channel, ring_time, talk_time, duration, outcome"
+
+
+def history_row(server, record, now=None, wall_now=None):
+    """Turn a finished CallRecord into a row of the calls table."""
+    now = time.monotonic() if now is None else now
+    wall_now = time.time() if wall_now is None else wall_now
+    start = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(wall_now - (now - record.started)))
+    return (start, server, record.key, record.channel, record.number,
+            round(record.ring_time(), 1), round(record.talk_time(), 1), round(record.total_time(), 1),
+            record.outcome)
+
+
+def _connect(filename):
+    db = sqlite3.connect(str(filename), check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+class CallHistory:
+    def __init__(self, filename, batch_size=500, flush_interval=1.0, metrics=None):
+        self.filename = filename
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.metrics = metrics  # optional metrics.Metrics, gets the "history.write" stage
+        self.db = _connect(filename)  # for reading, the writer thread has its own connection
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.written = 0
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, server, record):
+        """Queue a finished call. Returns at once, the row is written by the writer thread."""
+        self.queue.put(history_row(server, record))
+
+    def add_rows(self, rows):
+        for row in rows:
+            self.queue.put(row)
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is written."""
+        done = threading.Event()
+        self.queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        self.queue.put(None)
+        self._thread.join()
+        self.db.close()
+
+    def calls(self, answered, day=None, server=None, limit=200):
+        """Newest calls first; day is 'YYYY-MM-DD' or None for all days."""
+        query = f"SELECT {COLUMNS} FROM calls WHERE outcome = ?"
+        params = [ANSWERED if answered else MISSED]
+        query, params = self._filter(query, params, day, server)
+        query += " ORDER BY start DESC LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            return self.db.execute(query, params).fetchall()
+
+    def count(self, answered, day=None, server=None):
+        query = "SELECT COUNT(*) FROM calls WHERE outcome = ?"
+        params = [ANSWERED if answered else MISSED]
+        query, params = self._filter(query, params, day, server)
+        with self.lock:
+            return self.db.execute(query, params).fetchone()[0]
+
+    def for_number(self, number, limit=100):
+        """Newest calls from or to this number first."""
+        with self.lock:
+            return self.db.execute(f"SELECT {COLUMNS} FROM calls WHERE number = ? ORDER BY start DESC LIMIT ?",
+                                   (number, limit)).fetchall()
+
+    @staticmethod
+    def _filter(query, params, day, server):
+        if day:
+            query += " AND start >= ? AND start < ?"
+            params += [day, day + "~"]
+        if server:
+            query += " AND server = ?"
+            params.append(server)
+        return query, params
+
+    def _run(self):
+        db = _connect(self.filename)
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            batch, waiters = [], []
+            # Collect whatever else arrives within flush_interval into the same transaction
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is None:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stopping or waiters or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch:
+                started = time.perf_counter()
+                try:
+                    with db:
+                        db.executemany("INSERT INTO calls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+                    self.written += len(batch)
+                    if self.metrics:
+                        self.metrics.observe("history.write", time.perf_counter() - started)
+                        self.metrics.count("history.rows", len(batch))
+                except sqlite3.Error:
+                    traceback.print_exc()
+            for done in waiters:
+                done.set()
+        db.close()
@@ -0,0 +1,422 @@
+"""
+Live feed of the active calls, so that many operators share one poller.
+
+One process polls the PBX (python headless.py --serve 127.0.0.1:8765) and
+publishes every poll to a LiveFeed; the windows of the operators read the
+feed ("feed_url" in config.json) instead of polling the PBX themselves, so
+the PBX sees one poller however many people are watching.
+
+    GET /snapshot          {"run", "seq", "time", "sources": {server: {id: row}}, "status": {server: {...}}}
+    GET /events            text/event-stream: a "snapshot" event, then "delta" and "status" events
+    GET /calls?answered=1  newest finished calls, if the serving process keeps a history
+
+A row is [channel, number, status, started, leg], started being the Unix
+time the call began, so the clients count the durations themselves and a
+row only changes when the call does; leg is 1 for a channel that is part
+of another call (a dialed phone), which the clients do not count as a call. Rows are keyed by the stable ids of
+snapshots.SnapshotStream, and a delta is {"seq", "source", "added",
+"changed", "removed"}; its SSE id is "run:seq". A client that reconnects
+with that id in Last-Event-ID gets a "resume" event and the deltas it
+missed, or a snapshot if they are no longer kept. Every event is encoded to
+JSON once, whatever the number of clients. The answers carry no CORS
+header: the feed has the callers' numbers, and a web page opened by an
+operator must not be able to read it. For the same reason a feed served on
+anything but a loopback address needs a token, which the clients send as
+"Authorization: Bearer <token>".
+
+Every client has its own bounded queue. A client that does not keep up
+loses its queued deltas and gets a fresh snapshot when it reads again, so a
+slow client never holds up the poller or the other clients.
+"""
+
+import hmac
+import ipaddress
+import json
+import threading
+import time
+import traceback
+import urllib.parse
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from snapshots import SnapshotMirror, SnapshotStream
+
+MAX_QUEUE = 256     # events waiting per client before it is resynced with a snapshot
+HEARTBEAT = 15.0    # seconds between keep-alive comments on an idle stream
+
+
+def feed_rows(rows, calls, now=None, wall_now=None):
+    """Turn the {key: (channel, number, duration, status)} rows of a poll into feed rows."""
+    now = time.monotonic() if now is None else now
+    wall_now = time.time() if wall_now is None else wall_now
+    result = {}
+    for key, (channel, number, duration, status) in rows.items():
+        call = calls.get(key)
+        if call:
+            number = call.number  # without the contact name, the clients look it up themselves
+        # Whole seconds, so the start time does not wobble from poll to poll
+        started = round(wall_now - (now - call.started)) if call else None
+        result[key] = [channel, number, status, started, int(bool(call and call.leg_of is not None))]
+    return result
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _encode(kind, data, event_id=None):
+    text = f"event: {kind}\ndata: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n"
+    if event_id:
+        text = f"id: {event_id}\n" + text
+    return text.encode("utf-8")
+
+
+def _parse_event_id(event_id):
+    """(run, seq) from a "run:seq" event id, or None."""
+    run, _, seq = (event_id or "").partition(":")
+    return (run, int(seq)) if seq.isdigit() else None
+
+
+class Subscriber:
+    """The queue of one client; starts with (and falls back to) a full snapshot."""
+
+    def __init__(self, max_queue=MAX_QUEUE):
+        self.max_queue = max_queue
+        self.events = deque()
+        self.resync = True
+        self.closed = False
+        self.dropped = 0
+        self.condition = threading.Condition()
+
+    def put(self, data):
+        with self.condition:
+            if self.resync:
+                return  # a snapshot is due anyway
+            if len(self.events) >= self.max_queue:
+                self.dropped += len(self.events)
+                self.events.clear()
+                self.resync = True
+            else:
+                self.events.append(data)
+            self.condition.notify()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+
+class LiveFeed:
+    def __init__(self, max_queue=MAX_QUEUE, history=None, metrics=None):
+        self.max_queue = max_queue
+        self.history = history  # history.CallHistory for /calls, or None
+        self.metrics = metrics  # optional metrics.Metrics, counts events, clients and resyncs
+        self.stream = SnapshotStream(backlog=max_queue)
+        self.status = {}    # server -> {"connected": bool, "error": str or None, "time": ...}
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def publish(self, server, rows, calls):
+        """Store the rows of a poll (see CallMonitor.on_calls) and send the differences to every client."""
+        rows = feed_rows(rows, calls)
+        with self.lock:
+            delta = self.stream.update(server, rows)
+            if delta:
+                self._broadcast(_encode("delta", delta, f"{self.stream.run}:{delta['seq']}"))
+
+    def set_status(self, server, connected, error=None):
+        status = {"connected": connected, "error": error, "time": time.time()}
+        with self.lock:
+            self.status[server] = status
+            self._broadcast(_encode("status", dict(status, server=server)))
+
+    def snapshot(self):
+        with self.lock:
+            return self._snapshot()
+
+    def subscribe(self, last_event_id=None):
+        """A new client queue; with the id of the last event a client saw, it resumes from there."""
+        subscriber = Subscriber(self.max_queue)
+        last = _parse_event_id(last_event_id)
+        with self.lock:
+            missed = self.stream.since(*last) if last else None
+            if missed is not None:
+                subscriber.resync = False
+                subscriber.events.append(_encode("resume", {"run": self.stream.run, "seq": last[1]}))
+                for delta in missed:
+                    subscriber.events.append(_encode("delta", delta, f"{self.stream.run}:{delta['seq']}"))
+            self.subscribers.add(subscriber)
+        if self.metrics:
+            self.metrics.count("feed.clients")
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def next_event(self, subscriber, timeout=HEARTBEAT):
+        """The next encoded event for a client, or None after timeout seconds without one."""
+        with subscriber.condition:
+            if not subscriber.resync and not subscriber.events and not subscriber.closed:
+                subscriber.condition.wait(timeout)
+            if subscriber.closed:
+                raise EOFError("feed closed")
+            if subscriber.events:
+                return subscriber.events.popleft()
+            if not subscriber.resync:
+                return None
+        # The snapshot is taken under the feed lock, so no delta can slip in between
+        with self.lock:
+            with subscriber.condition:
+                subscriber.resync = False
+                subscriber.events.clear()
+            if self.metrics:
+                self.metrics.count("feed.snapshots")
+            snapshot = self._snapshot()
+            return _encode("snapshot", snapshot, f"{snapshot['run']}:{snapshot['seq']}")
+
+    def close(self):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.close()
+
+    def _snapshot(self):
+        return dict(self.stream.snapshot(), time=time.time(), status=dict(self.status))
+
+    def _broadcast(self, data):
+        if self.metrics:
+            self.metrics.count("feed.events")
+        for subscriber in self.subscribers:
+            was_resync = subscriber.resync
+            subscriber.put(data)
+            if subscriber.resync and not was_resync and self.metrics:
+                self.metrics.count("feed.resyncs")
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        try:
+            if not self.authorized():
+                self.send_json({"error": "a valid token is required"}, 401)
+            elif url.path == "/events":
+                self.stream()
+            elif url.path == "/snapshot":
+                self.send_json(self.server.feed.snapshot())
+            elif url.path == "/calls":
+                self.send_calls(query.get("answered", ["0"])[0] in ("1", "true"),
+                                query.get("limit", ["200"])[0])
+            else:
+                self.send_error(404)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def authorized(self):
+        token = self.server.token
+        if not token:
+            return True
+        return hmac.compare_digest(self.headers.get("Authorization", "").encode("utf-8"),
+                                   f"Bearer {token}".encode("utf-8"))
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_calls(self, answered, limit):
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = -1
+        if limit < 0:
+            self.send_json({"error": "limit must be a whole number, 0 or more"}, 400)
+            return
+        history = self.server.feed.history
+        if history is None:
+            self.send_json({"error": "no history on this server"}, 404)
+            return
+        self.send_json({"calls": history.calls(answered, limit=limit),
+                        "today": history.count(answered, time.strftime("%Y-%m-%d"))})
+
+    def stream(self):
+        feed = self.server.feed
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        subscriber = feed.subscribe(self.headers.get("Last-Event-ID"))
+        try:
+            while True:
+                try:
+                    data = feed.next_event(subscriber, self.server.heartbeat)
+                except EOFError:
+                    return
+                # Writing may block on a slow client; only this client's thread waits
+                self.wfile.write(data if data is not None else b": keep-alive\n\n")
+                self.wfile.flush()
+        finally:
+            feed.unsubscribe(subscriber)
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FeedServer:
+    """HTTP server for a LiveFeed; every client is served by its own thread."""
+
+    def __init__(self, feed, host="127.0.0.1", port=8765, heartbeat=HEARTBEAT, token=None):
+        if not token and not is_loopback(host):
+            raise ValueError(f"serving the feed on {host} needs a token, the calls would be open to anyone")
+        self.feed = feed
+        self.httpd = ThreadingHTTPServer((host, port), FeedHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.feed = feed
+        self.httpd.heartbeat = heartbeat
+        self.httpd.token = token
+        self.host, self.port = self.httpd.server_address[:2]
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="feed-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.feed.close()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FeedReader:
+    """Client side: follows /events of a feed server and keeps a copy of its snapshot.
+
+    on_change() is called from the reader thread after every event; the
+    connection is re-established every retry seconds when it drops, and the
+    deltas missed in between are asked for with Last-Event-ID.
+    """
+
+    def __init__(self, url, on_change=None, retry=5.0, timeout=HEARTBEAT * 2, token=None):
+        self.url = url.rstrip("/")
+        self.on_change = on_change
+        self.headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.retry = retry
+        self.timeout = timeout
+        self.mirror = SnapshotMirror()
+        self.status = {}
+        self.connected = False
+        self.connected_at = None
+        self.error = None
+        self.lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self, wait=None):
+        """Start reading; with wait, return once the first snapshot arrived (True) or wait seconds passed."""
+        self._thread = threading.Thread(target=self._run, name="feed-reader", daemon=True)
+        self._thread.start()
+        if wait:
+            self._ready.wait(wait)
+        return self.connected
+
+    def stop(self):
+        self._stopped.set()
+
+    def rows(self):
+        """{server: {id: row}}, a copy."""
+        with self.lock:
+            return {server: dict(rows) for server, rows in self.mirror.sources.items()}
+
+    def calls(self, answered, limit=200):
+        """Newest finished calls from the history of the serving process, and how many there were today."""
+        query = urllib.parse.urlencode({"answered": int(answered), "limit": limit})
+        request = urllib.request.Request(f"{self.url}/calls?{query}", headers=self.headers)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            data = json.load(response)
+        return data["calls"], data["today"]
+
+    def apply(self, kind, data):
+        """Apply one event; False if a delta was missed and the copy has to be resynced."""
+        with self.lock:
+            if kind == "snapshot":
+                self.mirror.load(data)
+                self.status = data.get("status", {})
+            elif kind == "resume":
+                return data["run"] == self.mirror.run and data["seq"] == self.mirror.seq
+            elif kind == "delta":
+                return self.mirror.apply(data)
+            elif kind == "status":
+                self.status[data["server"]] = data
+        return True
+
+    def _run(self):
+        while not self._stopped.is_set():
+            headers = dict(self.headers)
+            with self.lock:
+                if self.mirror.seq is not None:
+                    headers["Last-Event-ID"] = f"{self.mirror.run}:{self.mirror.seq}"
+            resync = False
+            try:
+                request = urllib.request.Request(f"{self.url}/events", headers=headers)
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    resync = self._read(response)
+            except (OSError, ValueError) as e:
+                self.error = str(e)
+            except Exception:
+                traceback.print_exc()
+            if resync:
+                with self.lock:
+                    self.mirror = SnapshotMirror()  # connect again at once, for a snapshot
+                continue
+            if self.connected:
+                self.connected = False
+                self._changed()
+            self._ready.set()
+            self._stopped.wait(self.retry)
+
+    def _read(self, response):
+        """Read events until the stream ends; returns True if the copy has to be resynced."""
+        kind, data = None, []
+        for raw in response:
+            if self._stopped.is_set():
+                return False
+            line = raw.decode("utf-8").rstrip("\r\n")
+            if line.startswith(":"):
+                continue  # keep-alive
+            if line.startswith("event:"):
+                kind = line[6:].strip()
+            elif line.startswith("data:"):
+                data.append(line[5:].lstrip())
+            elif not line and data:
+                if not self.apply(kind, json.loads("\n".join(data))):
+                    return True
+                if kind in ("snapshot", "resume") and not self.connected:
+                    self.connected = True
+                    self.connected_at = time.time()
+                    self.error = None
+                    self._ready.set()
+                kind, data = None, []
+                self._changed()
+        raise OSError("the feed server closed the stream")
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change()
@@ -0,0 +1,199 @@
+"""
+Live call statistics, updated incrementally.
+
+Every event (a new call, a finished call, the number of live calls after a
+poll) changes a few counters and never rescans anything, so an event costs
+O(1) however many calls there were. Sliding windows (the last minute, 15
+minutes, hour) are rings of one-second buckets whose running totals are
+corrected as old buckets fall out. Per-number counters are kept for the
+max_numbers most recently seen numbers.
+"""
+
+import heapq
+import threading
+import time
+from collections import OrderedDict, deque
+
+from call_store import ANSWERED
+from channel_parser import format_duration
+
+WINDOWS = (60, 900, 3600)  # seconds
+
+# Fields of a window bucket
+CALLS, ANSWERED_CALLS, MISSED_CALLS, RING_TOTAL, RING_COUNT = range(5)
+
+
+class SlidingWindow:
+    """Sums of the events of the last `seconds`, in buckets of `resolution` seconds."""
+
+    def __init__(self, seconds, resolution=1.0):
+        self.seconds = seconds
+        self.resolution = resolution
+        self.buckets = deque()  # [bucket number, values], oldest first
+        self.totals = [0.0] * 5
+
+    def add(self, now, field, amount=1.0):
+        slot = int(now // self.resolution)
+        if self.buckets and slot < self.buckets[-1][0]:
+            slot = self.buckets[-1][0]  # a late event goes into the newest bucket
+        if not self.buckets or self.buckets[-1][0] != slot:
+            self.buckets.append([slot, [0.0] * 5])
+        self.buckets[-1][1][field] += amount
+        self.totals[field] += amount
+        self.expire(now)
+
+    def expire(self, now):
+        oldest = int((now - self.seconds) // self.resolution)
+        while self.buckets and self.buckets[0][0] <= oldest:
+            _, values = self.buckets.popleft()
+            for field, value in enumerate(values):
+                self.totals[field] -= value
+
+    def summary(self, now):
+        self.expire(now)
+        calls, answered, missed, ring_total, ring_count = self.totals
+        finished = answered + missed
+        return {"calls": int(round(calls)),
+                "calls_per_minute": calls * 60.0 / self.seconds,
+                "answered": int(round(answered)), "missed": int(round(missed)),
+                "answer_rate": answered / finished if finished else None,
+                "avg_ring_time": ring_total / ring_count if ring_count else None}
+
+
+class NumberStats:
+    __slots__ = ("calls", "answered", "missed", "ring_total", "talk_total", "last_seen")
+
+    def __init__(self):
+        self.calls = 0
+        self.answered = 0
+        self.missed = 0
+        self.ring_total = 0.0
+        self.talk_total = 0.0
+        self.last_seen = None
+
+
+class LiveStats:
+    def __init__(self, windows=WINDOWS, max_numbers=10000, clock=time.monotonic):
+        self.clock = clock
+        self.windows = {seconds: SlidingWindow(seconds) for seconds in windows}
+        self.max_numbers = max_numbers
+        self.numbers = OrderedDict()  # number -> NumberStats, least recently seen first
+        self.calls = 0
+        self.answered = 0
+        self.missed = 0
+        self.ring_total = 0.0
+        self.ring_count = 0
+        self.active_by_server = {}
+        self.active = 0
+        self.peak = 0
+        self.peak_at = None  # time.time() of the peak
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def call_started(self, count=1, now=None):
+        """count new calls appeared."""
+        if not count:
+            return
+        now = self.clock() if now is None else now
+        with self.lock:
+            self.calls += count
+            for window in self.windows.values():
+                window.add(now, CALLS, count)
+
+    def set_active(self, server, count):
+        """The number of live calls on a server after a poll; tracks the peak over all servers."""
+        with self.lock:
+            self.active += count - self.active_by_server.get(server, 0)
+            self.active_by_server[server] = count
+            if self.active > self.peak:
+                self.peak = self.active
+                self.peak_at = time.time()
+
+    def call_ended(self, record, now=None):
+        now = self.clock() if now is None else now
+        answered = record.outcome == ANSWERED
+        ring_time = record.ring_time() if record.ring_at is not None else None
+        with self.lock:
+            if answered:
+                self.answered += 1
+            else:
+                self.missed += 1
+            if ring_time is not None:
+                self.ring_total += ring_time
+                self.ring_count += 1
+            for window in self.windows.values():
+                window.add(now, ANSWERED_CALLS if answered else MISSED_CALLS)
+                if ring_time is not None:
+                    window.add(now, RING_TOTAL, ring_time)
+                    window.add(now, RING_COUNT)
+
+            stats = self.numbers.get(record.number)
+            if stats is None:
+                stats = self.numbers[record.number] = NumberStats()
+                if len(self.numbers) > self.max_numbers:
+                    self.numbers.popitem(last=False)
+            else:
+                self.numbers.move_to_end(record.number)
+            stats.calls += 1
+            if answered:
+                stats.answered += 1
+                stats.talk_total += record.talk_time()
+            else:
+                stats.missed += 1
+            if ring_time is not None:
+                stats.ring_total += ring_time
+            stats.last_seen = time.time()
+
+    def number(self, number):
+        with self.lock:
+            return self.numbers.get(number)
+
+    def top_numbers(self, count=10):
+        """The numbers with the most calls; only done when the dashboard is drawn."""
+        with self.lock:
+            return heapq.nlargest(count, self.numbers.items(), key=lambda item: item[1].calls)
+
+    def snapshot(self, now=None):
+        now = self.clock() if now is None else now
+        with self.lock:
+            finished = self.answered + self.missed
+            return {"time": time.time(), "uptime": time.time() - self.started,
+                    "calls": self.calls, "answered": self.answered, "missed": self.missed,
+                    "answer_rate": self.answered / finished if finished else None,
+                    "avg_ring_time": self.ring_total / self.ring_count if self.ring_count else None,
+                    "active": self.active, "peak": self.peak, "peak_at": self.peak_at,
+                    "numbers": len(self.numbers),
+                    "windows": {seconds: window.summary(now) for seconds, window in self.windows.items()}}
+
+    def report(self, top=10):
+        """Plain-text dashboard: totals, the sliding windows and the busiest numbers."""
+        snapshot = self.snapshot()
+        peak_at = time.strftime("%H:%M:%S", time.localtime(snapshot["peak_at"])) if snapshot["peak_at"] else "-"
+        lines = [f"active {snapshot['active']}   peak {snapshot['peak']} at {peak_at}   "
+                 f"calls {snapshot['calls']}   answered {snapshot['answered']}   missed {snapshot['missed']}   "
+                 f"answer rate {_percent(snapshot['answer_rate'])}   avg ring {_seconds(snapshot['avg_ring_time'])}",
+                 "",
+                 f"{'window':<8} {'calls':>7} {'per min':>8} {'answered':>9} {'missed':>7} {'rate':>6} {'ring':>6}"]
+        for seconds, window in snapshot["windows"].items():
+            lines.append(f"{_window_name(seconds):<8} {window['calls']:>7} {window['calls_per_minute']:>8.1f} "
+                         f"{window['answered']:>9} {window['missed']:>7} {_percent(window['answer_rate']):>6} "
+                         f"{_seconds(window['avg_ring_time']):>6}")
+        lines += ["", f"{'number':<16} {'calls':>6} {'answered':>9} {'missed':>7} {'avg ring':>9} {'talk':>9}"]
+        for number, stats in self.top_numbers(top):
+            rings = stats.answered + stats.missed
+            lines.append(f"{number:<16} {stats.calls:>6} {stats.answered:>9} {stats.missed:>7} "
+                         f"{_seconds(stats.ring_total / rings if rings else None):>9} "
+                         f"{format_duration(stats.talk_total):>9}")
+        return lines
+
+
+def _percent(value):
+    return "-" if value is None else f"{value * 100:.0f}%"
+
+
+def _seconds(value):
+    return "-" if value is None else f"{value:.1f}s"
+
+
+def _window_name(seconds):
+    return f"{seconds // 3600}h" if seconds % 3600 == 0 else f"{seconds // 60}m"
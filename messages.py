@@ -0,0 +1,172 @@
+"""
+Strings of the window in every language.
+
+messages(locale) is called once when the window starts and returns an
+object with one attribute per string, so the hot path only does an attribute
+lookup and a str.format(). All catalogs are checked against the English one
+on import: a missing string or a placeholder that differs fails right away
+instead of in the middle of a poll.
+"""
+
+import locale as _locale
+import os
+from string import Formatter
+
+DEFAULT_LOCALE = "en"
+
+CATALOGS = {
+    "en": {
+        "title": "Call Monitoring",
+        "heading": "Active Call Monitoring",
+        "status_idle": "Connection to Asterisk: ➖",
+        "status_connected": "Connection to Asterisk: ✅ at {time} {date}",
+        "status_failed": "Connection to Asterisk: ❌",
+        "connection_error": "[Connection Error] {error}",
+        "no_connection": "[!] No active connection to the server.",
+        "ami_lost": "[AMI Connection Lost] {error}",
+        "ami_filter_rejected": "[!] The PBX refused the AMI event filter ({error}), all channels' events are read.",
+        "command_failed": "[Command Execution Error] {error}",
+        "updated": "Update: {time}  (poll → screen {latency:.0f} ms)",
+        "no_calls": "No active calls.",
+        "cdr_in_ami": "[!] Missed and answered calls are read from CDR over SSH, which is not used in AMI mode.",
+        "cdr_error": "[CDR Error] {error}",
+        "answered_header": "📗 Answered calls (today: {today})",
+        "missed_header": "📕 Missed calls (today: {today})",
+        "no_cdr_calls": "No calls in CDR yet.",
+        "error": "Error",
+        "save_failed": "Could not save settings:\n{error}",
+        "loading_history": "Loading the history of {number}...",
+        "history_header": "📞 History of {number} ({count})",
+        "no_number_calls": "No calls from this number yet.",
+        "diagnostics_header": "Diagnostics: {time}  (JSON: {path})",
+        "statistics_header": "Statistics: {time}",
+        "queues_header": "Queues: {count}, waiting callers: {waiting}",
+        "loading_answered": "Loading answered calls from CDR...",
+        "loading_missed": "Loading missed calls from CDR...",
+        "current_status": "Current Status",
+        "missed_calls": "Missed Calls",
+        "answered_calls": "Answered Calls",
+        "diagnostics": "Diagnostics",
+        "statistics": "Statistics",
+        "columns": ("Server", "Channel", "Number", "Duration", "Status"),
+        "queues": "Queues",
+        "queue_columns": ("Queue / agent", "Agents / state", "Waiting", "Longest wait", "Service level",
+                          "Answered", "Abandoned"),
+        "queue_agents": "{free} free, {busy} busy, {paused} paused, {offline} off",
+        "queue_waiting": "{waiting} ({over} over {sla}s)",
+        "agent_states": {"free": "free", "busy": "busy", "paused": "paused", "offline": "unavailable"},
+        "incoming_call": "Incoming call",
+        "username": "Username:",
+        "password": "Password:",
+        "fields_required": "All fields must be filled in.",
+        "save_title": "Save?",
+        "save_question": "Would you like to save the entered data for the next session? "
+                         "The password will be stored encrypted.",
+        "profile": "Profile:",
+        "config_invalid": "The settings could not be read and were moved to {path}:\n{error}",
+        "config_reload_failed": "The changed settings were not applied:\n{error}",
+        "connect": "🔌 Connect",
+        "exit": "🚪Exit",
+    },
+    "ru": {
+        "title": "Мониторинг звонков",
+        "heading": "Мониторинг активных звонков",
+        "status_idle": "Подключение к Asterisk: ➖",
+        "status_connected": "Подключение к Asterisk: ✅ в {time} {date}г.",
+        "status_failed": "Подключение к Asterisk: ❌",
+        "connection_error": "[Ошибка подключения] {error}",
+        "no_connection": "[!] Нет активного подключения к серверу.",
+        "ami_lost": "[Соединение AMI потеряно] {error}",
+        "ami_filter_rejected": "[!] АТС отклонила фильтр событий AMI ({error}), читаются события всех каналов.",
+        "command_failed": "[Ошибка выполнения команды] {error}",
+        "updated": "Обновление: {time}  (опрос → экран {latency:.0f} мс)",
+        "no_calls": "Нет активных звонков.",
+        "cdr_in_ami": "[!] Пропущенные и отвеченные звонки читаются из CDR по SSH, а в режиме AMI SSH не используется.",
+        "cdr_error": "[Ошибка CDR] {error}",
+        "answered_header": "📗 Отвеченные звонки (сегодня: {today})",
+        "missed_header": "📕 Пропущенные звонки (сегодня: {today})",
+        "no_cdr_calls": "В CDR пока нет звонков.",
+        "error": "Ошибка",
+        "save_failed": "Не удалось сохранить настройки:\n{error}",
+        "loading_history": "Загрузка истории номера {number}...",
+        "history_header": "📞 История номера {number} ({count})",
+        "no_number_calls": "Звонков с этого номера ещё не было.",
+        "diagnostics_header": "Диагностика: {time}  (JSON: {path})",
+        "statistics_header": "Статистика: {time}",
+        "queues_header": "Очередей: {count}, ждут ответа: {waiting}",
+        "loading_answered": "Загрузка отвеченных звонков из CDR...",
+        "loading_missed": "Загрузка пропущенных звонков из CDR...",
+        "current_status": "Текущее состояние",
+        "missed_calls": "Пропущенные звонки",
+        "answered_calls": "Отвеченные звонки",
+        "diagnostics": "Диагностика",
+        "statistics": "Статистика",
+        "columns": ("Сервер", "Канал", "Номер", "Длительность", "Статус"),
+        "queues": "Очереди",
+        "queue_columns": ("Очередь / оператор", "Операторы / состояние", "Ждут", "Дольше всех", "Уровень сервиса",
+                          "Отвечено", "Брошено"),
+        "queue_agents": "свободно {free}, заняты {busy}, на паузе {paused}, нет {offline}",
+        "queue_waiting": "{waiting} ({over} дольше {sla} с)",
+        "agent_states": {"free": "свободен", "busy": "занят", "paused": "пауза", "offline": "недоступен"},
+        "incoming_call": "Входящий звонок",
+        "username": "Имя пользователя:",
+        "password": "Пароль:",
+        "fields_required": "Все поля должны быть заполнены.",
+        "save_title": "Сохранить?",
+        "save_question": "Сохранить введённые данные для следующего запуска? Пароль будет сохранён в зашифрованном виде",
+        "profile": "Профиль:",
+        "config_invalid": "Не удалось прочитать настройки, файл перенесён в {path}:\n{error}",
+        "config_reload_failed": "Изменённые настройки не применены:\n{error}",
+        "connect": "🔌 Подключиться",
+        "exit": "🚪 Выход",
+    },
+}
+
+
+class Messages:
+    """The strings of one language as attributes."""
+
+    def __init__(self, locale, strings):
+        self.locale = locale
+        self.__dict__.update(strings)
+
+
+def _fields(text):
+    if not isinstance(text, str):
+        return None
+    return sorted(field for _, field, _, _ in Formatter().parse(text) if field is not None)
+
+
+def _check(catalogs, reference=DEFAULT_LOCALE):
+    expected = catalogs[reference]
+    for name, strings in catalogs.items():
+        if strings.keys() != expected.keys():
+            raise ValueError(f"Catalog {name!r} differs from {reference!r} in: "
+                             f"{sorted(strings.keys() ^ expected.keys())}")
+        for key, text in strings.items():
+            if _fields(text) != _fields(expected[key]):
+                raise ValueError(f"Catalog {name!r}: placeholders of {key!r} differ from {reference!r}")
+
+
+_check(CATALOGS)
+
+
+def detect_locale(default=DEFAULT_LOCALE):
+    """The language of the system ('ru' for ru_RU.UTF-8 or Russian_Russia), if there is a catalog for it."""
+    for variable in ("LC_ALL", "LC_MESSAGES", "LANG"):
+        value = os.getenv(variable)
+        if value:
+            break
+    else:
+        value = _locale.getlocale()[0] or ""
+    code = value[:2].lower()
+    if code not in CATALOGS and value.lower().startswith("russian"):
+        code = "ru"
+    return code if code in CATALOGS else default
+
+
+def messages(locale=None):
+    locale = locale or detect_locale()
+    if locale not in CATALOGS:
+        locale = DEFAULT_LOCALE
+    return Messages(locale, CATALOGS[locale])
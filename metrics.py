@@ -0,0 +1,116 @@
+"""
+Timers and counters for the poll pipeline.
+
+Every stage of a refresh (SSH command, reading its output, parsing, the Tk
+queue, repainting the table) is timed with time.perf_counter() into a rolling
+window of the last samples, from which p50/p95/p99 are taken. Counters track
+polls, parsed channels, errors and so on. snapshot() returns everything as a
+dict for the diagnostics panel and for the JSON dump.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+WINDOW = 1000  # samples kept per stage
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+class Histogram:
+    __slots__ = ("samples", "count", "total", "max", "last")
+
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = None
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+        self.last = value
+        if value > self.max:
+            self.max = value
+
+    def summary(self, scale=1000.0):
+        """Times in milliseconds (scale) over the window, count and mean over all samples."""
+        samples = sorted(self.samples)
+        return {"count": self.count,
+                "last": self.last * scale if self.last is not None else None,
+                "mean": self.total / self.count * scale if self.count else None,
+                "p50": _scaled(percentile(samples, 0.50), scale),
+                "p95": _scaled(percentile(samples, 0.95), scale),
+                "p99": _scaled(percentile(samples, 0.99), scale),
+                "max": self.max * scale}
+
+
+def _scaled(value, scale):
+    return None if value is None else value * scale
+
+
+class Metrics:
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.started = time.time()
+        self.histograms = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram(self.window)
+            histogram.add(seconds)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def snapshot(self):
+        now = time.time()
+        uptime = max(now - self.started, 1e-9)
+        with self.lock:
+            stages = {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+            counters = dict(sorted(self.counters.items()))
+        return {"time": now, "uptime": uptime, "stages_ms": stages, "counters": counters,
+                "rates_per_s": {name: value / uptime for name, value in counters.items()}}
+
+    def dump(self, path):
+        """Write snapshot() to a JSON file (replaced atomically, so readers never see half a file)."""
+        temp = f"{path}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(temp, path)
+
+    def report(self):
+        """Plain-text table of the snapshot, one line per stage and counter."""
+        snapshot = self.snapshot()
+        lines = [f"{'stage':<16} {'count':>7} {'last':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  ms"]
+        for name, stage in snapshot["stages_ms"].items():
+            values = " ".join(f"{stage[key]:>8.1f}" if stage[key] is not None else f"{'-':>8}"
+                              for key in ("last", "p50", "p95", "p99", "max"))
+            lines.append(f"{name:<16} {stage['count']:>7} {values}")
+        lines.append("")
+        for name, value in snapshot["counters"].items():
+            lines.append(f"{name:<24} {value:>10}  ({snapshot['rates_per_s'][name]:.2f}/s)")
+        return lines
@@ -0,0 +1,365 @@
+"""
+Call monitoring core without any GUI.
+
+CallMonitor connects to one Asterisk server (over SSH, or AMI when ami_port
+is set), polls the active channels and reads CDR. It does not know about
+widgets: results are passed to the on_* hooks, which the Tk window and the
+headless mode override. Nothing here imports tkinter.
+"""
+
+import threading
+import time
+
+from ami_client import AmiClient
+from call_store import CallStore
+from cdr import DEFAULT_CDR_PATH, CdrIndex, CdrTail
+from channel_parser import CONCISE_COMMAND, DIALED_APP, format_duration, parse_concise
+from metrics import Metrics
+from poll_scheduler import ACTIVE, ERROR, IDLE, RINGING, PollScheduler
+from queue_monitor import QUEUE_COMMAND, parse_queue_show
+from ssh_connection import SshConnection
+
+# Kinds of poll errors passed to on_poll_error()
+NO_CONNECTION = "no_connection"
+COMMAND_FAILED = "command_failed"
+AMI_LOST = "ami_lost"
+FILTER_REJECTED = "ami_filter"
+
+
+class CdrUnavailable(Exception):
+    """CDR is read over SSH, which is not used in AMI mode."""
+
+
+class CallMonitor:
+    def __init__(self, host, port, username, password,
+                 ami_port=None, ami_username=None, ami_secret=None,
+                 max_call_age=3600, max_finished_calls=1000,
+                 cdr_path=DEFAULT_CDR_PATH, cdr_index_file=None, keepalive=15, name="", history=None,
+                 metrics=None, notifier=None, stats=None, channel_filter=None, contacts=None, feed=None,
+                 key_file=None, use_agent=False, queues=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.key_file = key_file  # SSH private key instead of the password
+        self.use_agent = use_agent  # or the keys of a running ssh-agent / Pageant
+        self.name = name  # server name when several are monitored (empty for a single server)
+        self.client = None  # shared SSH connection with keepalive and reconnect
+        self.keepalive = keepalive
+        self.connected_at = None
+        # Calls keyed by channel, finished ones are evicted by age or count
+        self.calls = CallStore(max_age=max_call_age, max_finished=max_finished_calls)
+        # AMI backend (used instead of SSH polling when ami_port is set)
+        self.ami_port = ami_port
+        self.ami_username = ami_username or username
+        self.ami_secret = ami_secret or password
+        self.ami = None
+        self.scheduler = None
+        self.cdr_path = cdr_path
+        self.cdr_index_file = cdr_index_file
+        self.cdr = None
+        self.cdr_lock = threading.Lock()  # the answered and missed views may sync at the same time
+        self.history = history  # CallHistory shared by all servers, or None
+        self.metrics = metrics or Metrics()  # may be shared by all servers too
+        self.notifier = notifier  # notifications.Notifier for the ringing calls, or None
+        self.stats = stats  # live_stats.LiveStats shared by all servers, or None
+        self.reported = False  # whether a poll has been reported yet
+        self.set_channel_filter(channel_filter)
+        self.contacts = contacts  # contacts.ContactResolver for the names in the table, or None
+        self.feed = feed  # live_feed.LiveFeed serving the polls to other windows, or None
+        self.feed_connected = None
+        self.queues = queues  # queue_monitor.QueueBoard shared by all servers, or None
+        self.queues_read_at = None
+
+    def is_connected(self):
+        if self.ami:
+            return self.ami.connected
+        return self.client is not None
+
+    def connect(self):
+        try:
+            if self.ami_port:
+                self.ami = AmiClient(self.host, self.ami_port, self.ami_username, self.ami_secret,
+                                     event_filter=self.channel_filter and self.channel_filter.ami_filter())
+                self.ami.on_queue_event = self.queue_event if self.queues else None
+                self.ami.connect()
+                self.connected_at = time.time()
+            else:
+                self.client = SshConnection(self.host, self.port, self.username, self.password,
+                                            keepalive=self.keepalive, metrics=self.metrics,
+                                            key_file=self.key_file, use_agent=self.use_agent)
+                self.client.connect()
+                self.connected_at = self.client.connected_at
+        except Exception as e:
+            self.ami = None
+            self.client = None
+            self.metrics.count("errors.connect")
+            self.feed_status(False, e)
+            self.on_connect_failed(e)
+            return False
+        self.feed_status(True)
+        self.on_connected()
+        if self.ami:
+            self.check_ami_filter()
+        return True
+
+    def check_ami_filter(self):
+        # Without the Filter action every channel's events are sent, the filter is then only applied here
+        if self.ami.filter_error:
+            self.metrics.count(f"errors.{FILTER_REJECTED}")
+            self.on_poll_error(FILTER_REJECTED, self.ami.filter_error)
+
+    def set_channel_filter(self, channel_filter):
+        """channel_filter.ChannelFilter: narrows the command and drops other channels; may change while polling.
+
+        The AMI event filter is only sent on connect, so a new one drops the connection and the next poll
+        connects again with it.
+        """
+        self.channel_filter = channel_filter
+        self.command = channel_filter.command() if channel_filter else CONCISE_COMMAND
+        if self.cdr:
+            self.cdr.keep = channel_filter and channel_filter.matches_cdr
+        event_filter = channel_filter and channel_filter.ami_filter()
+        if self.ami and self.ami.event_filter != event_filter:
+            # AMI has no action that removes a filter
+            self.ami.event_filter = event_filter
+            self.drop_ami()
+
+    def drop_ami(self):
+        self.ami.close()
+        if self.scheduler:
+            self.scheduler.poll_now()
+
+    def start_polling(self, **options):
+        # The poll interval follows the PBX activity, see PollScheduler
+        self.scheduler = PollScheduler(self.poll, **options).start()
+        if self.ami:
+            self.ami.on_event = self.scheduler.poll_now  # AMI events trigger a poll right away
+        return self.scheduler
+
+    def stop(self):
+        if self.scheduler:
+            self.scheduler.stop()
+        if self.ami:
+            self.ami.close()
+        if self.client:
+            self.client.close()
+
+    def poll(self):
+        """Read the active channels once; returns the activity for PollScheduler."""
+        polled_at = time.perf_counter()
+        self.metrics.count("polls")
+        try:
+            if self.ami:
+                return self.poll_ami(polled_at)
+            return self.poll_ssh(polled_at)
+        finally:
+            self.metrics.observe("poll", time.perf_counter() - polled_at)
+
+    def poll_ssh(self, polled_at):
+        if not self.client:
+            self.poll_error(NO_CONNECTION, None)
+            return ERROR
+
+        try:
+            output = self.client.run(self.command)
+            if self.client.connected_at != self.connected_at:
+                self.connected_at = self.client.connected_at
+                self.on_connected()  # the connection was re-established
+
+            rows = self.rows_from_concise(output)
+            if self.queues_due():
+                self.read_queues(self.client.run(QUEUE_COMMAND))
+        except Exception as e:
+            if not self.client.is_alive():
+                self.on_disconnected(e)
+            self.poll_error(COMMAND_FAILED, e)
+            return ERROR
+
+        self.report(rows, polled_at)
+        return self.activity(rows)
+
+    def poll_ami(self, polled_at):
+        # With AMI the channel list is already in memory, no command is sent to the PBX
+        if not self.ami.connected and not self.reconnect_ami():
+            return ERROR
+
+        rows = self.rows_from_ami(self.ami.snapshot())
+        self.report(rows, polled_at)
+        return self.activity(rows)
+
+    def queues_due(self):
+        """Whether `queue show` should be run with this poll (over SSH, every queues.interval seconds)."""
+        if not self.queues:
+            return False
+        now = time.monotonic()
+        if self.queues_read_at is not None and now - self.queues_read_at < self.queues.interval:
+            return False
+        self.queues_read_at = now
+        return True
+
+    def read_queues(self, output):
+        self.queues.update_from_show(self.name or self.host, parse_queue_show(output))
+
+    def queue_event(self, event):
+        # Called from the AMI reader with the Queue*/Agent* events
+        self.queues.handle_event(self.name or self.host, event)
+
+    def reconnect_ami(self):
+        """Open the lost AMI connection again (AmiClient backs off between failed attempts)."""
+        try:
+            self.ami.reconnect()
+        except Exception as e:
+            return self.ami_lost(e)
+        return self.ami_reconnected()
+
+    def ami_lost(self, error):
+        self.on_disconnected(error)
+        self.poll_error(AMI_LOST, error)
+        return False
+
+    def ami_reconnected(self):
+        self.connected_at = time.time()
+        self.metrics.count("ami.reconnects")
+        self.on_connected()
+        self.check_ami_filter()
+        return True
+
+    def rows_from_concise(self, output):
+        """Update the calls from `core show channels concise`; returns {key: row}."""
+        # Single pass over the lines: number and state come from their own fields
+        parse_started = time.perf_counter()
+        now = time.monotonic()
+        rows = {}
+        channel_filter = self.channel_filter
+        channels = parse_concise(output)
+        # A dialed channel (AppDial) is linked to the channel that dialed it once they share a bridge
+        callers = {chan.bridge: chan.key for chan in channels if chan.bridge and chan.application != DIALED_APP}
+        for chan in channels:
+            # The context is only checked for a new channel, a call may move on to another one
+            context = None if chan.key in self.calls else chan.context
+            if channel_filter and not channel_filter.matches(chan.channel, context, chan.number):
+                continue
+            dialed = chan.application == DIALED_APP
+            call = self.calls.update(chan.key, number=chan.number, status=chan.state,
+                                     elapsed=chan.duration, channel=chan.channel, now=now,
+                                     dialed=dialed, leg_of=callers.get(chan.bridge) if dialed and chan.bridge else None)
+            rows[chan.key] = (chan.channel, self.caller(call.number), format_duration(call.total_time(now)), chan.state)
+        self.calls.finish_missing(rows, now)
+        self.metrics.observe("parse", time.perf_counter() - parse_started)
+        self.metrics.count("channels", len(rows))
+        return rows
+
+    def rows_from_ami(self, snapshot):
+        """Update the calls from AmiClient.snapshot(); returns {key: row}."""
+        parse_started = time.perf_counter()
+        now = time.monotonic()
+        rows = {}
+        channel_filter = self.channel_filter
+        for call in snapshot:
+            # AmiClient keeps the context of the Newchannel (or CoreShowChannel) event
+            if channel_filter and not channel_filter.matches(call["channel"], call["context"], call["number"]):
+                continue
+            # The Linkedid of every channel of a call is the uniqueid of the one that started it
+            dialed = call["linkedid"] != call["uniqueid"]
+            record = self.calls.update(call["uniqueid"], number=call["number"], status=call["status"],
+                                       elapsed=call["elapsed"], channel=call["channel"], now=now,
+                                       dialed=dialed, leg_of=call["linkedid"] if dialed else None)
+            rows[call["uniqueid"]] = (call["channel"], self.caller(call["number"]),
+                                      format_duration(record.total_time(now)), call["status"])
+        self.calls.finish_missing(rows, now)
+        self.metrics.observe("parse", time.perf_counter() - parse_started)
+        self.metrics.count("channels", len(rows))
+        return rows
+
+    def caller(self, number):
+        """The number as shown in a row: with the contact name once it is known."""
+        if self.contacts and number != "unknown":
+            return self.contacts.label(number)
+        return number
+
+    def poll_error(self, kind, error):
+        self.metrics.count(f"errors.{kind}")
+        self.feed_status(False, error)
+        self.on_poll_error(kind, error)
+
+    def feed_status(self, connected, error=None):
+        """Tell the feed clients whether this server is reachable, when that changes."""
+        if self.feed and connected != self.feed_connected:
+            self.feed_connected = connected
+            self.feed.set_status(self.name or self.host, connected, str(error) if error else None)
+
+    def report(self, rows, polled_at):
+        for record in self.calls.pop_ringing():
+            self.metrics.count("calls.ringing")
+            if self.notifier:
+                self.notifier.notify(self.name or self.host, record,
+                                     self.contacts.name(record.number) if self.contacts else None)
+            self.on_call_ringing(record)
+        for record in self.calls.pop_ended():
+            self.metrics.count("calls.ended")
+            if self.stats:
+                self.stats.call_ended(record)
+            if self.history:
+                self.history.add(self.name or self.host, record)
+            self.on_call_ended(record)
+        created = self.calls.pop_created()
+        if self.stats:
+            if self.reported:  # the calls found by the first poll were already going on
+                self.stats.call_started(created)
+            self.stats.set_active(self.name or self.host, self.calls.active_count())
+        self.reported = True
+        if self.feed:
+            self.feed_status(True)
+            self.feed.publish(self.name or self.host, rows, self.calls)
+        self.on_calls(rows, polled_at)
+
+    def activity(self, rows):
+        if any(row[3] in ("Ring", "Ringing") for row in rows.values()):
+            return RINGING
+        # Calls missing from this poll are finished by the next one, which should not wait for long
+        return ACTIVE if rows or self.calls.missing else IDLE
+
+    def read_cdr(self, answered, limit=200):
+        """Sync CDR and return (newest calls, number of such calls today)."""
+        # Only the part of Master.csv added since the last time is read
+        if not self.client:
+            raise CdrUnavailable()
+        with self.cdr_lock:
+            if self.cdr is None:
+                self.cdr = CdrTail(self.client, CdrIndex(self.cdr_index_file or ":memory:"), self.cdr_path,
+                                   keep=self.channel_filter and self.channel_filter.matches_cdr)
+            self.cdr.sync()
+        rows = self.cdr.index.calls(answered, limit=limit)
+        today = self.cdr.index.count(answered, time.strftime("%Y-%m-%d"))
+        return rows, today
+
+    def read_history(self, answered, limit=200):
+        """Like read_cdr(), but from the calls this monitor has seen itself."""
+        server = self.name or self.host
+        rows = self.history.calls(answered, server=server, limit=limit)
+        today = self.history.count(answered, time.strftime("%Y-%m-%d"), server=server)
+        return rows, today
+
+    # Hooks, called from the polling thread
+
+    def on_connected(self):
+        pass
+
+    def on_connect_failed(self, error):
+        pass
+
+    def on_disconnected(self, error):
+        pass
+
+    def on_calls(self, rows, polled_at):
+        """rows is {key: (channel, number, duration, status)}; polled_at is time.perf_counter()."""
+
+    def on_call_ringing(self, record):
+        """record is the CallRecord of a call that has just started ringing."""
+
+    def on_call_ended(self, record):
+        """record is the finished CallRecord, with its outcome, ring and talk time."""
+
+    def on_poll_error(self, kind, error):
+        pass
@@ -0,0 +1,296 @@
+"""
+Notifications about incoming calls.
+
+CallMonitor passes every call that starts ringing to Notifier.notify(), which
+only puts it into a queue and returns, so polling never waits for SMTP or
+HTTP. Each sink (desktop popup, e-mail, webhook, SMS through a GoIP gateway)
+has its own thread: the calls that arrive within batch_window seconds go out
+as one batch, and a sink sends at most one batch per min_interval seconds.
+A burst of 50 ringing calls is therefore one popup and one e-mail.
+
+A sink is any object with send(events), where events is a list of dicts
+(time, server, number, name, channel, key); see incoming_call(). smtplib,
+email and urllib are imported by the sinks when they first send, so they do
+not slow down the start of the window.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+
+MAX_QUEUE = 1000  # calls waiting per sink; more are dropped and counted
+MAX_LINES = 20    # calls listed in one message, the rest are counted
+
+
+def incoming_call(server, record, now=None, wall_now=None, name=None):
+    """Describe a ringing CallRecord as a plain dict for the sinks."""
+    now = time.monotonic() if now is None else now
+    wall_now = time.time() if wall_now is None else wall_now
+    at = record.ring_at if record.ring_at is not None else now
+    return {"time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(wall_now - (now - at))),
+            "server": server, "number": record.number, "name": name, "channel": record.channel, "key": record.key}
+
+
+def summary(events, limit=MAX_LINES):
+    """One line per call, at most limit lines plus a '... N more' line."""
+    lines = [f"{event['time'][11:]}  {event['number']}" + (f"  {event['name']}" if event.get("name") else "")
+             + (f"  ({event['server']})" if event["server"] else "")
+             for event in events[:limit]]
+    if len(events) > limit:
+        lines.append(f"... +{len(events) - limit}")
+    return lines
+
+
+class DesktopSink:
+    """Calls show(title, lines); the window posts it to the Tk thread as a popup."""
+
+    def __init__(self, show, title="Incoming call"):
+        self.show = show
+        self.title = title
+
+    def send(self, events):
+        title = self.title if len(events) == 1 else f"{self.title} ({len(events)})"
+        self.show(title, summary(events))
+
+
+class EmailSink:
+    def __init__(self, server, port, sender, password, recipients, tls="starttls", timeout=10,
+                 subject="Incoming call"):
+        self.server = server
+        self.port = port
+        self.sender = sender
+        self.password = password
+        self.recipients = recipients
+        self.tls = tls  # "starttls", "ssl" or None
+        self.timeout = timeout
+        self.subject = subject
+
+    def message(self, events):
+        from email.message import EmailMessage
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = ", ".join(self.recipients)
+        message["Subject"] = self.subject if len(events) == 1 else f"{self.subject} ({len(events)})"
+        message.set_content("\n".join(summary(events, limit=len(events))) + "\n")
+        return message
+
+    def send(self, events):
+        import smtplib
+        smtp_class = smtplib.SMTP_SSL if self.tls == "ssl" else smtplib.SMTP
+        with smtp_class(self.server, self.port, timeout=self.timeout) as smtp:
+            if self.tls == "starttls":
+                smtp.starttls()
+            if self.password:
+                smtp.login(self.sender, self.password)
+            smtp.send_message(self.message(events))
+
+
+class WebhookSink:
+    """POSTs {"calls": [...]} as JSON."""
+
+    def __init__(self, url, timeout=5, headers=None):
+        self.url = url
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+
+    def send(self, events):
+        import urllib.request
+        data = json.dumps({"calls": events}, ensure_ascii=False).encode("utf-8")
+        request = urllib.request.Request(self.url, data=data, headers=self.headers, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class GoipSmsSink:
+    """Sends an SMS through the HTTP interface of a GoIP GSM gateway."""
+
+    def __init__(self, host, username, password, recipients, line=1, timeout=10):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.recipients = recipients
+        self.line = line
+        self.timeout = timeout
+
+    def send(self, events):
+        import urllib.parse
+        import urllib.request
+        text = "\n".join(summary(events, limit=5))[:160]
+        for recipient in self.recipients:
+            query = urllib.parse.urlencode({"u": self.username, "p": self.password, "l": self.line,
+                                            "n": recipient, "m": text})
+            with urllib.request.urlopen(f"http://{self.host}/default/en_US/send.html?{query}",
+                                        timeout=self.timeout) as response:
+                response.read()
+
+
+class _SinkWorker:
+    def __init__(self, name, sink, batch_window, max_batch, min_interval, metrics):
+        self.name = name
+        self.sink = sink
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.min_interval = min_interval
+        self.metrics = metrics
+        self.queue = queue.Queue(maxsize=MAX_QUEUE)
+        self.sent_at = float("-inf")
+        self.sent = 0
+        self.dropped = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name=f"notify-{name}", daemon=True)
+        self._thread.start()
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self._drop()
+
+    def _drop(self):
+        self.dropped += 1
+        if self.metrics:
+            self.metrics.count("notify.dropped")
+
+    def _run(self):
+        batch, waiters = [], []
+        first_at = 0.0
+        stopping = False
+        while True:
+            timeout = None
+            if batch:
+                now = time.monotonic()
+                # Wait for more calls of the same burst, then for the rate limit
+                due = max(first_at + self.batch_window, self.sent_at + self.min_interval)
+                if len(batch) >= self.max_batch:
+                    due = self.sent_at + self.min_interval
+                if stopping or waiters or due <= now:
+                    self._send(batch)
+                    batch = []
+                    continue
+                timeout = due - now
+            else:
+                for done in waiters:
+                    done.set()
+                waiters = []
+                if stopping:
+                    return
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if item is None:
+                stopping = True
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+            elif len(batch) >= self.max_batch:
+                self._drop()
+            else:
+                if not batch:
+                    first_at = time.monotonic()
+                batch.append(item)
+
+    def _send(self, batch):
+        started = time.perf_counter()
+        self.sent_at = time.monotonic()
+        try:
+            self.sink.send(batch)
+            self.sent += len(batch)
+            if self.metrics:
+                self.metrics.count("notify.sent", len(batch))
+        except Exception:
+            self.errors += 1
+            if self.metrics:
+                self.metrics.count("errors.notify")
+            traceback.print_exc()
+        if self.metrics:
+            self.metrics.observe(f"notify.{self.name}", time.perf_counter() - started)
+
+
+class Notifier:
+    def __init__(self, metrics=None):
+        self.metrics = metrics
+        self.workers = []
+
+    def add_sink(self, name, sink, batch_window=1.0, max_batch=100, min_interval=0.0):
+        self.workers.append(_SinkWorker(name, sink, batch_window, max_batch, min_interval, self.metrics))
+        return self
+
+    def notify(self, server, record, name=None):
+        """Queue a ringing call for every sink. Never blocks."""
+        event = incoming_call(server, record, name=name)
+        for worker in self.workers:
+            worker.put(event)
+
+    def flush(self, timeout=None):
+        """Send what is waiting right away (ignoring the rate limit) and wait for it."""
+        waiters = []
+        for worker in self.workers:
+            done = threading.Event()
+            worker.queue.put(done)
+            waiters.append(done)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        return all(done.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+                   for done in waiters)
+
+    def close(self, timeout=10):
+        for worker in self.workers:
+            worker.queue.put(None)
+        for worker in self.workers:
+            worker._thread.join(timeout)
+
+
+def _reveal_all(headers, reveal):
+    return {name: reveal(value) for name, value in headers.items()} if headers else headers
+
+
+def notifier_from_config(settings, show=None, metrics=None, title="Incoming call", reveal=None):
+    """Build a Notifier from the "notifications" section of config.json; None if nothing is enabled.
+
+    The SMTP and GoIP settings that are not in the section are taken from the
+    environment (SMTP_SERVER or SMPT_SERVER, SMTP_PORT, SENDER_EMAIL,
+    SENDER_PASSWORD, GOIP_HOST, GOIP_USER, GOIP_PASSWORD), as in .env.
+    show(title, lines) is the desktop popup, only available with a window.
+    reveal decrypts the passwords and headers saved encrypted (ConfigStore.reveal).
+    """
+    settings = settings or {}
+    reveal = reveal or (lambda value: value)
+    notifier = Notifier(metrics)
+    desktop = settings.get("desktop", show is not None)
+    if show is not None and desktop:
+        options = desktop if isinstance(desktop, dict) else {}
+        notifier.add_sink("desktop", DesktopSink(show, title), batch_window=options.get("batch_window", 0.3),
+                          min_interval=options.get("min_interval", 0.0))
+
+    email = settings.get("email")
+    if email and email.get("to"):
+        port = int(email.get("smtp_port") or os.getenv("SMTP_PORT") or 587)
+        sink = EmailSink(email.get("smtp_server") or os.getenv("SMTP_SERVER") or os.getenv("SMPT_SERVER"), port,
+                         email.get("sender") or os.getenv("SENDER_EMAIL"),
+                         reveal(email.get("password")) or os.getenv("SENDER_PASSWORD"),
+                         _as_list(email["to"]), tls=email.get("tls", "ssl" if port == 465 else "starttls"),
+                         subject=email.get("subject", title))
+        notifier.add_sink("email", sink, batch_window=email.get("batch_window", 5.0),
+                          min_interval=email.get("min_interval", 60.0))
+
+    webhook = settings.get("webhook")
+    if webhook and webhook.get("url"):
+        notifier.add_sink("webhook", WebhookSink(webhook["url"], headers=_reveal_all(webhook.get("headers"), reveal)),
+                          batch_window=webhook.get("batch_window", 0.5),
+                          min_interval=webhook.get("min_interval", 1.0))
+
+    sms = settings.get("sms")
+    if sms and sms.get("to"):
+        sink = GoipSmsSink(sms.get("host") or os.getenv("GOIP_HOST"), sms.get("username") or os.getenv("GOIP_USER"),
+                           reveal(sms.get("password")) or os.getenv("GOIP_PASSWORD"), _as_list(sms["to"]),
+                           line=sms.get("line", 1))
+        notifier.add_sink("sms", sink, batch_window=sms.get("batch_window", 5.0),
+                          min_interval=sms.get("min_interval", 300.0))
+
+    return notifier if notifier.workers else None
+
+
+def _as_list(value):
+    return [value] if isinstance(value, str) else list(value)
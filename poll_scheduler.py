@@ -0,0 +1,102 @@
+"""
+Adaptive scheduler for polling the PBX.
+
+The poll function returns how busy the PBX is ("ringing", "active", "idle")
+or "error", and the next poll is planned from that: often while a call is
+ringing, rarely when nothing happens, with exponential backoff while the
+server fails. The wait between polls is an Event, so pause(), resume(),
+poll_now() and stop() take effect immediately instead of after a sleep().
+"""
+
+import random
+import threading
+import traceback
+
+RINGING = "ringing"
+ACTIVE = "active"
+IDLE = "idle"
+ERROR = "error"
+
+
+class PollScheduler:
+    def __init__(self, poll, interval=3.0, fast_interval=1.0, idle_interval=10.0,
+                 jitter=0.1, backoff_factor=2.0, max_backoff=60.0):
+        self.poll = poll
+        self.interval = interval
+        self.fast_interval = fast_interval
+        self.idle_interval = idle_interval
+        self.jitter = jitter
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.errors = 0
+        self.last_delay = None
+        self._wake = threading.Event()
+        self._resumed = threading.Event()
+        self._resumed.set()
+        self._stopped = False
+        self._thread = None
+
+    @property
+    def paused(self):
+        return not self._resumed.is_set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="poll-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped = True
+        self._resumed.set()
+        self._wake.set()
+
+    def pause(self):
+        self._resumed.clear()
+        self._wake.set()
+
+    def resume(self):
+        self._resumed.set()
+        self._wake.set()
+
+    def poll_now(self):
+        self._wake.set()
+
+    def configure(self, interval=None, fast_interval=None, idle_interval=None, jitter=None, max_backoff=None):
+        """Change the intervals while polling (settings reloaded); None keeps a value."""
+        for name, value in (("interval", interval), ("fast_interval", fast_interval),
+                            ("idle_interval", idle_interval), ("jitter", jitter), ("max_backoff", max_backoff)):
+            if value is not None:
+                setattr(self, name, value)
+        self.poll_now()
+
+    def next_delay(self, activity):
+        if activity == ERROR:
+            self.errors += 1
+            delay = min(self.max_backoff, self.interval * self.backoff_factor ** self.errors)
+        else:
+            self.errors = 0
+            if activity == RINGING:
+                delay = self.fast_interval
+            elif activity == ACTIVE:
+                delay = self.interval
+            else:
+                delay = self.idle_interval
+        if self.jitter:
+            delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        return delay
+
+    def _run(self):
+        while True:
+            self._resumed.wait()
+            if self._stopped:
+                return
+            self._wake.clear()
+            try:
+                activity = self.poll()
+            except Exception:
+                traceback.print_exc()
+                activity = ERROR
+            self.last_delay = self.next_delay(activity)
+            self._wake.wait(self.last_delay)
+            if self._stopped:
+                return
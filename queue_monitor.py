@@ -0,0 +1,335 @@
+"""
+Queues and agents of app_queue: how many callers wait, for how long, and what the agents do.
+
+QueueBoard keeps one QueueState per (server, queue) and changes it in place:
+from the AMI Queue*/Agent* events (QueueStatus on connect, then
+QueueCallerJoin/Leave/Abandon, AgentConnect, QueueMemberStatus,
+QueueMemberPause, ...) or, over SSH, from `queue show` every few seconds.
+The agents per state, answered and abandoned calls are counted as the
+events come instead of being recounted, and every change marks its queue,
+so a view only redraws the queues returned by pop_changed(): with 50 queues
+of 200 agents, one agent going busy touches one agent row and one queue row.
+
+The service level is the share of the answered calls that waited at most
+"sla" seconds (as in Asterisk); the callers waiting longer than that are
+counted as "over" while they wait.
+
+The "queues" section of config.json turns it on: "queues": {"sla": 20, "interval": 5}
+("interval": seconds between two `queue show` over SSH).
+"""
+
+import re
+import threading
+import time
+
+QUEUE_COMMAND = "asterisk -rx 'queue show'"
+DEFAULT_SLA = 20
+DEFAULT_INTERVAL = 5.0
+
+FREE = "free"
+BUSY = "busy"
+PAUSED = "paused"
+OFFLINE = "offline"
+AGENT_STATES = (FREE, BUSY, PAUSED, OFFLINE)
+
+# Device states of the QueueMember* events (the Status field)
+DEVICE_STATES = {"0": OFFLINE, "1": FREE, "2": BUSY, "3": BUSY, "4": OFFLINE, "5": OFFLINE,
+                 "6": BUSY, "7": BUSY, "8": BUSY}
+# The same states as `queue show` prints them
+CLI_STATES = {"not in use": FREE, "in use": BUSY, "busy": BUSY, "ringing": BUSY, "ring+inuse": BUSY,
+              "on hold": BUSY, "unavailable": OFFLINE, "invalid": OFFLINE, "unknown": OFFLINE}
+
+_QUEUE_LINE = re.compile(r"^(\S+)\s+has (\d+) calls? \(max [^)]*\) in '([^']*)' strategy.*?"
+                         r"C:(\d+), A:(\d+), SL:([\d.]+)%.*?within (\d+)s")
+_CALLER_LINE = re.compile(r"^\s+\d+\.\s+(\S+)\s+\(wait: (?:(\d+):)?(\d+):(\d+)")
+_MEMBER_CALLS = re.compile(r"has taken (\d+|no) calls?")
+
+
+class Agent:
+    __slots__ = ("interface", "name", "status", "paused", "calls")
+
+    def __init__(self, interface, name, status, paused, calls):
+        self.interface = interface
+        self.name = name
+        self.status = status  # FREE, BUSY or OFFLINE
+        self.paused = paused
+        self.calls = calls    # calls taken
+
+    @property
+    def state(self):
+        return PAUSED if self.paused else self.status
+
+
+class QueueState:
+    def __init__(self, server, name, sla=DEFAULT_SLA):
+        self.server = server
+        self.name = name
+        self.sla = sla
+        self.strategy = ""
+        self.agents = {}     # interface -> Agent
+        self.callers = {}    # uniqueid or channel -> time.monotonic() when it joined, oldest first
+        self.counts = dict.fromkeys(AGENT_STATES, 0)
+        self.answered = 0
+        self.answered_in_sla = 0
+        self.abandoned = 0
+
+    def set_agent(self, interface, name=None, status=None, paused=None, calls=None):
+        """Add or update an agent; returns True if anything changed."""
+        agent = self.agents.get(interface)
+        if agent is None:
+            agent = self.agents[interface] = Agent(interface, name or interface, status or OFFLINE,
+                                                   bool(paused), calls or 0)
+            self.counts[agent.state] += 1
+            return True
+        before = (agent.name, agent.state, agent.calls)
+        old_state = agent.state
+        if name:
+            agent.name = name
+        if status is not None:
+            agent.status = status
+        if paused is not None:
+            agent.paused = paused
+        if calls is not None:
+            agent.calls = calls
+        if agent.state != old_state:
+            self.counts[old_state] -= 1
+            self.counts[agent.state] += 1
+        return (agent.name, agent.state, agent.calls) != before
+
+    def remove_agent(self, interface):
+        agent = self.agents.pop(interface, None)
+        if agent is not None:
+            self.counts[agent.state] -= 1
+        return agent is not None
+
+    def answer(self, hold_time):
+        self.answered += 1
+        if hold_time <= self.sla:
+            self.answered_in_sla += 1
+
+    def longest_wait(self, now):
+        for joined in self.callers.values():
+            return now - joined  # the first one is the oldest
+        return 0.0
+
+    def stats(self, now):
+        over = sum(1 for joined in self.callers.values() if now - joined > self.sla)
+        return {"server": self.server, "queue": self.name, "strategy": self.strategy,
+                "waiting": len(self.callers), "longest_wait": self.longest_wait(now), "over_sla": over,
+                "agents": dict(self.counts), "answered": self.answered, "abandoned": self.abandoned,
+                "service_level": self.answered_in_sla / self.answered if self.answered else None,
+                "sla": self.sla}
+
+
+def parse_queue_show(output):
+    """Parse `queue show`; returns a list of dicts with the queue counters, agents and callers."""
+    queues = []
+    queue = section = None
+    for line in output.splitlines():
+        match = _QUEUE_LINE.match(line)
+        if match:
+            name, calls, strategy, completed, abandoned, level, sla = match.groups()
+            queue = {"name": name, "strategy": strategy, "answered": int(completed),
+                     "abandoned": int(abandoned), "service_level": float(level) / 100, "sla": int(sla),
+                     "agents": [], "callers": []}
+            queues.append(queue)
+            section = None
+            continue
+        if queue is None:
+            continue
+        stripped = line.strip()
+        if stripped.startswith("Members:"):
+            section = "agents"
+        elif stripped.startswith("Callers:"):
+            section = "callers"
+        elif stripped.startswith("No "):
+            section = None
+        elif section == "callers":
+            match = _CALLER_LINE.match(line)
+            if match:
+                channel, hours, minutes, seconds = match.groups()
+                queue["callers"].append((channel, int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds)))
+        elif section == "agents" and stripped:
+            queue["agents"].append(_parse_member(stripped))
+    return queues
+
+
+def _parse_member(text):
+    # "Alice (SIP/101 from hint:101@ext-local) (ringinuse disabled) (dynamic) (Not in use) has taken 5 calls ..."
+    # "SIP/102 (ringinuse enabled) (In use) (paused) has taken no calls yet"
+    name, _, rest = text.partition(" (")
+    groups = re.findall(r"\(([^()]*)\)", " (" + rest)
+    interface = name
+    if groups and "/" in groups[0] and not groups[0].startswith("ringinuse"):
+        interface = groups[0].split(" from ")[0]
+    status = OFFLINE
+    paused = False
+    for group in groups:
+        lowered = group.lower()
+        if lowered in CLI_STATES:
+            status = CLI_STATES[lowered]
+        elif lowered.startswith("paused"):
+            paused = True
+    calls = _MEMBER_CALLS.search(text)
+    return {"interface": interface, "name": name, "status": status, "paused": paused,
+            "calls": int(calls.group(1)) if calls and calls.group(1).isdigit() else 0}
+
+
+class QueueBoard:
+    """The queues of all servers; safe to update from the poll and AMI threads while a view reads it."""
+
+    def __init__(self, sla=DEFAULT_SLA, interval=DEFAULT_INTERVAL, metrics=None, clock=time.monotonic):
+        self.sla = sla
+        self.interval = interval  # seconds between two `queue show` of one server
+        self.metrics = metrics    # optional metrics.Metrics, gets the "queues.update" stage
+        self.clock = clock
+        self.queues = {}          # (server, queue) -> QueueState
+        self.changed = set()      # keys of the queues changed since the last pop_changed()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, settings, metrics=None):
+        """Build the board from the "queues" section of config.json; None if it is not there."""
+        if settings is None or settings is False:
+            return None
+        settings = settings if isinstance(settings, dict) else {}
+        return cls(settings.get("sla", DEFAULT_SLA), settings.get("interval", DEFAULT_INTERVAL), metrics)
+
+    def handle_event(self, server, event):
+        """Apply one AMI Queue*/Agent* event."""
+        name = event.get("Event", "")
+        queue_name = event.get("Queue")
+        if not queue_name:
+            return
+        now = self.clock()
+        key = (server, queue_name)
+        interface = event.get("Interface") or event.get("Location") or event.get("StateInterface")
+        with self.lock:
+            queue = self.queues.get(key)
+            if queue is None:
+                queue = self.queues[key] = QueueState(server, queue_name, self.sla)
+            changed = True
+            if name == "QueueParams":
+                # The first answer to QueueStatus: the waiting callers are listed again after it
+                queue.strategy = event.get("Strategy", queue.strategy)
+                queue.sla = _int(event.get("ServiceLevel")) or self.sla
+                queue.answered = _int(event.get("Completed"))
+                queue.abandoned = _int(event.get("Abandoned"))
+                queue.answered_in_sla = round(_float(event.get("ServicelevelPerf")) * queue.answered / 100)
+                queue.callers.clear()
+            elif name in ("QueueMember", "QueueMemberStatus", "QueueMemberAdded"):
+                changed = queue.set_agent(interface, event.get("MemberName") or event.get("Name"),
+                                          DEVICE_STATES.get(event.get("Status"), OFFLINE),
+                                          event.get("Paused") == "1", _int(event.get("CallsTaken")))
+            elif name == "QueueMemberRemoved":
+                changed = queue.remove_agent(interface)
+            elif name in ("QueueMemberPause", "QueueMemberPaused"):
+                changed = queue.set_agent(interface, paused=event.get("Paused") == "1")
+            elif name == "QueueEntry":
+                queue.callers[event.get("Uniqueid") or event.get("Channel")] = now - _int(event.get("Wait"))
+            elif name == "QueueCallerJoin":
+                queue.callers[event.get("Uniqueid") or event.get("Channel")] = now
+            elif name == "QueueCallerLeave":
+                changed = queue.callers.pop(event.get("Uniqueid") or event.get("Channel"), None) is not None
+            elif name == "QueueCallerAbandon":
+                queue.abandoned += 1
+                queue.callers.pop(event.get("Uniqueid") or event.get("Channel"), None)
+            elif name == "AgentConnect":
+                queue.answer(_int(event.get("HoldTime")))
+                queue.callers.pop(event.get("Uniqueid") or event.get("Channel"), None)
+            else:
+                changed = False
+            if changed:
+                self.changed.add(key)
+
+    def update_from_show(self, server, queues):
+        """Apply the parsed `queue show` of a server; only what differs marks a queue as changed."""
+        started = time.perf_counter()
+        now = self.clock()
+        with self.lock:
+            seen = set()
+            for parsed in queues:
+                key = (server, parsed["name"])
+                seen.add(key)
+                queue = self.queues.get(key)
+                changed = queue is None
+                # "within 0s" when the queue has no servicelevel, as ServiceLevel: 0 over AMI
+                sla = parsed["sla"] or self.sla
+                if queue is None:
+                    queue = self.queues[key] = QueueState(server, parsed["name"], sla)
+                in_sla = round(parsed["service_level"] * parsed["answered"])
+                counters = (parsed["strategy"], sla, parsed["answered"], parsed["abandoned"], in_sla)
+                if counters != (queue.strategy, queue.sla, queue.answered, queue.abandoned, queue.answered_in_sla):
+                    queue.strategy, queue.sla, queue.answered, queue.abandoned, queue.answered_in_sla = counters
+                    changed = True
+
+                interfaces = set()
+                for agent in parsed["agents"]:
+                    interfaces.add(agent["interface"])
+                    changed |= queue.set_agent(agent["interface"], agent["name"], agent["status"],
+                                               agent["paused"], agent["calls"])
+                for interface in [interface for interface in queue.agents if interface not in interfaces]:
+                    changed |= queue.remove_agent(interface)
+
+                # A caller keeps the join time of the first `queue show` that listed it
+                callers = {channel: queue.callers.get(channel, now - wait) for channel, wait in parsed["callers"]}
+                if callers.keys() != queue.callers.keys():
+                    queue.callers = callers
+                    changed = True
+                if changed:
+                    self.changed.add(key)
+            for key in [key for key in self.queues if key[0] == server and key not in seen]:
+                del self.queues[key]
+                self.changed.add(key)
+        if self.metrics:
+            self.metrics.observe("queues.update", time.perf_counter() - started)
+
+    def clear(self):
+        """Forget every queue, e.g. before connecting to other servers."""
+        with self.lock:
+            self.changed.update(self.queues)
+            self.queues.clear()
+
+    def pop_changed(self):
+        """The keys of the queues changed (or removed) since the previous call."""
+        with self.lock:
+            changed, self.changed = self.changed, set()
+        return changed
+
+    def keys(self):
+        with self.lock:
+            return sorted(self.queues)
+
+    def stats(self, key, now=None):
+        """Counters and wait timers of one queue, or None if it is gone."""
+        now = self.clock() if now is None else now
+        with self.lock:
+            queue = self.queues.get(key)
+            return queue.stats(now) if queue else None
+
+    def agents(self, key):
+        """[(interface, name, state, calls taken)] of one queue, in the order they joined it."""
+        with self.lock:
+            queue = self.queues.get(key)
+            if queue is None:
+                return []
+            return [(agent.interface, agent.name, agent.state, agent.calls) for agent in queue.agents.values()]
+
+    def snapshot(self, now=None):
+        now = self.clock() if now is None else now
+        with self.lock:
+            return [self.queues[key].stats(now) for key in sorted(self.queues)]
+
+
+def _int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
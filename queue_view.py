@@ -0,0 +1,131 @@
+"""
+Table of the call-centre queues, with their agents as the rows under each queue.
+
+Refreshed once a second from a queue_monitor.QueueBoard: the queue rows are
+recounted every time (the wait timers move even when nothing happens), but
+the agent rows only for the queues the board reports as changed, and only
+the rows whose text differs are touched. 50 queues of 200 agents are 10 000
+rows; an agent changing state costs one item() call, not a new table.
+"""
+
+import time
+import tkinter as tk
+from tkinter import ttk
+
+from channel_parser import format_duration
+
+TICK_MS = 1000
+
+
+def queue_iid(key):
+    return "q|" + "|".join(key)
+
+
+class QueueTreeView:
+    COLUMNS = ("state", "waiting", "longest", "service_level", "answered", "abandoned")
+
+    def __init__(self, parent, msg, bg="#FFF9F0", metrics=None):
+        self.msg = msg
+        self.frame = tk.Frame(parent, bg=bg)
+        self.caption = tk.Label(self.frame, text="", anchor="w", bg=bg,
+                                font=("Courier New", 10, "bold"), fg="#8C4A27")
+        self.caption.pack(fill=tk.X)
+
+        self.tree = ttk.Treeview(self.frame, columns=self.COLUMNS, show="tree headings", height=12)
+        headings = msg.queue_columns
+        self.tree.heading("#0", text=headings[0])
+        self.tree.column("#0", width=200, anchor="w")
+        for column, heading, width in zip(self.COLUMNS, headings[1:], (230, 110, 90, 90, 70, 70)):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width, anchor="w")
+        self.tree.tag_configure("queue", foreground="#003366", font=("Helvetica", 10, "bold"))
+        self.tree.tag_configure("over", foreground="red", font=("Helvetica", 10, "bold"))
+        self.tree.tag_configure("agent", foreground="#333333")
+
+        scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.rows = {}    # iid -> (text, values, tag) currently shown
+        self.agents = {}  # queue iid -> iids of its agent rows
+        self.metrics = metrics  # optional metrics.Metrics, gets the "ui.queues" stage
+        self.job = None
+
+    def show(self, board, **pack_options):
+        """Show the table and refresh it from board every second until hide()."""
+        self.frame.pack(**pack_options)
+        if self.job is None:
+            self.refresh(board)
+
+    def hide(self):
+        self.frame.pack_forget()
+        if self.job is not None:
+            self.frame.after_cancel(self.job)
+            self.job = None
+
+    def refresh(self, board):
+        started = time.perf_counter()
+        changed = board.pop_changed()
+        now = board.clock()
+        keys = board.keys()
+        waiting = 0
+        for key in keys:
+            stats = board.stats(key, now)
+            if stats is None:
+                continue
+            waiting += stats["waiting"]
+            iid = queue_iid(key)
+            agents_due = key in changed or iid not in self.rows
+            self._set(iid, "", self.queue_row(stats), "over" if stats["over_sla"] else "queue")
+            if agents_due:
+                self._set_agents(iid, board.agents(key))
+        shown = set(map(queue_iid, keys))
+        for iid in [iid for iid in self.agents if iid not in shown]:
+            self.tree.delete(iid)
+            for agent_iid in self.agents.pop(iid):
+                del self.rows[agent_iid]
+            del self.rows[iid]
+        self.caption.config(text=self.msg.queues_header.format(count=len(keys), waiting=waiting))
+        if self.metrics:
+            self.metrics.observe("ui.queues", time.perf_counter() - started)
+        self.job = self.frame.after(TICK_MS, self.refresh, board)
+
+    def queue_row(self, stats):
+        msg = self.msg
+        level = stats["service_level"]
+        text = f"{stats['queue']} ({stats['server']})"
+        return text, (msg.queue_agents.format(**stats["agents"]),
+                      msg.queue_waiting.format(waiting=stats["waiting"], over=stats["over_sla"], sla=stats["sla"]),
+                      format_duration(stats["longest_wait"]) if stats["waiting"] else "",
+                      "" if level is None else f"{level:.0%}",
+                      stats["answered"], stats["abandoned"])
+
+    def _set_agents(self, queue, agents):
+        old = self.agents.get(queue, set())
+        new = set()
+        for interface, name, state, calls in agents:
+            iid = f"{queue}|{interface}"
+            new.add(iid)
+            text = name if name == interface else f"{name} ({interface})"
+            self._set(iid, queue, (text, (self.msg.agent_states[state], "", "", "", calls, "")), "agent")
+        removed = old - new
+        if removed:
+            self.tree.delete(*removed)
+            for iid in removed:
+                del self.rows[iid]
+        self.agents[queue] = new
+
+    def _set(self, iid, parent, row, tag):
+        text, values = row
+        shown = (text, values, tag)
+        old = self.rows.get(iid)
+        if old == shown:
+            return
+        if old is None:
+            self.tree.insert(parent, tk.END, iid=iid, text=text, values=values, tags=(tag,))
+            if not parent:
+                self.agents.setdefault(iid, set())
+        else:
+            self.tree.item(iid, text=text, values=values, tags=(tag,))
+        self.rows[iid] = shown
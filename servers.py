@@ -0,0 +1,33 @@
+"""
+List of Asterisk servers to monitor.
+
+The "IP Asterisk" field accepts several servers separated by commas or
+spaces, each one optionally with its own SSH port: "10.0.0.1, 10.0.0.2:2222".
+"""
+
+import re
+
+
+def parse_hosts(text, default_port=22):
+    """Return a list of (host, port) tuples, without duplicates, in input order."""
+    servers = []
+    for item in re.split(r"[,;\s]+", text.strip()):
+        if not item:
+            continue
+        host, sep, port = item.rpartition(":")
+        if not sep or not port.isdigit() or host.count(":") and not host.startswith("["):
+            host, port = item, default_port  # no port, or a bare IPv6 address
+        host = host.strip("[]")
+        server = (host, int(port))
+        if server not in servers:
+            servers.append(server)
+    return servers
+
+
+def server_name(host, port, default_port=22):
+    return host if port == default_port else f"{host}:{port}"
+
+
+def file_key(host, port, default_port=22):
+    """Part of a file name for per-server data (IPv6 colons are not allowed on Windows)."""
+    return re.sub(r"[^\w.-]", "_", server_name(host, port, default_port))
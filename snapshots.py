@@ -0,0 +1,131 @@
+"""
+Snapshots of the active calls and the differences between them.
+
+A snapshot is a {key: row values} dict per server. merge_sources() joins the
+snapshots of several servers into one table, counting the durations of live
+calls from their start times, and diff_snapshots() tells which rows have to
+be added, changed or removed. SnapshotStream numbers those differences and
+gives every row a stable id, so a consumer (live_feed.py) can keep its own
+copy up to date from the deltas alone and knows when it missed one. Nothing
+here depends on Tk, so the same code is used by the window and by the
+benchmarks.
+"""
+
+import time
+from collections import deque
+
+from channel_parser import format_duration
+
+DURATION = 2  # index of the duration in the row values
+
+
+def diff_snapshots(old, new):
+    """Compare two {key: row values} dicts and return (added, changed, removed)."""
+    added = {key: values for key, values in new.items() if key not in old}
+    changed = {key: values for key, values in new.items() if key in old and old[key] != values}
+    removed = [key for key in old if key not in new]
+    return added, changed, removed
+
+
+def merge_sources(sources, started=None, now=None):
+    """Join {server: {key: values}} into {"server|key": (server,) + values}.
+
+    For the keys in started ({server: {key: time.monotonic() of the call start}})
+    the duration is counted up to now.
+    """
+    now = time.monotonic() if now is None else now
+    started = started or {}
+    merged = {}
+    for source, rows in sources.items():
+        source_started = started.get(source, {})
+        for key, values in rows.items():
+            values = tuple(values)
+            if key in source_started:
+                values = values[:DURATION] + (format_duration(now - source_started[key]),) + values[DURATION + 1:]
+            merged[f"{source}|{key}" if source else key] = (source,) + values
+    return merged
+
+
+class SnapshotStream:
+    """Numbered deltas between the snapshots of one or more sources.
+
+    Every row gets a stable id when it first appears; a key that comes back
+    after being removed is a new call and gets a new id. update() returns a
+    delta {"seq", "source", "added": {id: row}, "changed": {id: row},
+    "removed": [id]} with seq one higher than the previous one, or None when
+    nothing changed. The last backlog deltas are kept, so a consumer that
+    missed a few catches up with since(); older ones need a snapshot(). run
+    tells the streams of two runs of a process apart, as both count from 1.
+    """
+
+    def __init__(self, backlog=256):
+        self.run = format(time.time_ns() // 1000000, "x")
+        self.seq = 0
+        self.sources = {}   # source -> {id: row}
+        self.ids = {}       # source -> {key: id}
+        self.next_id = 0
+        self.backlog = deque(maxlen=backlog)
+
+    def update(self, source, rows):
+        ids = self.ids.setdefault(source, {})
+        new = {}
+        for key, row in rows.items():
+            row_id = ids.get(key)
+            if row_id is None:
+                self.next_id += 1
+                row_id = ids[key] = str(self.next_id)
+            new[row_id] = row
+        for key in [key for key in ids if key not in rows]:
+            del ids[key]
+        added, changed, removed = diff_snapshots(self.sources.get(source, {}), new)
+        if not (added or changed or removed):
+            return None
+        self.sources[source] = new
+        self.seq += 1
+        delta = {"seq": self.seq, "source": source, "added": added, "changed": changed, "removed": removed}
+        self.backlog.append(delta)
+        return delta
+
+    def snapshot(self):
+        """{"run", "seq", "sources": {source: {id: row}}}; the rows dicts are copies."""
+        return {"run": self.run, "seq": self.seq, "sources": {source: dict(rows) for source, rows in self.sources.items()}}
+
+    def since(self, run, seq):
+        """The deltas after seq, or None if some of them are no longer kept."""
+        if run != self.run or seq > self.seq:
+            return None
+        if seq == self.seq:
+            return []
+        if not self.backlog or self.backlog[0]["seq"] > seq + 1:
+            return None
+        return [delta for delta in self.backlog if delta["seq"] > seq]
+
+
+class SnapshotMirror:
+    """Consumer side of a SnapshotStream: applies the deltas in order.
+
+    apply() returns False when a delta does not follow the previous one (one
+    was missed, or there was no snapshot yet); the mirror then has to be
+    loaded from a fresh snapshot.
+    """
+
+    def __init__(self):
+        self.run = None
+        self.seq = None
+        self.sources = {}
+
+    def load(self, snapshot):
+        self.run = snapshot["run"]
+        self.seq = snapshot["seq"]
+        self.sources = {source: dict(rows) for source, rows in snapshot["sources"].items()}
+
+    def apply(self, delta):
+        if self.seq is None or delta["seq"] != self.seq + 1:
+            return False
+        rows = self.sources.setdefault(delta["source"], {})
+        rows.update(delta["added"])
+        rows.update(delta["changed"])
+        for row_id in delta["removed"]:
+            rows.pop(row_id, None)
+        self.seq = delta["seq"]
+        return True
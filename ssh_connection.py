@@ -0,0 +1,147 @@
+"""
+Shared SSH connection to the Asterisk server.
+
+One authenticated paramiko transport is kept open with keepalive packets, and
+every command or SFTP session opens its own channel on it, so concurrent
+commands do not each pay for a new handshake. When the transport dies, the
+next command reconnects transparently; failed reconnects are retried with
+exponential backoff. With a key file or an SSH agent no password is needed,
+and a reconnect does not send one either.
+
+paramiko (with its cryptography stack) is imported on the first connect,
+not with this module, so the window starts without waiting for it.
+"""
+
+import os
+import threading
+import time
+
+
+class SshUnavailable(Exception):
+    pass
+
+
+class SshConnection:
+    def __init__(self, host, port, username, password, keepalive=15, timeout=10,
+                 min_backoff=1.0, max_backoff=60.0, metrics=None, key_file=None, use_agent=False):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.key_file = key_file and os.path.expanduser(key_file)  # private key; password unlocks it if encrypted
+        self.use_agent = use_agent
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.client = None
+        self.transport = None
+        self.connected_at = None  # time.time() of the last successful (re)connect
+        self.reconnects = 0
+        self.error = None
+        self.metrics = metrics  # optional metrics.Metrics, times the exec and read stages
+        self._lock = threading.Lock()
+        self._backoff = 0.0
+        self._retry_at = 0.0
+
+    def connect(self):
+        with self._lock:
+            self._connect()
+
+    def close(self):
+        with self._lock:
+            if self.client:
+                self.client.close()
+            self.client = None
+            self.transport = None
+
+    def is_alive(self):
+        transport = self.transport
+        return transport is not None and transport.is_active()
+
+    def ensure(self):
+        """Return a live transport, reconnecting if the old one is dead."""
+        transport = self.transport
+        if transport is not None and transport.is_active():
+            return transport
+        with self._lock:
+            if self.is_alive():
+                return self.transport
+            now = time.monotonic()
+            if now < self._retry_at:
+                raise SshUnavailable(f"{self.error} (retry in {self._retry_at - now:.1f} s)")
+            try:
+                self._connect()
+            except Exception as e:
+                self.error = str(e)
+                self._backoff = min(self.max_backoff, max(self.min_backoff, self._backoff * 2))
+                self._retry_at = time.monotonic() + self._backoff
+                raise
+            self.reconnects += 1
+            if self.metrics:
+                self.metrics.count("ssh.reconnects")
+            return self.transport
+
+    def run(self, command, timeout=None):
+        """Run a command on its own channel and return its stdout as text."""
+        import paramiko
+        for attempt in (1, 2):
+            transport = self.ensure()
+            started = time.perf_counter()
+            try:
+                channel = transport.open_session(timeout=self.timeout)
+            except (paramiko.SSHException, EOFError, OSError):
+                # The transport died between the check and the call, reconnect once
+                self._drop(transport)
+                if attempt == 2:
+                    raise
+                continue
+            try:
+                channel.settimeout(timeout or self.timeout)
+                channel.exec_command(command)
+                sent = time.perf_counter()
+                chunks = []
+                while True:
+                    data = channel.recv(65536)
+                    if not data:
+                        break
+                    chunks.append(data)
+                if self.metrics:
+                    # exec: opening the channel and starting the command, read: waiting for the output
+                    self.metrics.observe("ssh.exec", sent - started)
+                    self.metrics.observe("ssh.read", time.perf_counter() - sent)
+                return b"".join(chunks).decode("utf-8", "replace")
+            except (paramiko.SSHException, EOFError, OSError):
+                # A command that hangs or breaks usually means a dead link
+                self._drop(transport)
+                raise
+            finally:
+                channel.close()
+
+    def open_sftp(self):
+        import paramiko
+        return paramiko.SFTPClient.from_transport(self.ensure())
+
+    def _connect(self):
+        import paramiko
+        if self.client:
+            self.client.close()
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(self.host, port=self.port, username=self.username, password=self.password or None,
+                       key_filename=self.key_file, allow_agent=self.use_agent, look_for_keys=False,
+                       timeout=self.timeout, banner_timeout=self.timeout, auth_timeout=self.timeout)
+        transport = client.get_transport()
+        transport.set_keepalive(self.keepalive)
+        self.client = client
+        self.transport = transport
+        self.connected_at = time.time()
+        self.error = None
+        self._backoff = 0.0
+        self._retry_at = 0.0
+
+    def _drop(self, transport):
+        with self._lock:
+            if self.transport is transport:
+                transport.close()
+                self.transport = None
@@ -0,0 +1,143 @@
+import time
+
+from ami_client import AmiClient
+from call_store import ANSWERED
+from channel_filter import ChannelFilter
+from monitor import CallMonitor
+from poll_scheduler import ERROR, RINGING
+from tools.fake_ami import FakeAmiServer
+
+
+class RecordingMonitor(CallMonitor):
+    def __init__(self, *args, **options):
+        super().__init__(*args, **options)
+        self.ringing = []
+        self.ended = []
+        self.errors = []
+
+    def on_call_ringing(self, record):
+        self.ringing.append(record)
+
+    def on_call_ended(self, record):
+        self.ended.append(record)
+
+    def on_poll_error(self, kind, error):
+        self.errors.append(kind)
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_ami_poll_round_trip():
+    server = FakeAmiServer(username="admin", secret="secret").start()
+    try:
+        call = server.new_call("79001112233")
+        monitor = RecordingMonitor("127.0.0.1", None, "admin", "secret", ami_port=server.port)
+        assert monitor.connect()
+        try:
+            # The call that was already there is in the first poll
+            assert monitor.poll() == RINGING
+            assert [record.number for record in monitor.ringing] == ["79001112233"]
+
+            phone = server.new_call("101", channel="SIP/101-00000001", state="Ringing", linkedid=call)
+            server.set_state(phone, "Up")
+            server.set_state(call, "Up")
+            wait_until(lambda: len(monitor.ami.snapshot()) == 2)
+            monitor.poll()
+            server.hangup(phone)
+            server.hangup(call)
+            wait_until(lambda: all(chan["status"] == "Hangup" for chan in monitor.ami.snapshot()))
+            monitor.poll()
+            [ended] = monitor.ended
+            assert ended.number == "79001112233" and ended.outcome == ANSWERED
+            assert len(monitor.ringing) == 1  # the phone is a leg of the call, not a call
+        finally:
+            monitor.stop()
+    finally:
+        server.stop()
+
+
+def test_ami_reconnects_after_the_server_restarts():
+    server = FakeAmiServer().start()
+    port = server.port
+    monitor = RecordingMonitor("127.0.0.1", None, "admin", "secret", ami_port=port)
+    try:
+        assert monitor.connect()
+        server.stop()
+        wait_until(lambda: not monitor.ami.connected)
+        assert monitor.poll() == ERROR
+        assert monitor.errors == ["ami_lost"]
+
+        server = FakeAmiServer(port=port).start()
+        server.new_call("79001112233")
+        wait_until(lambda: monitor.poll() == RINGING, timeout=10.0)  # after the backoff
+        assert monitor.ami.reconnects == 1
+        assert monitor.metrics.snapshot()["counters"]["ami.reconnects"] == 1
+    finally:
+        monitor.stop()
+        server.stop()
+
+
+def test_new_filter_reconnects():
+    server = FakeAmiServer(username="admin", secret="secret").start()
+    try:
+        monitor = RecordingMonitor("127.0.0.1", None, "admin", "secret", ami_port=server.port,
+                                   channel_filter=ChannelFilter(trunks=["SIP/trunk"]))
+        assert monitor.connect()
+        try:
+            monitor.set_channel_filter(ChannelFilter(trunks=["SIP/provider"]))
+            assert not monitor.ami.connected
+            monitor.poll()
+            assert monitor.ami.connected
+            wait_until(lambda: [[regex.pattern for regex in filters] for filters in server.filters.values()]
+                       == [["Channel: (SIP/provider)"]])
+            server.new_call("79001112233", channel="SIP/provider-00000001")
+            server.new_call("79004445566", channel="SIP/trunk-00000002")
+            wait_until(lambda: len(monitor.ami.snapshot()) == 1)
+            monitor.poll()
+            assert [record.number for record in monitor.ringing] == ["79001112233"]
+        finally:
+            monitor.stop()
+    finally:
+        server.stop()
+
+
+def test_silent_connection_is_lost_after_a_ping():
+    server = FakeAmiServer().start()
+    client = AmiClient("127.0.0.1", server.port, "admin", "secret", ping_interval=0.2)
+    try:
+        client.connect()
+        # An idle connection that answers the Ping stays up
+        time.sleep(1.0)
+        assert client.connected
+        server.silent = True
+        wait_until(lambda: not client.connected)
+        assert "Ping" in client.error
+    finally:
+        client.close()
+        server.stop()
+
+
+def test_rejected_filter_is_reported():
+    server = FakeAmiServer().start()
+    server.allow_filters = False
+    try:
+        server.new_call("79001112233", channel="SIP/trunk-00000001")
+        server.new_call("79004445566", channel="SIP/provider-00000002")
+        monitor = RecordingMonitor("127.0.0.1", None, "admin", "secret", ami_port=server.port,
+                                   channel_filter=ChannelFilter(trunks=["SIP/trunk"]))
+        assert monitor.connect()
+        try:
+            assert monitor.errors == ["ami_filter"] and monitor.ami.filter_error == "Permission denied"
+            # The filter is still applied to the calls
+            assert len(monitor.ami.snapshot()) == 2
+            monitor.poll()
+            assert [record.number for record in monitor.ringing] == ["79001112233"]
+        finally:
+            monitor.stop()
+    finally:
+        server.stop()
@@ -0,0 +1,113 @@
+from call_store import ANSWERED, CallStore
+
+
+def test_indexes_follow_updates():
+    store = CallStore()
+    store.update("a", number="79001112233", status="Ring", now=0.0)
+    store.update("b", number="79001112233", status="Up", now=0.0)
+    assert {record.key for record in store.find_by_number("79001112233")} == {"a", "b"}
+    store.update("a", status="Up", now=1.0)
+    assert {record.key for record in store.with_status("Up")} == {"a", "b"}
+    assert store.with_status("Ring") == []
+
+
+def test_finished_calls_are_evicted():
+    store = CallStore(max_age=60, max_finished=1)
+    store.update("a", number="1", status="Ring", now=0.0)
+    store.update("b", number="2", status="Ring", now=0.0)
+    store.finish("a", now=5.0)
+    store.finish("b", now=6.0)
+    assert [record.key for record in store.pop_ended()] == ["a", "b"]
+    store.evict(now=7.0)
+    assert "a" not in store and "b" in store
+    store.evict(now=100.0)
+    assert len(store) == 0
+    assert store.find_by_number("2") == []
+
+
+def test_answered_call():
+    store = CallStore()
+    store.update("a", number="79001112233", status="Ring", now=0.0)
+    store.update("a", status="Up", now=5.0)
+    store.update("a", status="Hangup", now=65.0)
+    [ringing] = store.pop_ringing()
+    [ended] = store.pop_ended()
+    assert ringing is ended
+    assert ended.outcome == ANSWERED
+    assert ended.ring_time() == 5.0
+    assert ended.talk_time() == 60.0
+    assert store.pop_ended() == []
+
+
+def test_elapsed_dates_a_call_already_going_on():
+    store = CallStore()
+    record = store.update("a", status="Up", elapsed=30, now=100.0)
+    assert record.started == 70.0
+    assert record.total_time(100.0) == 30.0
+
+
+def test_missing_from_one_poll_is_not_finished():
+    store = CallStore()
+    store.update("a", number="79001112233", status="Up", now=0.0)
+    store.finish_missing(set(), now=1.0)
+    assert store.pop_ended() == []
+    assert store.missing == 1
+    store.update("a", status="Up", now=2.0)
+    store.finish_missing({"a"}, now=2.0)
+    store.finish_missing(set(), now=3.0)
+    store.finish_missing(set(), now=4.0)
+    [ended] = store.pop_ended()
+    assert ended.ended == 2.5  # between the last poll that saw it and the first one that did not
+
+
+def test_call_reported_once_when_it_shows_up_again():
+    store = CallStore()
+    store.update("a", status="Up", now=0.0)
+    store.finish_missing(set(), now=1.0)
+    store.finish_missing(set(), now=2.0)
+    assert len(store.pop_ended()) == 1
+    # The output was only incomplete: the call shows up again and then really ends
+    record = store.update("a", status="Up", now=3.0)
+    assert record.ended is None
+    store.update("a", status="Hangup", now=4.0)
+    assert store.pop_ended() == []
+
+
+def test_reopened_call_is_withdrawn_until_it_ends():
+    store = CallStore()
+    store.update("a", status="Ring", now=0.0)
+    store.finish("a", now=1.0)
+    store.update("a", status="Up", now=2.0)  # before anyone popped the first end
+    assert store.pop_ended() == []
+    store.update("a", status="Hangup", now=3.0)
+    [ended] = store.pop_ended()
+    assert ended.outcome == ANSWERED
+
+
+def test_ring_all_is_one_call():
+    store = CallStore()
+    store.update("trunk", number="79001112233", status="Ring", now=0.0)
+    for phone in ("p1", "p2", "p3"):
+        store.update(phone, status="Ringing", channel=f"SIP/{phone}", now=0.5, dialed=True, leg_of="trunk")
+    assert [record.key for record in store.pop_ringing()] == ["trunk"]
+    assert store.active_count() == 1
+    store.update("p2", status="Up", now=3.0, dialed=True, leg_of="trunk")
+    store.finish("p1", now=3.0)
+    store.finish("p3", now=3.0)
+    store.finish("p2", now=30.0)
+    store.finish("trunk", now=30.0)
+    [ended] = store.pop_ended()
+    assert ended.key == "trunk"
+    assert ended.outcome == ANSWERED
+    assert store.active_count() == 0
+
+
+def test_dialed_leg_of_an_unknown_call_becomes_the_call():
+    store = CallStore()
+    leg = store.update("out", number="79001112233", status="Ring", now=0.0, dialed=True)
+    assert leg.leg_of == ""
+    assert store.pop_ringing() == []
+    store.update("out", status="Up", now=2.0, dialed=True, leg_of="phone")  # the phone is filtered out
+    assert leg.leg_of is None
+    store.finish("out", now=10.0)
+    assert [record.key for record in store.pop_ended()] == ["out"]
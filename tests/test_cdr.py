@@ -0,0 +1,94 @@
+import io
+import os
+import threading
+import time
+
+from cdr import CdrIndex, CdrTail
+from monitor import CallMonitor
+
+
+class LocalFile(io.BytesIO):
+    def prefetch(self, size=None):
+        pass
+
+
+class LocalSftp:
+    """The part of paramiko's SFTPClient used by CdrTail, over local files."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def stat(self, path):
+        time.sleep(self.delay)
+        return os.stat(path)
+
+    def open(self, path, mode):
+        with open(path, mode) as f:
+            return LocalFile(f.read())
+
+    def close(self):
+        pass
+
+
+class LocalClient:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def open_sftp(self):
+        return LocalSftp(self.delay)
+
+
+def cdr_line(uniqueid, src="79001112233", disposition="ANSWERED"):
+    return (f'"","{src}","100","from-trunk","""Client"" <{src}>","SIP/trunk-00000001","SIP/100-00000002",'
+            f'"Dial","SIP/100","2024-04-17 10:00:{uniqueid:02d}","2024-04-17 10:00:05","2024-04-17 10:01:00",'
+            f'60,55,"{disposition}","DOCUMENTATION","1713340800.{uniqueid}"\n')
+
+
+def test_sync_resumes_from_the_stored_offset(tmp_path):
+    master = tmp_path / "Master.csv"
+    master.write_text(cdr_line(1) + cdr_line(2))
+    index_file = tmp_path / "cdr.sqlite"
+    tail = CdrTail(LocalClient(), CdrIndex(index_file), str(master), chunk_size=100)
+    assert tail.sync() == 2
+
+    # A line that is still being written waits for the next sync
+    with open(master, "a") as f:
+        f.write(cdr_line(3) + cdr_line(4)[:20])
+    assert tail.sync() == 1
+    with open(master, "a") as f:
+        f.write(cdr_line(4)[20:])
+    tail.index.close()
+
+    tail = CdrTail(LocalClient(), CdrIndex(index_file), str(master))
+    assert tail.sync() == 1
+    assert tail.sync() == 0
+    assert tail.index.count(True) == 4
+
+
+def test_sync_reads_a_rotated_file_from_the_start(tmp_path):
+    master = tmp_path / "Master.csv"
+    master.write_text(cdr_line(1) + cdr_line(2))
+    tail = CdrTail(LocalClient(), CdrIndex(":memory:"), str(master))
+    assert tail.sync() == 2
+
+    master.write_text(cdr_line(3, disposition="NO ANSWER"))
+    assert tail.sync() == 1
+    # Same size or larger, but other lines
+    master.write_text(cdr_line(5) + cdr_line(6) + cdr_line(7))
+    assert tail.sync() == 3
+    assert tail.index.count(True) == 5 and tail.index.count(False) == 1
+
+
+def test_views_do_not_sync_twice(tmp_path):
+    master = tmp_path / "Master.csv"
+    master.write_text(cdr_line(1) + cdr_line(2, disposition="NO ANSWER"))
+    monitor = CallMonitor("pbx", 22, "admin", "secret", cdr_path=str(master))
+    monitor.client = LocalClient(delay=0.1)
+    results = []
+    views = [threading.Thread(target=lambda answered=answered: results.append(monitor.read_cdr(answered)))
+             for answered in (True, False)]
+    for view in views:
+        view.start()
+    for view in views:
+        view.join()
+    assert sorted(len(rows) for rows, today in results) == [1, 1]
@@ -0,0 +1,62 @@
+import pytest
+
+from channel_filter import ChannelFilter, peer_of
+from monitor import CallMonitor
+
+
+def test_matches():
+    channel_filter = ChannelFilter(trunks=["SIP/trunk"], contexts=["from-trunk"],
+                                   exclude_extensions=["100-199", "555"], min_number_length=7)
+    assert channel_filter.matches("SIP/trunk-00000001", "from-trunk", "79001112233")
+    assert not channel_filter.matches("SIP/101-00000001", "from-trunk", "79001112233")
+    assert not channel_filter.matches("SIP/trunk-00000001", "ext-local", "79001112233")
+    assert channel_filter.matches("SIP/trunk-00000001", None, "79001112233")  # context unknown
+    assert not channel_filter.matches("SIP/trunk-00000001", "from-trunk", "150")
+    assert not channel_filter.matches("SIP/trunk-00000001", "from-trunk", "12345")
+
+
+def test_excluded_extensions():
+    channel_filter = ChannelFilter(exclude_extensions="100-199, 555")
+    assert not channel_filter.matches("SIP/150-00000001")
+    assert not channel_filter.matches("SIP/555-00000001")
+    assert channel_filter.matches("SIP/200-00000001")
+    assert peer_of("PJSIP/provider-00000001") == "provider"
+
+
+def test_commands():
+    channel_filter = ChannelFilter(trunks=["SIP/trunk", "PJSIP/provider"], contexts=["from-trunk"])
+    # The contexts are not sent to the PBX: a call moves on to other contexts
+    assert channel_filter.grep_pattern() == "^(SIP/trunk|PJSIP/provider)"
+    assert channel_filter.command().endswith("| grep -E '^(SIP/trunk|PJSIP/provider)' || true")
+    assert channel_filter.ami_filter() == "Channel: (SIP/trunk|PJSIP/provider)"
+    assert ChannelFilter(contexts=["from-trunk"]).ami_filter() is None
+    assert ChannelFilter(min_number_length=7).command() == ChannelFilter().command()
+
+
+def test_call_is_followed_into_other_contexts():
+    monitor = CallMonitor("pbx", 22, "admin", "secret",
+                          channel_filter=ChannelFilter(contexts=["from-trunk"]))
+    line = "SIP/trunk-00000001!{context}!s!1!{state}!Queue!support!79001112233!!!3!5!!1713340800.1\n"
+    other = "SIP/101-00000002!ext-local!79001112233!1!Ring!Dial!SIP/101!101!!!3!5!!1713340800.2\n"
+    assert list(monitor.rows_from_concise(line.format(context="from-trunk", state="Ring") + other)) == ["1713340800.1"]
+    for _ in range(3):
+        rows = monitor.rows_from_concise(line.format(context="ext-queues", state="Up") + other)
+        assert list(rows) == ["1713340800.1"]
+    assert monitor.calls.pop_ended() == []
+    assert monitor.calls.get("1713340800.1").answered_at is not None
+
+
+def test_cdr_destination_context():
+    channel_filter = ChannelFilter(trunks=["SIP/trunk"], contexts=["from-trunk"])
+    record = ("2024-04-17 10:00:00", "79001112233", "100", "", "SIP/trunk-00000001", 60, 55,
+              "ANSWERED", 1, "1713340800.1", "from-trunk")
+    assert channel_filter.matches_cdr(record)
+    assert not channel_filter.matches_cdr(record[:10] + ("ext-local",))
+
+
+def test_names_are_checked():
+    with pytest.raises(ValueError):
+        ChannelFilter(trunks=["SIP/trunk'; reboot"])
+    assert ChannelFilter.from_config({}) is None
+    assert ChannelFilter.from_config({"trunks": []}) is None
+    assert ChannelFilter.from_config({"trunks": ["SIP/trunk"]}).trunks == ("SIP/trunk",)
@@ -0,0 +1,40 @@
+from channel_parser import format_duration, parse_concise, parse_duration, parse_verbose, pick_number
+from tools.synthetic_channels import make_channels, verbose_dump
+
+
+def test_concise_line():
+    output = ("SIP/trunk-0000002a!from-trunk!s!1!Ring!Dial!SIP/101,30,tT!79001112233!!!3!42!bridge-1!1713340800.7\n"
+              "No such command\n")
+    [chan] = parse_concise(output)
+    assert chan.channel == "SIP/trunk-0000002a"
+    assert chan.context == "from-trunk"
+    assert chan.state == "Ring"
+    assert chan.application == "Dial"
+    assert chan.number == "79001112233"
+    assert chan.duration == 42
+    assert chan.bridge == "bridge-1"
+    assert chan.key == "1713340800.7"
+
+
+def test_concise_data_with_separator():
+    output = "SIP/101-00000001!ext-local!89001112233!1!Up!Dial!a!b!c!101!!!3!10!!1713340800.1\n"
+    [chan] = parse_concise(output)
+    assert chan.application == "Dial"
+    assert chan.callerid == "101"
+    assert chan.number == "89001112233"  # the short caller id falls back to the extension
+    assert chan.duration == 10
+
+
+def test_verbose_matches_concise():
+    channels = make_channels(20)
+    parsed = parse_verbose(verbose_dump(channels))
+    assert [chan.channel for chan in parsed] == [channel[0] for channel in channels]
+    assert [chan.duration for chan in parsed] == [channel[4] for channel in channels]
+
+
+def test_numbers_and_durations():
+    assert pick_number("101", "s") is None
+    assert pick_number("79001112233", "s") == "79001112233"
+    assert pick_number("101", "1234567", min_length=7) == "1234567"
+    assert format_duration(3725) == "01:02:05"
+    assert parse_duration("01:02:05") == 3725
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from config_store import SECRET_PREFIX, ConfigError, ConfigStore, profile, validate
+
+
+def test_valid_config():
+    validate({"host": "10.0.0.1", "port": 22, "poll_interval": 2.5, "filter": {"trunks": ["SIP/trunk"]},
+              "profiles": {"lab": {"host": "192.168.1.5", "use_agent": True}}, "profile": "lab"})
+    validate({"poll_jitter": 0, "queues": True,
+              "contacts": {"csv": "phonebook.csv", "sqlite": "crm.sqlite",
+                           "http": {"url": "https://crm/{number}", "headers": {"Authorization": "enc:x"}}},
+              "notifications": {"desktop": False, "email": {"to": ["a@example.com"], "tls": None},
+                                "sms": {"to": "+79001112233", "line": 2, "min_interval": 600}}})
+
+
+@pytest.mark.parametrize("config, error", [
+    ({"hots": "x"}, "hots: unknown setting"),
+    ({"port": "22"}, "port: expected int, got str"),
+    ({"port": 70000}, "port: 70000 is not a port number"),
+    ({"use_agent": 1}, "use_agent: expected bool, got int"),
+    ({"poll_interval": 0}, "poll_interval: must be greater than 0"),
+    ({"profile": "lab", "profiles": {}}, "profile: no profile named 'lab'"),
+    ({"profiles": {"lab": {"language": "en"}}}, "profiles.lab.language: unknown setting"),
+    ({"filter": {"min_number_length": "7"}}, "filter.min_number_length: expected int, got str"),
+    ({"filter": {"trunks": ["SIP/trunk; rm"]}}, "filter: Invalid trunk: 'SIP/trunk; rm'"),
+    ({"filter": {"contexts": ["from-trunk", 3]}}, "filter.contexts: expected a list of strings"),
+    ({"profiles": {"lab": {"filter": {"trunk": "SIP/x"}}}}, "profiles.lab.filter.trunk: unknown setting"),
+    ({"poll_jitter": 1}, "poll_jitter: must be 0 or more and less than 1"),
+    ({"poll_jitter": -0.1}, "poll_jitter: must be 0 or more and less than 1"),
+    ({"contacts": {"sqlite": {"path": "crm.sqlite", "sql": "SELECT 1"}}}, "contacts.sqlite.sql: unknown setting"),
+    ({"contacts": {"http": {"url": "https://crm", "timeout": "3"}}}, "contacts.http.timeout: expected int or float"),
+    ({"contacts": {"ttl": 0}}, "contacts.ttl: must be greater than 0"),
+    ({"notifications": {"email": {"to": "a@example.com", "port": 25}}}, "notifications.email.port: unknown setting"),
+    ({"notifications": {"webhook": "https://hook"}}, "notifications.webhook: expected dict, got str"),
+])
+def test_invalid_config(config, error):
+    with pytest.raises(ConfigError, match=error.replace("(", r"\(").replace(")", r"\)")):
+        validate(config)
+
+
+def test_profile_overrides_top_level():
+    config = {"host": "a", "username": "admin", "profile": "lab", "profiles": {"lab": {"host": "b"}}}
+    assert profile(config) == {"host": "b", "username": "admin"}
+    assert profile(config, "other") == {"host": "a", "username": "admin"}
+
+
+def test_secrets_are_saved_encrypted(tmp_path):
+    store = ConfigStore(tmp_path / "config.json")
+    saved = store.save({"password": "ssh-pass", "profiles": {"lab": {"ami_secret": "ami-pass"}},
+                        "notifications": {"email": {"to": "me@example.com", "password": "mail-pass"},
+                                          "webhook": {"url": "http://hook", "headers": {"Authorization": "Bearer t"}}},
+                        "contacts": {"http": {"url": "http://lookup", "headers": {"X-Key": "key"}}}})
+    text = (tmp_path / "config.json").read_text(encoding="utf-8")
+    for secret in ("ssh-pass", "ami-pass", "mail-pass", "Bearer t", '"key"'):
+        assert secret not in text
+    loaded = store.load()
+    assert loaded == saved
+    assert loaded["password"].startswith(SECRET_PREFIX)
+    assert store.reveal(loaded["password"]) == "ssh-pass"
+    assert store.reveal(loaded["profiles"]["lab"]["ami_secret"]) == "ami-pass"
+    assert store.reveal(loaded["notifications"]["email"]["password"]) == "mail-pass"
+    assert store.reveal(loaded["contacts"]["http"]["headers"]["X-Key"]) == "key"
+    assert store.save(loaded) == loaded  # encrypted values are not encrypted twice
+
+
+def test_broken_file(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text("{not json", encoding="utf-8")
+    store = ConfigStore(path)
+    with pytest.raises(ConfigError, match="not valid JSON"):
+        store.load()
+    broken = store.keep_broken()
+    assert broken.read_text(encoding="utf-8") == "{not json"
+    assert store.load() == {}
+    path.write_text(json.dumps({"port": "22"}), encoding="utf-8")
+    assert store.changed()
+    with pytest.raises(ConfigError):
+        store.load()
@@ -0,0 +1,78 @@
+import threading
+import time
+
+from contacts import ContactResolver, CsvPhonebook, LruCache, number_key
+
+
+class CountingSource:
+    def __init__(self, names):
+        self.names = names
+        self.lookups = []
+
+    def lookup(self, key):
+        self.lookups.append(key)
+        return self.names.get(key)
+
+
+def test_number_key():
+    assert number_key("+7 916 123-45-67") == number_key("89161234567") == "9161234567"
+    assert number_key("anonymous") == ""
+
+
+def test_cache_evicts_the_least_recently_used():
+    cache = LruCache(size=2, clock=lambda: 0.0)
+    cache.put("a", "Alice")
+    cache.put("b", "Bob")
+    assert cache.get("a") == (True, "Alice")
+    cache.put("c", "Carol")
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, "Alice") and cache.get("c") == (True, "Carol")
+    assert len(cache) == 2
+
+
+def test_cache_entries_expire():
+    now = [0.0]
+    cache = LruCache(ttl=100, negative_ttl=10, clock=lambda: now[0])
+    cache.put("known", "Alice")
+    cache.put("unknown", None)
+    now[0] = 9.0
+    assert cache.get("unknown") == (True, None)
+    now[0] = 10.0
+    assert cache.get("unknown") == (False, None)
+    assert cache.get("known") == (True, "Alice")
+    now[0] = 100.0
+    assert cache.get("known") == (False, None)
+    assert len(cache) == 0
+
+
+def test_resolver_looks_a_number_up_once():
+    source = CountingSource({"9161234567": "Ivan Petrov"})
+    resolved = threading.Event()
+    resolver = ContactResolver([source], on_resolved=lambda number: resolved.set())
+    try:
+        assert resolver.name("89161234567") is None  # never waits for the lookup
+        assert resolved.wait(2)
+        assert resolver.label("+79161234567") == "+79161234567 (Ivan Petrov)"
+        # A number without a name is cached too
+        assert resolver.name("74950000000") is None
+        deadline = time.monotonic() + 2
+        while not resolver.cache.get("4950000000")[0]:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        assert resolver.name("84950000000") is None
+        assert source.lookups == ["9161234567", "4950000000"]
+    finally:
+        resolver.close()
+
+
+def test_sources_are_asked_in_order(tmp_path):
+    phonebook = tmp_path / "phonebook.csv"
+    phonebook.write_text("name,number\nIvan Petrov,+7 916 123-45-67;84950001122\n", encoding="utf-8")
+    fallback = CountingSource({"4950001122": "Office", "9990001122": "Other"})
+    resolver = ContactResolver([CsvPhonebook(str(phonebook)), fallback])
+    try:
+        assert resolver.resolve("74950001122") == "Ivan Petrov"
+        assert resolver.resolve("79990001122") == "Other"
+        assert fallback.lookups == ["9990001122"]
+    finally:
+        resolver.close()
@@ -0,0 +1,57 @@
+import time
+
+from call_store import ANSWERED, MISSED
+from history import CallHistory
+from metrics import Metrics
+
+
+def row(start, number="79001112233", outcome=ANSWERED, server="pbx"):
+    return (start, server, "1713340800.1", "SIP/trunk-00000001", number, 3.0, 40.0, 43.0, outcome)
+
+
+def test_rows_are_written_in_batches(tmp_path):
+    metrics = Metrics()
+    history = CallHistory(tmp_path / "history.sqlite", batch_size=100, flush_interval=5.0, metrics=metrics)
+    try:
+        history.add_rows(row(f"2024-04-17 10:{i // 60:02d}:{i % 60:02d}") for i in range(250))
+        assert history.flush(5)
+        assert history.written == 250
+        # 100 + 100 + the 50 that flush() did not wait for any longer
+        assert metrics.histograms["history.write"].count == 3
+        assert metrics.counters["history.rows"] == 250
+    finally:
+        history.close()
+
+
+def test_rows_arriving_together_share_a_transaction(tmp_path):
+    metrics = Metrics()
+    history = CallHistory(tmp_path / "history.sqlite", flush_interval=0.3, metrics=metrics)
+    try:
+        for second in range(3):
+            history.add_rows([row(f"2024-04-17 10:00:0{second}")])
+            time.sleep(0.05)
+        deadline = time.monotonic() + 5
+        while history.written < 3:
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+        assert metrics.histograms["history.write"].count == 1
+    finally:
+        history.close()
+
+
+def test_close_writes_what_is_queued(tmp_path):
+    filename = tmp_path / "history.sqlite"
+    history = CallHistory(filename, flush_interval=10.0)
+    history.add_rows([row("2024-04-16 09:00:00"), row("2024-04-17 10:00:00", outcome=MISSED),
+                      row("2024-04-17 11:00:00", number="79004445566")])
+    history.close()
+
+    history = CallHistory(filename)
+    try:
+        assert history.count(True) == 2 and history.count(False) == 1
+        assert history.count(True, day="2024-04-17") == 1
+        assert [call[0] for call in history.for_number("79001112233")] == ["2024-04-17 10:00:00",
+                                                                          "2024-04-16 09:00:00"]
+        assert history.calls(True, server="other") == []
+    finally:
+        history.close()
@@ -0,0 +1,115 @@
+import json
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from live_feed import FeedReader, FeedServer, LiveFeed, is_loopback
+from metrics import Metrics
+
+
+def decode(data):
+    """(kind, data, id) of an encoded event."""
+    fields = dict(line.split(": ", 1) for line in data.decode("utf-8").strip().split("\n"))
+    return fields["event"], json.loads(fields["data"]), fields.get("id")
+
+
+def row(number, status="Ring"):
+    return ("SIP/trunk-00000001", number, "00:01", status)
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_client_resumes_after_the_last_event_id():
+    feed = LiveFeed()
+    feed.publish("pbx", {"a": row("79001112233")}, {})
+    kind, snapshot, last_id = decode(feed.next_event(feed.subscribe()))
+    assert kind == "snapshot" and last_id == f"{snapshot['run']}:{snapshot['seq']}"
+
+    feed.publish("pbx", {"a": row("79001112233", "Up")}, {})
+    feed.publish("pbx", {"a": row("79001112233", "Up"), "b": row("79004445566")}, {})
+    subscriber = feed.subscribe(last_id)
+    events = [decode(feed.next_event(subscriber, 0)) for _ in range(3)]
+    assert [kind for kind, _, _ in events] == ["resume", "delta", "delta"]
+    assert events[0][1] == {"run": snapshot["run"], "seq": snapshot["seq"]}
+    assert [data["seq"] for _, data, _ in events[1:]] == [snapshot["seq"] + 1, snapshot["seq"] + 2]
+    assert feed.next_event(subscriber, 0) is None
+
+    # An id of another run (the server restarted) gets a snapshot
+    kind, _, _ = decode(feed.next_event(feed.subscribe("other:1"), 0))
+    assert kind == "snapshot"
+
+
+def test_slow_client_is_resynced():
+    metrics = Metrics()
+    feed = LiveFeed(max_queue=2, metrics=metrics)
+    subscriber = feed.subscribe()
+    assert decode(feed.next_event(subscriber, 0))[0] == "snapshot"
+    for second in range(3):
+        feed.publish("pbx", {"a": row("79001112233", f"Up {second}")}, {})
+    kind, snapshot, _ = decode(feed.next_event(subscriber, 0))
+    assert kind == "snapshot" and list(snapshot["sources"]["pbx"].values())[0][2] == "Up 2"
+    assert subscriber.dropped == 2 and metrics.counters["feed.resyncs"] == 1
+    assert feed.next_event(subscriber, 0) is None
+
+
+def test_reader_follows_the_server():
+    metrics = Metrics()
+    feed = LiveFeed(metrics=metrics)
+    feed.publish("pbx", {"a": row("79001112233")}, {})
+    server = FeedServer(feed, port=0, heartbeat=0.2).start()
+    reader = FeedReader(server.url, retry=0.1)
+    try:
+        assert reader.start(wait=5)
+        assert [row[1] for row in reader.rows()["pbx"].values()] == ["79001112233"]
+        feed.publish("pbx", {"a": row("79001112233", "Up"), "b": row("79004445566")}, {})
+        wait_until(lambda: len(reader.rows().get("pbx", {})) == 2)
+        feed.set_status("pbx", False, "timeout")
+        wait_until(lambda: reader.status.get("pbx", {}).get("error") == "timeout")
+
+        # The stream drops: the reader connects again and only gets what it missed
+        feed.close()
+        feed.publish("pbx", {"b": row("79004445566", "Up")}, {})
+        wait_until(lambda: list(reader.rows()["pbx"].values()) == [["SIP/trunk-00000001", "79004445566", "Up",
+                                                                    None, 0]])
+        assert metrics.counters["feed.clients"] == 2 and metrics.counters["feed.snapshots"] == 1
+    finally:
+        reader.stop()
+        server.stop()
+
+
+def test_network_address_needs_a_token():
+    assert is_loopback("127.0.0.1") and is_loopback("::1") and is_loopback("localhost")
+    assert not is_loopback("0.0.0.0") and not is_loopback("pbx.example.com")
+    with pytest.raises(ValueError, match="needs a token"):
+        FeedServer(LiveFeed(), "0.0.0.0", 0)
+
+    feed = LiveFeed()
+    feed.publish("pbx", {"a": row("79001112233")}, {})
+    server = FeedServer(feed, port=0, token="s3cret").start()
+    try:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{server.url}/snapshot", timeout=5)
+        assert error.value.code == 401
+        request = urllib.request.Request(f"{server.url}/snapshot", headers={"Authorization": "Bearer wrong"})
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(request, timeout=5)
+
+        reader = FeedReader(server.url, retry=0.1)
+        assert not reader.start(wait=1)
+        assert "401" in reader.error
+        reader.stop()
+        reader = FeedReader(server.url, retry=0.1, token="s3cret")
+        try:
+            assert reader.start(wait=5)
+            assert len(reader.rows()["pbx"]) == 1
+        finally:
+            reader.stop()
+    finally:
+        server.stop()
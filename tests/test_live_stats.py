@@ -0,0 +1,73 @@
+from call_store import ANSWERED, MISSED
+from live_stats import CALLS, LiveStats, SlidingWindow
+
+
+class Record:
+    def __init__(self, number, outcome, ring=5.0, talk=30.0):
+        self.number = number
+        self.outcome = outcome
+        self.ring_at = 0.0
+        self.ring = ring
+        self.talk = talk
+
+    def ring_time(self):
+        return self.ring
+
+    def talk_time(self):
+        return self.talk
+
+
+def test_window_drops_old_buckets():
+    window = SlidingWindow(60)
+    window.add(1000.0, CALLS)
+    window.add(1030.5, CALLS, 2)
+    assert window.summary(1059.0)["calls"] == 3
+    assert window.summary(1061.0)["calls"] == 2
+    assert window.summary(1091.0)["calls"] == 0
+    assert not window.buckets and window.totals[CALLS] == 0
+    # An event older than the newest bucket is counted in it, not lost
+    window.add(1100.0, CALLS)
+    window.add(1099.0, CALLS)
+    assert window.summary(1100.0)["calls"] == 2
+
+
+def test_windows_and_totals():
+    now = [0.0]
+    stats = LiveStats(windows=(60, 900), clock=lambda: now[0])
+    stats.call_started(2)
+    stats.call_ended(Record("79001112233", ANSWERED, ring=4.0))
+    stats.call_ended(Record("79004445566", MISSED, ring=10.0))
+    now[0] = 120.0
+    stats.call_started()
+    stats.call_ended(Record("79001112233", ANSWERED, ring=6.0))
+
+    snapshot = stats.snapshot()
+    assert snapshot["calls"] == 3 and snapshot["answered"] == 2 and snapshot["missed"] == 1
+    assert snapshot["avg_ring_time"] == 20.0 / 3
+    minute, quarter = snapshot["windows"][60], snapshot["windows"][900]
+    assert minute["calls"] == 1 and minute["answered"] == 1 and minute["missed"] == 0
+    assert minute["avg_ring_time"] == 6.0
+    assert quarter["calls"] == 3 and quarter["answer_rate"] == 2 / 3
+
+    now[0] = 1100.0
+    assert stats.snapshot()["windows"][900]["calls"] == 0
+    assert stats.snapshot()["calls"] == 3
+
+
+def test_numbers_keep_the_most_recent():
+    stats = LiveStats(max_numbers=2, clock=lambda: 0.0)
+    stats.call_ended(Record("1001", ANSWERED))
+    stats.call_ended(Record("1002", MISSED))
+    stats.call_ended(Record("1001", ANSWERED))
+    stats.call_ended(Record("1003", ANSWERED))
+    assert stats.number("1002") is None
+    assert stats.number("1001").calls == 2 and stats.number("1001").talk_total == 60.0
+    assert [number for number, _ in stats.top_numbers(1)] == ["1001"]
+
+
+def test_peak_over_servers():
+    stats = LiveStats()
+    stats.set_active("a", 2)
+    stats.set_active("b", 3)
+    stats.set_active("a", 0)
+    assert stats.snapshot()["active"] == 3 and stats.snapshot()["peak"] == 5
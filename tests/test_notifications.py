@@ -0,0 +1,53 @@
+import time
+
+from call_store import CallStore
+from metrics import Metrics
+from notifications import notifier_from_config, summary
+from tools.fake_smtp import FakeSmtpServer
+
+
+def ringing_calls(count):
+    store = CallStore()
+    for index in range(count):
+        store.update(f"call-{index}", number=f"7900111{index:04d}", status="Ring")
+    return store.pop_ringing()
+
+
+def test_burst_is_one_email_and_one_popup():
+    server = FakeSmtpServer().start()
+    popups = []
+    metrics = Metrics()
+    notifier = notifier_from_config(
+        {"desktop": {"batch_window": 0.2},
+         "email": {"to": "ops@example.com", "smtp_server": "127.0.0.1", "smtp_port": server.port, "tls": None,
+                   "sender": "pbx@example.com", "batch_window": 0.2, "min_interval": 60}},
+        show=lambda title, lines: popups.append((title, lines)), metrics=metrics, title="Incoming call")
+    try:
+        for record in ringing_calls(50):
+            notifier.notify("pbx", record)
+        assert server.wait_for(1)
+        [(sender, recipients, text)] = server.messages
+        assert (sender, recipients) == ("pbx@example.com", ["ops@example.com"])
+        assert "Subject: Incoming call (50)" in text
+        assert all(f"7900111{index:04d}" in text for index in range(50))
+        [(title, lines)] = popups
+        assert title == "Incoming call (50)"
+        assert len(lines) == 21 and lines[-1] == "... +30"
+
+        # The next call waits for min_interval, unless the notifier is flushed
+        notifier.notify("pbx", ringing_calls(1)[0])
+        time.sleep(0.5)
+        assert len(server.messages) == 1
+        assert notifier.flush(timeout=5)
+        assert len(server.messages) == 2
+        assert metrics.snapshot()["counters"]["notify.sent"] == 102  # 51 calls to both sinks
+    finally:
+        notifier.close()
+        server.stop()
+
+
+def test_summary_lines():
+    events = [{"time": "2024-04-17 10:00:05", "number": "79001112233", "name": "Ivan", "server": "pbx"},
+              {"time": "2024-04-17 10:00:06", "number": "79004445566", "name": None, "server": ""}]
+    assert summary(events) == ["10:00:05  79001112233  Ivan  (pbx)", "10:00:06  79004445566"]
+    assert summary(events, limit=1) == ["10:00:05  79001112233  Ivan  (pbx)", "... +1"]
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from poll_scheduler import ACTIVE, ERROR, IDLE, RINGING, PollScheduler
+
+
+def test_delay_follows_the_activity():
+    scheduler = PollScheduler(None, interval=3.0, fast_interval=1.0, idle_interval=10.0, jitter=0)
+    assert scheduler.next_delay(RINGING) == 1.0
+    assert scheduler.next_delay(ACTIVE) == 3.0
+    assert scheduler.next_delay(IDLE) == 10.0
+
+
+def test_backoff_while_failing():
+    scheduler = PollScheduler(None, interval=3.0, jitter=0, max_backoff=20.0)
+    assert [scheduler.next_delay(ERROR) for _ in range(4)] == [6.0, 12.0, 20.0, 20.0]
+    # The first poll that works resets the backoff
+    assert scheduler.next_delay(ACTIVE) == 3.0
+    assert scheduler.next_delay(ERROR) == 6.0
+
+
+def test_jitter_stays_in_range():
+    scheduler = PollScheduler(None, interval=3.0, jitter=0.1)
+    delays = [scheduler.next_delay(ACTIVE) for _ in range(200)]
+    assert all(2.7 <= delay <= 3.3 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_pause_resume_and_poll_now():
+    polls = []
+    polled = threading.Event()
+
+    def poll():
+        polls.append(time.monotonic())
+        polled.set()
+        return IDLE
+
+    scheduler = PollScheduler(poll, idle_interval=60.0, jitter=0).start()
+    try:
+        assert polled.wait(2)
+        # The long idle wait is cut short
+        polled.clear()
+        scheduler.poll_now()
+        assert polled.wait(2)
+        assert len(polls) == 2
+
+        scheduler.pause()
+        assert scheduler.paused
+        polled.clear()
+        scheduler.poll_now()
+        assert not polled.wait(0.3)
+
+        scheduler.resume()
+        assert polled.wait(2)
+        assert not scheduler.paused
+    finally:
+        scheduler.stop()
+    scheduler._thread.join(2)
+    assert not scheduler._thread.is_alive()
+
+
+def test_failing_poll_counts_as_error(capsys):
+    def poll():
+        raise RuntimeError("boom")
+
+    scheduler = PollScheduler(poll, interval=1.0, jitter=0, max_backoff=30.0).start()
+    try:
+        deadline = time.monotonic() + 2
+        while scheduler.last_delay is None:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        assert scheduler.errors == 1 and scheduler.last_delay == 2.0
+    finally:
+        scheduler.stop()
+    assert "RuntimeError: boom" in capsys.readouterr().err
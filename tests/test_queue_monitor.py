@@ -0,0 +1,67 @@
+from queue_monitor import BUSY, FREE, OFFLINE, PAUSED, QueueBoard, parse_queue_show
+
+QUEUE_SHOW = """\
+support          has 2 calls (max unlimited) in 'rrmemory' strategy (12s holdtime, 95s talktime), W:0, C:40, A:3, SL:75.0% within 30s
+   Members: 
+      Alice (SIP/101 from hint:101@ext-local) (ringinuse disabled) (dynamic) (Not in use) has taken 5 calls (last was 60 secs ago)
+      SIP/102 (ringinuse enabled) (In use) (paused) has taken no calls yet
+      SIP/103 (Unavailable) has taken 1 call (last was 600 secs ago)
+   Callers: 
+      1. SIP/trunk-00000001 (wait: 1:02:03, prio: 0)
+      2. SIP/trunk-00000002 (wait: 0:45, prio: 0)
+
+sales            has 0 calls (max unlimited) in 'ringall' strategy (0s holdtime, 0s talktime), W:0, C:0, A:0, SL:0.0% within 0s
+   No Members
+   No Callers
+"""
+
+
+def test_parse_queue_show():
+    support, sales = parse_queue_show(QUEUE_SHOW)
+    assert (support["name"], support["strategy"], support["answered"], support["abandoned"]) == ("support", "rrmemory", 40, 3)
+    assert support["service_level"] == 0.75 and support["sla"] == 30
+    assert [(agent["interface"], agent["name"], agent["status"], agent["paused"], agent["calls"])
+            for agent in support["agents"]] == [("SIP/101", "Alice", FREE, False, 5),
+                                                 ("SIP/102", "SIP/102", BUSY, True, 0),
+                                                 ("SIP/103", "SIP/103", OFFLINE, False, 1)]
+    assert support["callers"] == [("SIP/trunk-00000001", 3723), ("SIP/trunk-00000002", 45)]
+    assert sales["agents"] == [] and sales["callers"] == [] and sales["sla"] == 0
+
+
+def test_update_from_show():
+    now = [1000.0]
+    board = QueueBoard(sla=20, clock=lambda: now[0])
+    board.update_from_show("pbx", parse_queue_show(QUEUE_SHOW))
+    assert board.pop_changed() == {("pbx", "support"), ("pbx", "sales")}
+    support = board.stats(("pbx", "support"))
+    assert support["agents"] == {FREE: 1, BUSY: 0, PAUSED: 1, OFFLINE: 1}
+    assert support["waiting"] == 2 and support["over_sla"] == 2 and support["longest_wait"] == 3723
+    assert board.stats(("pbx", "sales"))["sla"] == 20  # "within 0s": no servicelevel set on the queue
+    # The same output again changes nothing, and the callers keep their join times
+    now[0] += 10
+    board.update_from_show("pbx", parse_queue_show(QUEUE_SHOW))
+    assert board.pop_changed() == set()
+    assert board.stats(("pbx", "support"))["longest_wait"] == 3733
+    board.update_from_show("pbx", [])
+    assert board.pop_changed() == {("pbx", "support"), ("pbx", "sales")}
+    assert board.keys() == []
+
+
+def test_ami_events():
+    now = [0.0]
+    board = QueueBoard(sla=20, clock=lambda: now[0])
+    board.handle_event("pbx", {"Event": "QueueParams", "Queue": "support", "ServiceLevel": "0", "Completed": "4",
+                               "Abandoned": "1", "ServicelevelPerf": "50.0"})
+    board.handle_event("pbx", {"Event": "QueueMemberAdded", "Queue": "support", "Interface": "SIP/101",
+                               "MemberName": "Alice", "Status": "1", "Paused": "0", "CallsTaken": "2"})
+    board.handle_event("pbx", {"Event": "QueueCallerJoin", "Queue": "support", "Uniqueid": "1.1"})
+    now[0] = 25.0
+    key = ("pbx", "support")
+    stats = board.stats(key)
+    assert stats["sla"] == 20 and stats["over_sla"] == 1 and stats["service_level"] == 0.5
+    board.handle_event("pbx", {"Event": "AgentConnect", "Queue": "support", "Uniqueid": "1.1", "HoldTime": "25"})
+    board.handle_event("pbx", {"Event": "QueueMemberStatus", "Queue": "support", "Interface": "SIP/101", "Status": "2"})
+    stats = board.stats(key)
+    assert stats["waiting"] == 0 and stats["answered"] == 5 and stats["service_level"] == 0.4
+    assert board.agents(key) == [("SIP/101", "Alice", BUSY, 0)]
+    assert board.pop_changed() == {key}
@@ -0,0 +1,48 @@
+from snapshots import SnapshotMirror, SnapshotStream, diff_snapshots, merge_sources
+
+
+def test_diff_snapshots():
+    added, changed, removed = diff_snapshots({"a": (1,), "b": (2,)}, {"b": (3,), "c": (4,)})
+    assert added == {"c": (4,)}
+    assert changed == {"b": (3,)}
+    assert removed == ["a"]
+
+
+def test_merge_sources_counts_durations():
+    merged = merge_sources({"pbx": {"k": ("SIP/1", "79", "00:00:00", "Up")}}, {"pbx": {"k": 10.0}}, now=75.0)
+    assert merged == {"pbx|k": ("pbx", "SIP/1", "79", "00:01:05", "Up")}
+
+
+def test_stream_ids_and_deltas():
+    stream = SnapshotStream()
+    first = stream.update("pbx", {"a": ["row a"]})
+    assert first["seq"] == 1
+    [a_id] = first["added"]
+    assert stream.update("pbx", {"a": ["row a"]}) is None
+    second = stream.update("pbx", {"a": ["row a2"], "b": ["row b"]})
+    assert second["changed"] == {a_id: ["row a2"]}
+    stream.update("pbx", {"b": ["row b"]})
+    back = stream.update("pbx", {"a": ["row a"], "b": ["row b"]})
+    assert list(back["added"]) != [a_id]  # a key that comes back is a new call
+
+
+def test_mirror_follows_the_stream():
+    stream = SnapshotStream()
+    mirror = SnapshotMirror()
+    assert not mirror.apply(stream.update("pbx", {"a": [1]}))  # no snapshot yet
+    mirror.load(stream.snapshot())
+    for rows in ({"a": [2]}, {"a": [2], "b": [3]}, {"b": [4]}):
+        assert mirror.apply(stream.update("pbx", rows))
+    assert mirror.sources == stream.snapshot()["sources"]
+    stream.update("pbx", {})
+    assert not mirror.apply(stream.update("pbx", {"c": [5]}))  # one delta was missed
+
+
+def test_since_backlog():
+    stream = SnapshotStream(backlog=2)
+    for value in range(4):
+        stream.update("pbx", {"a": [value]})
+    assert [delta["seq"] for delta in stream.since(stream.run, 2)] == [3, 4]
+    assert stream.since(stream.run, 4) == []
+    assert stream.since(stream.run, 1) is None
+    assert stream.since("other run", 3) is None
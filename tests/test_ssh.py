@@ -0,0 +1,54 @@
+import pytest
+
+from monitor import CallMonitor
+from poll_scheduler import ACTIVE, RINGING
+from ssh_connection import SshConnection, SshUnavailable
+from tools.fake_ssh import FakeSshServer, asterisk_responder
+
+
+class CountingMonitor(CallMonitor):
+    def __init__(self, *args, **options):
+        super().__init__(*args, **options)
+        self.connects = 0
+        self.rows = None
+
+    def on_connected(self):
+        self.connects += 1
+
+    def on_calls(self, rows, polled_at):
+        self.rows = rows
+
+
+def test_ssh_poll_survives_a_dropped_connection():
+    server = FakeSshServer(asterisk_responder(6), username="admin", password="secret").start()
+    monitor = CountingMonitor("127.0.0.1", server.port, "admin", "secret")
+    try:
+        assert monitor.connect()
+        assert monitor.poll() in (ACTIVE, RINGING)
+        assert len(monitor.rows) == 6
+
+        server.drop_connections()
+        assert monitor.poll() in (ACTIVE, RINGING)  # reconnected within the same poll
+        assert len(monitor.rows) == 6
+        assert server.connections == 2
+        assert monitor.client.reconnects == 1
+        assert monitor.connects == 2
+        assert monitor.calls.pop_ended() == []  # the calls were not lost with the connection
+    finally:
+        monitor.stop()
+        server.stop()
+
+
+def test_ssh_backs_off_while_the_server_is_down():
+    server = FakeSshServer(asterisk_responder(1)).start()
+    connection = SshConnection("127.0.0.1", server.port, "admin", "secret", timeout=2, min_backoff=30)
+    try:
+        connection.connect()
+        server.stop()
+        with pytest.raises(Exception):
+            connection.run("asterisk -rx 'core show channels concise'")
+        # The next attempt waits for the backoff instead of connecting again right away
+        with pytest.raises(SshUnavailable, match="retry in"):
+            connection.run("asterisk -rx 'core show channels concise'")
+    finally:
+        connection.close()
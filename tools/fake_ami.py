@@ -0,0 +1,261 @@
+"""
+Local fake AMI server for trying the monitor without a real PBX.
+
+Run it with:  python -m tools.fake_ami --port 5038
+and put "ami_port": 5038 into config.json (host 127.0.0.1, any login).
+"""
+
+import argparse
+import random
+import re
+import socket
+import threading
+import time
+
+from channel_parser import format_duration
+
+
+class FakeAmiServer:
+    def __init__(self, host="127.0.0.1", port=0, username=None, secret=None):
+        self.username = username
+        self.secret = secret
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen()
+        self.host, self.port = self.server.getsockname()
+        self.clients = []
+        self.filters = {}  # connection -> regexes of its Filter actions
+        self.channels = {}  # uniqueid -> (channel, number, state, started, context)
+        self.queues = {}  # queue -> {"members": {interface: [name, status, paused]}, "callers": {uniqueid: (channel, joined)}}
+        self.lock = threading.Lock()
+        self.running = False
+        self.silent = False  # stop answering without closing, like a connection dropped by a NAT
+        self.allow_filters = True  # False answers Filter with "Permission denied"
+        self._next_id = 1
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.running = False
+        try:
+            self.server.shutdown(socket.SHUT_RDWR)  # wakes the accept() of the other thread
+        except OSError:
+            pass
+        self.server.close()
+        with self.lock:
+            for conn in self.clients:
+                try:
+                    conn.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                conn.close()
+            self.clients.clear()
+
+    def emit(self, event, **fields):
+        if self.silent:
+            return
+        data = _encode({"Event": event, **fields})
+        with self.lock:
+            for conn in list(self.clients):
+                if not self._passes(conn, data):
+                    continue
+                try:
+                    conn.sendall(data)
+                except OSError:
+                    self.clients.remove(conn)
+
+    # --- helpers that simulate a call -------------------------------------
+
+    def new_call(self, number, channel=None, state="Ring", context="from-trunk", linkedid=None):
+        """A new channel; linkedid is the uniqueid of the channel that dialed it, if any."""
+        with self.lock:
+            uniqueid = f"{int(time.time())}.{self._next_id}"
+            channel = channel or f"SIP/trunk-{self._next_id:08x}"
+            self._next_id += 1
+        self.channels[uniqueid] = [channel, number, state, time.monotonic(), context, linkedid or uniqueid]
+        self.emit("Newchannel", Channel=channel, ChannelStateDesc=state,
+                  CallerIDNum=number, Context=context, Exten="s", Uniqueid=uniqueid, Linkedid=linkedid or uniqueid)
+        return uniqueid
+
+    def set_state(self, uniqueid, state):
+        chan = self.channels[uniqueid]
+        chan[2] = state
+        self.emit("Newstate", Channel=chan[0], ChannelStateDesc=state,
+                  CallerIDNum=chan[1], Context=chan[4], Uniqueid=uniqueid)
+
+    def dial(self, uniqueid, dest_uniqueid):
+        self.emit("DialBegin", Channel=self.channels[uniqueid][0],
+                  Uniqueid=uniqueid, DestUniqueid=dest_uniqueid)
+
+    def hangup(self, uniqueid):
+        chan = self.channels.pop(uniqueid)
+        self.emit("Hangup", Channel=chan[0], Context=chan[4], Uniqueid=uniqueid, Cause="16")
+
+    # --- helpers that simulate app_queue -------------------------------------
+
+    def add_member(self, queue, interface, name=None, status="1"):
+        members = self.queues.setdefault(queue, {"members": {}, "callers": {}})["members"]
+        members[interface] = [name or interface, status, "0"]
+        self.emit("QueueMemberAdded", Queue=queue, Interface=interface, MemberName=name or interface,
+                  Status=status, Paused="0", CallsTaken="0")
+
+    def member_status(self, queue, interface, status=None, paused=None):
+        member = self.queues[queue]["members"][interface]
+        member[1] = status or member[1]
+        member[2] = member[2] if paused is None else "1" if paused else "0"
+        self.emit("QueueMemberStatus", Queue=queue, Interface=interface, MemberName=member[0],
+                  Status=member[1], Paused=member[2], CallsTaken="0")
+
+    def join_queue(self, queue, uniqueid):
+        callers = self.queues.setdefault(queue, {"members": {}, "callers": {}})["callers"]
+        callers[uniqueid] = (self.channels[uniqueid][0], time.monotonic())
+        self.emit("QueueCallerJoin", Queue=queue, Channel=callers[uniqueid][0], Uniqueid=uniqueid,
+                  Position=len(callers), Count=len(callers))
+
+    def leave_queue(self, queue, uniqueid, interface=None):
+        """The caller is answered by interface, or abandons the queue when it is None."""
+        channel, joined = self.queues[queue]["callers"].pop(uniqueid)
+        hold_time = int(time.monotonic() - joined)
+        if interface:
+            self.emit("AgentConnect", Queue=queue, Interface=interface, Uniqueid=uniqueid, HoldTime=hold_time)
+        else:
+            self.emit("QueueCallerAbandon", Queue=queue, Uniqueid=uniqueid, HoldTime=hold_time)
+        self.emit("QueueCallerLeave", Queue=queue, Channel=channel, Uniqueid=uniqueid)
+
+    # --- protocol -----------------------------------------------------------
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        conn.sendall(b"Asterisk Call Manager/5.0.1\r\n")
+        reader = conn.makefile("rb")
+        message = {}
+        try:
+            for raw in reader:
+                line = raw.decode("utf-8", "replace").rstrip("\r\n")
+                if line:
+                    key, _, value = line.partition(":")
+                    message[key.strip()] = value.strip()
+                    continue
+                if message:
+                    if not self._handle_action(conn, message):
+                        break
+                    message = {}
+        except OSError:
+            pass
+        with self.lock:
+            if conn in self.clients:
+                self.clients.remove(conn)
+            self.filters.pop(conn, None)
+        conn.close()
+
+    def _handle_action(self, conn, message):
+        action = message.get("Action", "")
+        action_id = message.get("ActionID", "")
+        if self.silent:
+            return True
+        if action == "Login":
+            if (self.username and message.get("Username") != self.username) or \
+                    (self.secret and message.get("Secret") != self.secret):
+                conn.sendall(_encode({"Response": "Error", "ActionID": action_id,
+                                      "Message": "Authentication failed"}))
+                return False
+            conn.sendall(_encode({"Response": "Success", "ActionID": action_id,
+                                  "Message": "Authentication accepted"}))
+            with self.lock:
+                self.clients.append(conn)
+        elif action == "CoreShowChannels":
+            conn.sendall(_encode({"Response": "Success", "ActionID": action_id,
+                                  "EventList": "start"}))
+            now = time.monotonic()
+            for uniqueid, (channel, number, state, started, context, linkedid) in list(self.channels.items()):
+                data = _encode({"Event": "CoreShowChannel", "ActionID": action_id,
+                                "Channel": channel, "ChannelStateDesc": state,
+                                "CallerIDNum": number, "Context": context, "Uniqueid": uniqueid, "Linkedid": linkedid,
+                                "Duration": format_duration(now - started)})
+                if self._passes(conn, data):
+                    conn.sendall(data)
+            conn.sendall(_encode({"Event": "CoreShowChannelsComplete", "ActionID": action_id,
+                                  "EventList": "Complete", "ListItems": len(self.channels)}))
+        elif action == "QueueStatus":
+            conn.sendall(_encode({"Response": "Success", "ActionID": action_id, "EventList": "start"}))
+            now = time.monotonic()
+            for queue, state in list(self.queues.items()):
+                events = [{"Event": "QueueParams", "Queue": queue, "Strategy": "ringall", "ServiceLevel": 20,
+                           "Completed": 0, "Abandoned": 0, "ServicelevelPerf": "0.0"}]
+                events += [{"Event": "QueueMember", "Queue": queue, "Name": name, "Location": interface,
+                            "Status": status, "Paused": paused, "CallsTaken": 0}
+                           for interface, (name, status, paused) in state["members"].items()]
+                events += [{"Event": "QueueEntry", "Queue": queue, "Channel": channel, "Uniqueid": uniqueid,
+                            "Wait": int(now - joined)} for uniqueid, (channel, joined) in state["callers"].items()]
+                for event in events:
+                    data = _encode(dict(event, ActionID=action_id))
+                    if self._passes(conn, data):
+                        conn.sendall(data)
+            conn.sendall(_encode({"Event": "QueueStatusComplete", "ActionID": action_id, "EventList": "Complete"}))
+        elif action == "Filter" and not self.allow_filters:
+            conn.sendall(_encode({"Response": "Error", "ActionID": action_id, "Message": "Permission denied"}))
+        elif action == "Filter" and message.get("Operation", "Add") == "Add":
+            # POSIX classes are not known to Python's re; "." spans lines like in Asterisk
+            pattern = message.get("Filter", "").replace("[[:space:]]", r"\s")
+            with self.lock:
+                self.filters.setdefault(conn, []).append(re.compile(pattern, re.DOTALL))
+            conn.sendall(_encode({"Response": "Success", "ActionID": action_id,
+                                  "Message": "Filter Added Successfully"}))
+        elif action == "Logoff":
+            conn.sendall(_encode({"Response": "Goodbye", "ActionID": action_id}))
+            return False
+        else:
+            conn.sendall(_encode({"Response": "Success", "ActionID": action_id}))
+        return True
+
+    def _passes(self, conn, data):
+        filters = self.filters.get(conn)
+        if not filters:
+            return True
+        text = data.decode("utf-8")
+        return any(regex.search(text) for regex in filters)
+
+
+def _encode(fields):
+    return ("".join(f"{k}: {v}\r\n" for k, v in fields.items()) + "\r\n").encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Asterisk Manager Interface with random calls")
+    parser.add_argument("--port", type=int, default=5038)
+    parser.add_argument("--calls-per-minute", type=float, default=20)
+    args = parser.parse_args()
+
+    server = FakeAmiServer(port=args.port).start()
+    print(f"Fake AMI listening on {server.host}:{server.port}")
+    try:
+        while True:
+            time.sleep(random.expovariate(args.calls_per_minute / 60))
+            uniqueid = server.new_call(f"79{random.randint(100000000, 999999999)}")
+            server.set_state(uniqueid, "Ringing")
+            answer = random.random() < 0.7
+            threading.Timer(random.uniform(1, 8), _finish, (server, uniqueid, answer)).start()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+def _finish(server, uniqueid, answer):
+    if answer:
+        server.set_state(uniqueid, "Up")
+        time.sleep(random.uniform(2, 30))
+    server.hangup(uniqueid)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Local fake SMTP server for trying the e-mail notifications without a mail server.
+
+Run it with:  python -m tools.fake_smtp --port 2525
+and put into config.json:
+    "notifications": {"email": {"to": "me@example.com", "smtp_server": "127.0.0.1",
+                                "smtp_port": 2525, "tls": null, "sender": "pbx@example.com"}}
+
+Every message is printed and kept in server.messages as (sender, recipients, text).
+Any login is accepted; STARTTLS is not supported.
+"""
+
+import argparse
+import socket
+import threading
+import time
+
+
+class FakeSmtpServer:
+    def __init__(self, host="127.0.0.1", port=0, on_message=None):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen()
+        self.host, self.port = self.server.getsockname()
+        self.on_message = on_message
+        self.messages = []
+        self.lock = threading.Lock()
+        self.running = False
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.server.close()
+
+    def wait_for(self, count, timeout=5.0):
+        """Wait until count messages have arrived; returns whether they did."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                if len(self.messages) >= count:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        reader = conn.makefile("rb")
+        sender, recipients = None, []
+
+        def reply(text):
+            conn.sendall(f"{text}\r\n".encode("ascii"))
+
+        try:
+            reply("220 fake-smtp ready")
+            for raw in reader:
+                line = raw.decode("utf-8", "replace").rstrip("\r\n")
+                command = line[:4].upper()
+                if command == "EHLO":
+                    conn.sendall(b"250-fake-smtp\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+                elif command == "HELO":
+                    reply("250 fake-smtp")
+                elif command == "AUTH":
+                    reply("235 2.7.0 Authentication successful")
+                elif command == "MAIL":
+                    sender, recipients = line[10:].strip().split()[0].strip("<>"), []
+                    reply("250 OK")
+                elif command == "RCPT":
+                    recipients.append(line[8:].strip().split()[0].strip("<>"))
+                    reply("250 OK")
+                elif command == "DATA":
+                    reply("354 End data with <CR><LF>.<CR><LF>")
+                    lines = []
+                    for data in reader:
+                        data = data.decode("utf-8", "replace").rstrip("\r\n")
+                        if data == ".":
+                            break
+                        lines.append(data[1:] if data.startswith("..") else data)
+                    message = (sender, recipients, "\n".join(lines))
+                    with self.lock:
+                        self.messages.append(message)
+                    if self.on_message:
+                        self.on_message(*message)
+                    reply("250 OK queued")
+                elif command == "QUIT":
+                    reply("221 Bye")
+                    break
+                elif command in ("RSET", "NOOP"):
+                    reply("250 OK")
+                else:
+                    reply("502 Command not implemented")
+        except OSError:
+            pass
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake SMTP server that prints the messages it gets")
+    parser.add_argument("--port", type=int, default=2525)
+    args = parser.parse_args()
+
+    def show(sender, recipients, text):
+        print(f"--- from {sender} to {', '.join(recipients)}\n{text}\n", flush=True)
+
+    server = FakeSmtpServer(port=args.port, on_message=show).start()
+    print(f"Fake SMTP listening on {server.host}:{server.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
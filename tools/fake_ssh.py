@@ -0,0 +1,164 @@
+"""
+Local SSH server stub that answers Asterisk CLI commands.
+
+    server = FakeSshServer(responder=lambda command: "...").start()
+    SshConnection("127.0.0.1", server.port, "user", "pass")
+
+Run it with:  python -m tools.fake_ssh --port 2222 --channels 50
+      or:        python -m tools.fake_ssh --calls 500 --churn 20     (calls come and go)
+      or:        python -m tools.fake_ssh --replay session.jsonl --speed 10
+"""
+
+import argparse
+import socket
+import threading
+
+import paramiko
+
+from tools.load_generator import CallLoad
+from tools.recording import Replay, load_recording
+from tools.synthetic_channels import concise_dump, make_channels, verbose_dump
+
+
+class _Interface(paramiko.ServerInterface):
+    def __init__(self, server):
+        self.server = server
+
+    def check_auth_password(self, username, password):
+        if (self.server.username, self.server.password) in ((None, None), (username, password)):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_auth_publickey(self, username, key):
+        if self.server.authorized_keys is not None and key in self.server.authorized_keys:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return "password,publickey" if self.server.authorized_keys is not None else "password"
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=self.server._answer, args=(channel, command.decode("utf-8")),
+                         daemon=True).start()
+        return True
+
+
+class FakeSshServer:
+    def __init__(self, responder, host="127.0.0.1", port=0, username=None, password=None, authorized_keys=None):
+        self.responder = responder
+        self.username = username
+        self.password = password
+        self.authorized_keys = authorized_keys  # paramiko keys accepted for public key authentication
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen()
+        self.host, self.port = self.sock.getsockname()
+        self.transports = []
+        self.connections = 0
+        self.commands = 0
+        self.running = False
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.running = False
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)  # wakes the accept() of the other thread
+        except OSError:
+            pass
+        self.sock.close()
+        self.drop_connections()
+
+    def drop_connections(self):
+        """Close every open transport, as if the network went down."""
+        for transport in self.transports:
+            transport.close()
+        self.transports = []
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            transport = paramiko.Transport(conn)
+            transport.add_server_key(self.host_key)
+            try:
+                transport.start_server(server=_Interface(self))
+            except (paramiko.SSHException, EOFError):
+                continue
+            self.connections += 1
+            self.transports.append(transport)
+            threading.Thread(target=self._accept_channels, args=(transport,), daemon=True).start()
+
+    def _accept_channels(self, transport):
+        # Accepted channels are kept referenced: paramiko closes a channel
+        # as soon as its object is garbage collected
+        channels = []
+        while transport.is_active():
+            channel = transport.accept(timeout=1)
+            channels = [chan for chan in channels if not chan.closed]
+            if channel is not None:
+                channels.append(channel)
+
+    def _answer(self, channel, command):
+        self.commands += 1
+        try:
+            channel.sendall(self.responder(command).encode("utf-8"))
+            channel.send_exit_status(0)
+            # Only EOF here: closing the channel before paramiko has replied to
+            # the exec request makes the client fail. The client closes it.
+            channel.shutdown_write()
+        except (OSError, EOFError, paramiko.SSHException):
+            channel.close()
+
+
+def asterisk_responder(channel_count):
+    channels = make_channels(channel_count)
+
+    def respond(command):
+        if "concise" in command:
+            return concise_dump(channels)
+        if "core show channels" in command:
+            return verbose_dump(channels)
+        return f"No such command '{command}'\n"
+
+    return respond
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSH server stub that answers 'core show channels'")
+    parser.add_argument("--port", type=int, default=2222)
+    parser.add_argument("--channels", type=int, default=20, help="fixed channels that never change")
+    parser.add_argument("--calls", type=int, help="live calls, replaced at --churn calls per second")
+    parser.add_argument("--churn", type=float, default=1.0)
+    parser.add_argument("--replay", help="serve a recording made with tools.recording")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed factor")
+    args = parser.parse_args()
+
+    if args.replay:
+        responder = Replay(load_recording(args.replay), speed=args.speed).responder()
+    elif args.calls:
+        responder = CallLoad(args.calls, args.churn).responder()
+    else:
+        responder = asterisk_responder(args.channels)
+    server = FakeSshServer(responder, port=args.port).start()
+    print(f"Fake Asterisk SSH listening on {server.host}:{server.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
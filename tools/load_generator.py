@@ -0,0 +1,110 @@
+"""
+Synthetic call load: N concurrent calls with a churn of R calls per second.
+
+Every second R of the oldest calls hang up and R new ones start ringing, so
+the number of live channels stays at N. A new call rings for a few seconds and
+then is either answered (Up) or keeps ringing until it is replaced, which is
+counted as missed. The load is a function of the clock, so the same seed and
+the same times give the same channels.
+
+    load = CallLoad(calls=500, churn=20)
+    FakeSshServer(load.responder()).start()       # for SSH polling
+    load.drive(FakeAmiServer().start(), stopped)  # as AMI events
+"""
+
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from tools.synthetic_channels import concise_dump, verbose_dump
+
+
+class CallLoad:
+    def __init__(self, calls=100, churn=5.0, seed=0, answer_rate=0.7, ring_time=(1.0, 8.0),
+                 clock=time.monotonic):
+        self.size = calls
+        self.churn = churn
+        self.answer_rate = answer_rate
+        self.ring_time = ring_time
+        self.clock = clock
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = OrderedDict()  # uniqueid -> [channel, number, state, started, answer_at], oldest first
+        self.started_at = clock()
+        self.replaced = 0
+        self._next_id = 0
+        for _ in range(calls):
+            # The initial calls are already going on for a while
+            self._new_call(self.started_at - self.random.uniform(0, 600), ringing=False)
+
+    def advance(self, now=None):
+        """Bring the calls up to now; returns the events as (kind, uniqueid) tuples."""
+        now = self.clock() if now is None else now
+        events = []
+        with self.lock:
+            due = int((now - self.started_at) * self.churn) - self.replaced
+            for _ in range(max(0, due)):
+                if self.calls:
+                    uniqueid, _ = self.calls.popitem(last=False)
+                    events.append(("hangup", uniqueid))
+                events.append(("new", self._new_call(now)))
+                self.replaced += 1
+            for uniqueid, call in self.calls.items():
+                if call[2] != "Up" and call[4] is not None and call[4] <= now:
+                    call[2] = "Up"
+                    events.append(("up", uniqueid))
+        return events
+
+    def channels(self, now=None):
+        """The live calls as (channel, exten, state, callerid, duration, uniqueid) tuples."""
+        now = self.clock() if now is None else now
+        self.advance(now)
+        with self.lock:
+            return [(channel, "s", state, number, int(now - started), uniqueid)
+                    for uniqueid, (channel, number, state, started, answer_at) in self.calls.items()]
+
+    def responder(self):
+        """Answer `core show channels` for FakeSshServer with the current load."""
+        def respond(command):
+            if "concise" in command:
+                return concise_dump(self.channels())
+            if "core show channels" in command:
+                return verbose_dump(self.channels())
+            return f"No such command '{command}'\n"
+        return respond
+
+    def drive(self, server, stopped, tick=0.05):
+        """Play the load into a FakeAmiServer as events until stopped is set."""
+        ids = {}
+        with self.lock:
+            calls = list(self.calls.items())
+        for uniqueid, (channel, number, state, started, answer_at) in calls:
+            ids[uniqueid] = server.new_call(number, channel, state)
+        while not stopped.wait(tick):
+            for kind, uniqueid in self.advance():
+                if kind == "new":
+                    with self.lock:
+                        call = self.calls.get(uniqueid)
+                    if call:  # with a churn above the load a new call can be replaced at once
+                        ids[uniqueid] = server.new_call(call[1], call[0], call[2])
+                elif uniqueid not in ids:
+                    continue
+                elif kind == "up":
+                    server.set_state(ids[uniqueid], "Up")
+                else:
+                    server.hangup(ids.pop(uniqueid))
+
+    def _new_call(self, now, ringing=True):
+        self._next_id += 1
+        uniqueid = f"1713340800.{self._next_id}"
+        number = f"79{self.random.randint(100000000, 999999999)}"
+        answer_at = None
+        if not ringing:
+            state = "Up"
+        else:
+            state = "Ringing"
+            if self.random.random() < self.answer_rate:
+                answer_at = now + self.random.uniform(*self.ring_time)
+        self.calls[uniqueid] = [f"SIP/trunk-{self._next_id:08x}", number, state, now, answer_at]
+        return uniqueid
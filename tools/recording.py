@@ -0,0 +1,135 @@
+"""
+Record `core show channels` from a real PBX and replay it later.
+
+A recording is a JSON-lines file, one frame per poll:
+
+    {"t": 12.5, "outputs": {"asterisk -rx 'core show channels concise'": "...", ...}}
+
+where t is the number of seconds since the start of the recording. Replaying
+serves, for every command, the output of the last frame whose t has passed,
+with the time sped up or slowed down by a factor.
+
+Record (the connection settings default to ASTERISK_HOST, ASTERISK_PORT,
+ASTERISK_USERNAME and ASTERISK_PASSWORD, e.g. from `set -a; . ./.env`):
+
+    python -m tools.recording --output session.jsonl --interval 1 --duration 600
+
+Replay through the stub SSH server:
+
+    python -m tools.fake_ssh --replay session.jsonl --speed 10
+"""
+
+import argparse
+import bisect
+import getpass
+import json
+import os
+import sys
+import threading
+import time
+
+from channel_parser import CONCISE_COMMAND, VERBOSE_COMMAND
+
+COMMANDS = (CONCISE_COMMAND, VERBOSE_COMMAND)
+
+
+def record(connection, path, commands=COMMANDS, interval=1.0, duration=60.0, stopped=None):
+    """Poll through an SshConnection and append a frame per poll until duration or Ctrl+C.
+
+    Returns the number of frames written.
+    """
+    stopped = stopped or threading.Event()
+    started = time.monotonic()
+    frames = 0
+    with open(path, "w", encoding="utf-8") as f:
+        try:
+            while True:
+                at = time.monotonic() - started
+                if at >= duration:
+                    break
+                outputs = {command: connection.run(command) for command in commands}
+                f.write(json.dumps({"t": round(at, 3), "outputs": outputs}, ensure_ascii=False) + "\n")
+                f.flush()
+                frames += 1
+                if stopped.wait(max(0.0, interval - (time.monotonic() - started - at))):
+                    break
+        except KeyboardInterrupt:
+            pass
+    return frames
+
+
+def load_recording(path):
+    """Return the frames of a recording as a list of (t, {command: output}), in time order."""
+    frames = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                frame = json.loads(line)
+                frames.append((float(frame["t"]), frame["outputs"]))
+    frames.sort(key=lambda frame: frame[0])
+    return frames
+
+
+class Replay:
+    """Serves the recorded outputs as if the recording were happening now."""
+
+    def __init__(self, frames, speed=1.0, loop=True, clock=time.monotonic):
+        if not frames:
+            raise ValueError("The recording has no frames")
+        self.frames = frames
+        self.times = [t for t, _ in frames]
+        self.length = self.times[-1]
+        self.speed = speed
+        self.loop = loop
+        self.clock = clock
+        self.started = clock()
+
+    def frame(self, now=None):
+        at = ((self.clock() if now is None else now) - self.started) * self.speed
+        if self.loop and self.length > 0:
+            at %= self.length + (self.times[1] - self.times[0] if len(self.times) > 1 else 0)
+        index = max(0, bisect.bisect_right(self.times, at) - 1)
+        return self.frames[index][1]
+
+    def responder(self):
+        """Answer the commands for FakeSshServer from the recording."""
+        def respond(command):
+            outputs = self.frame()
+            if command in outputs:
+                return outputs[command]
+            # Same kind of command recorded under a different prefix (e.g. without sudo)
+            for recorded, output in outputs.items():
+                if ("concise" in recorded) == ("concise" in command) and "core show channels" in recorded:
+                    return output
+            return f"No such command '{command}'\n"
+        return respond
+
+
+def main():
+    from ssh_connection import SshConnection
+
+    parser = argparse.ArgumentParser(description="Record 'core show channels' from an Asterisk server")
+    parser.add_argument("--host", default=os.getenv("ASTERISK_HOST"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("ASTERISK_PORT") or 22))
+    parser.add_argument("--username", default=os.getenv("ASTERISK_USERNAME"))
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--concise-only", action="store_true", help="do not record the verbose table")
+    args = parser.parse_args()
+    if not args.host or not args.username:
+        parser.error("--host and --username (or ASTERISK_HOST, ASTERISK_USERNAME) are required")
+    password = os.getenv("ASTERISK_PASSWORD") or getpass.getpass()
+
+    connection = SshConnection(args.host, args.port, args.username, password)
+    connection.connect()
+    commands = (CONCISE_COMMAND,) if args.concise_only else COMMANDS
+    try:
+        frames = record(connection, args.output, commands, args.interval, args.duration)
+    finally:
+        connection.close()
+    print(f"Recorded {frames} frames to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Synthetic `core show channels` dumps for benchmarks and the fake servers.
+"""
+
+import random
+
+STATES = ("Ring", "Ringing", "Up", "Up", "Up", "Dialing")
+
+
+def make_channels(count, seed=0):
+    """Return a list of (channel, exten, state, callerid, duration, uniqueid) tuples."""
+    rnd = random.Random(seed)
+    channels = []
+    for i in range(count):
+        if i % 2:
+            channel = f"SIP/trunk-{i:08x}"
+            callerid = f"79{rnd.randint(100000000, 999999999)}"
+            exten = "s"
+        else:
+            channel = f"SIP/{100 + i % 900}-{i:08x}"
+            callerid = str(100 + i % 900)
+            exten = f"8{rnd.randint(1000000000, 9999999999)}"
+        channels.append((channel, exten, rnd.choice(STATES), callerid,
+                         rnd.randint(0, 3600), f"1713340800.{i}"))
+    return channels
+
+
+def concise_dump(channels):
+    return "".join(
+        f"{channel}!from-trunk!{exten}!1!{state}!Dial!SIP/101,30,tT!{callerid}!!!3!{duration}!"
+        f"{'bridge-%d' % i if state == 'Up' else ''}!{uniqueid}\n"
+        for i, (channel, exten, state, callerid, duration, uniqueid) in enumerate(channels)
+    )
+
+
+def verbose_dump(channels):
+    lines = ["Channel              Context              Extension        Prio State   "
+             "Application  Data                      CallerID        Duration Accountcode "
+             "PeerAccount BridgeID            "]
+    for channel, exten, state, callerid, duration, uniqueid in channels:
+        hours, rest = divmod(duration, 3600)
+        lines.append(f"{channel:<20.20} {'from-trunk':<20.20} {exten:<16.16} {1:>4} {state:<7.7} "
+                     f"{'Dial':<12.12} {'SIP/101,30,tT':<25.25} {callerid:<15.15} "
+                     f"{hours:02d}:{rest // 60:02d}:{rest % 60:02d} {'':<11} {'':<11} {'':<20}")
+    lines.append(f"{len(channels)} active channels")
+    lines.append(f"{len(channels) // 2} active calls")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,113 @@
+"""
+Thread-safe bridge between background workers and the Tk main loop.
+
+Tk widgets may only be touched from the thread that runs mainloop(). Workers
+do the slow SSH/AMI work and hand the results over with UiDispatcher.post();
+the queue is drained on the Tk thread with root.after().
+"""
+
+import queue
+import threading
+import time
+import traceback
+
+
+class UiDispatcher:
+    def __init__(self, root, interval_ms=30, max_per_tick=500, metrics=None):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.max_per_tick = max_per_tick
+        self.queue = queue.Queue()
+        # Poll -> on-screen latency, in seconds
+        self.last_latency = None
+        self.avg_latency = None
+        self.max_latency = 0.0
+        self.updates = 0
+        self.metrics = metrics  # optional metrics.Metrics, gets the "ui.latency" stage
+
+    def start(self):
+        self.root.after(self.interval_ms, self._drain)
+
+    def post(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) on the Tk thread. Safe to call from any thread."""
+        self.queue.put((None, func, args, kwargs))
+
+    def post_update(self, polled_at, func, *args):
+        """Like post(), but also measures the time since polled_at (time.perf_counter())."""
+        self.queue.put((polled_at, func, args, {}))
+
+    def _drain(self):
+        try:
+            for _ in range(self.max_per_tick):
+                try:
+                    polled_at, func, args, kwargs = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if polled_at is not None:
+                    self._record_latency(time.perf_counter() - polled_at)
+                try:
+                    func(*args, **kwargs)
+                except Exception:
+                    traceback.print_exc()
+        finally:
+            self.root.after(self.interval_ms, self._drain)
+
+    def _record_latency(self, latency):
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        self.updates += 1
+        if self.metrics:
+            self.metrics.observe("ui.latency", latency)
+        if self.avg_latency is None:
+            self.avg_latency = latency
+        else:
+            self.avg_latency += (latency - self.avg_latency) * 0.1
+
+
+class Worker:
+    """Background threads that run submitted jobs in the order they came.
+
+    A job that is already waiting in the queue is not added a second time, so a
+    slow PBX does not make refresh requests pile up. With several threads, jobs
+    for different servers run side by side and a slow server does not hold up
+    the others.
+    """
+
+    def __init__(self, name="worker", threads=1):
+        self.queue = queue.Queue()
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.threads = []
+        self.add_threads(threads, name)
+
+    def add_threads(self, count, name="worker"):
+        for _ in range(count):
+            thread = threading.Thread(target=self._run, name=f"{name}-{len(self.threads) + 1}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, func, *args):
+        job = (func, args)
+        with self.lock:
+            if job in self.pending:
+                return False
+            self.pending.add(job)
+        self.queue.put(job)
+        return True
+
+    def stop(self):
+        for _ in self.threads:
+            self.queue.put(None)
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            with self.lock:
+                self.pending.discard(job)
+            func, args = job
+            try:
+                func(*args)
+            except Exception:
+                traceback.print_exc()